@@ -0,0 +1,137 @@
+"""
+Admin Statistics Module
+Computes the admin dashboard counts in two queries: one SELECT of scalar
+subqueries for the totals and one GROUP BY for users per role.
+Counts are scoped to one organization (users without one form their own
+scope) unless all organizations are requested explicitly for superadmins.
+Results are cached per scope for a few seconds.
+Also summarizes document content size and file types for the documents page.
+"""
+
+import os
+from typing import Dict, Optional
+
+from sqlalchemy import select, func, case
+
+from models import User, Document, Question, Exam
+from cache import TTLCache
+
+# Stats cache configuration
+ADMIN_STATS_CACHE_TTL = int(os.getenv('ADMIN_STATS_CACHE_TTL', '30'))  # Seconds (0 disables caching)
+
+_stats_cache = TTLCache(ttl=ADMIN_STATS_CACHE_TTL, max_size=1024)
+
+
+def compute_admin_stats(db_session, organization: Optional[str] = None, all_orgs: bool = False) -> Dict:
+    """
+    Count users, documents, questions, exams and users per role
+
+    Args:
+        db_session: Database session
+        organization: Limit counts to this organization (None counts users and
+                      documents without an organization)
+        all_orgs: Count across all organizations instead (superadmins only)
+
+    Returns:
+        dict with total_users, total_documents, total_questions, total_exams,
+        admin_count, teacher_count, student_count and organization_count
+    """
+    users = select(func.count(User.id))
+    documents = select(func.count(Document.id))
+    questions = select(func.count(Question.id))
+    exams = select(func.count(Exam.id))
+
+    if not all_orgs:
+        users = users.where(User.organization == organization)
+        documents = documents.where(Document.organization == organization)
+        questions = questions.join(Document, Question.document_id == Document.id)\
+            .where(Document.organization == organization)
+        exams = exams.join(User, Exam.user_id == User.id)\
+            .where(User.organization == organization)
+
+    columns = [
+        users.scalar_subquery().label('total_users'),
+        documents.scalar_subquery().label('total_documents'),
+        questions.scalar_subquery().label('total_questions'),
+        exams.scalar_subquery().label('total_exams')
+    ]
+
+    # Distinct organizations are only reported across all organizations
+    if all_orgs:
+        organizations = select(func.count(func.distinct(User.organization)))\
+            .where(User.organization.isnot(None), User.organization != '')
+        columns.append(organizations.scalar_subquery().label('organization_count'))
+
+    totals = db_session.execute(select(*columns)).one()
+
+    roles_query = db_session.query(User.role, func.count(User.id))
+    if not all_orgs:
+        roles_query = roles_query.filter(User.organization == organization)
+    role_counts = dict(roles_query.group_by(User.role).all())
+
+    return {
+        'total_users': totals.total_users,
+        'total_documents': totals.total_documents,
+        'total_questions': totals.total_questions,
+        'total_exams': totals.total_exams,
+        'admin_count': role_counts.get('admin', 0),
+        'teacher_count': role_counts.get('teacher', 0),
+        'student_count': role_counts.get('student', 0),
+        'organization_count': totals.organization_count if all_orgs else (1 if organization else 0)
+    }
+
+
+def get_admin_stats(db_session, organization: Optional[str] = None, all_orgs: bool = False,
+                    use_cache: bool = True) -> Dict:
+    """
+    Get admin dashboard statistics, cached for ADMIN_STATS_CACHE_TTL seconds per scope
+
+    Args:
+        db_session: Database session
+        organization: Limit counts to this organization (None counts users and
+                      documents without an organization)
+        all_orgs: Count across all organizations instead (superadmins only)
+        use_cache: False to always recompute
+
+    Returns:
+        dict of statistics (see compute_admin_stats)
+    """
+    if not use_cache or ADMIN_STATS_CACHE_TTL <= 0:
+        return compute_admin_stats(db_session, organization, all_orgs)
+
+    key = ('all',) if all_orgs else ('org', organization)
+    stats = _stats_cache.get(key)
+    if stats is None:
+        stats = compute_admin_stats(db_session, organization, all_orgs)
+        _stats_cache.set(key, stats)
+
+    return dict(stats)
+
+
+def compute_document_breakdown(db_session, organization: Optional[str] = None, all_orgs: bool = False) -> Dict:
+    """
+    Sum document content size and count documents per file type in one query
+
+    Args:
+        db_session: Database session
+        organization: Limit to this organization (None for documents without one)
+        all_orgs: Sum across all organizations instead (superadmins only)
+
+    Returns:
+        dict with total_content_size (characters), pdf_count, docx_count and txt_count
+    """
+    filename = func.lower(Document.filename)
+
+    def count_extension(extension):
+        return func.coalesce(func.sum(case((filename.like(f'%.{extension}'), 1), else_=0)), 0)
+
+    query = db_session.query(
+        func.coalesce(func.sum(func.coalesce(Document.content_length, func.length(Document.content))), 0).label('total_content_size'),
+        count_extension('pdf').label('pdf_count'),
+        count_extension('docx').label('docx_count'),
+        count_extension('txt').label('txt_count')
+    )
+    if not all_orgs:
+        query = query.filter(Document.organization == organization)
+
+    return dict(query.one()._mapping)
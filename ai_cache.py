@@ -0,0 +1,185 @@
+"""
+AI Response Cache Module
+Caches AI provider responses keyed by a hash of (organization, prompt, provider, model, temperature)
+Backends: SQLite on-disk cache (default) or disabled
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+# Cache configuration
+AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', 'true').lower() == 'true'
+AI_CACHE_PATH = os.getenv('AI_CACHE_PATH', 'ai_cache.db')
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', str(7 * 24 * 60 * 60)))  # Seconds (default 7 days)
+AI_CACHE_MAX_BYTES = int(os.getenv('AI_CACHE_MAX_BYTES', str(100 * 1024 * 1024)))  # Default 100MB
+
+
+def make_cache_key(prompt: str, provider: str, model: str, temperature: float,
+                   organization: Optional[str] = None) -> str:
+    """
+    Build a content-addressed cache key for an AI request
+
+    Args:
+        prompt: The prompt sent to the AI
+        provider: 'openai' or 'gemini'
+        model: Model name
+        temperature: Sampling temperature
+        organization: Organization making the request; responses are never shared across organizations
+
+    Returns:
+        SHA-256 hex digest identifying the request
+    """
+    payload = json.dumps([organization or '_default', provider, model, round(float(temperature), 4), prompt],
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Response cache interface; this base class caches nothing"""
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss"""
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        """Store a response under key"""
+
+    def clear(self) -> None:
+        """Remove all cached responses"""
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    On-disk response cache backed by SQLite
+
+    Entries expire after ttl seconds. When the total size of stored
+    responses exceeds max_bytes, the least recently used entries are evicted.
+    Cache failures are logged and treated as misses so they never break an AI call.
+    """
+
+    def __init__(self, path: str = AI_CACHE_PATH, ttl: int = AI_CACHE_TTL, max_bytes: int = AI_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._initialize()
+
+    @contextmanager
+    def _connect(self):
+        # A connection per operation keeps the cache safe across threads and worker processes
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:  # Commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _initialize(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ai_responses (
+                    cache_key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_responses_accessed_at ON ai_responses(accessed_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            now = time.time()
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT response, created_at FROM ai_responses WHERE cache_key = ?", (key,)
+                ).fetchone()
+
+                if row is None:
+                    return None
+
+                response, created_at = row
+                if now - created_at > self.ttl:
+                    conn.execute("DELETE FROM ai_responses WHERE cache_key = ?", (key,))
+                    return None
+
+                conn.execute("UPDATE ai_responses SET accessed_at = ? WHERE cache_key = ?", (now, key))
+                return response
+        except sqlite3.Error as e:
+            print(f"[AI Cache] Read failed: {e}")
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        try:
+            now = time.time()
+            size = len(value.encode('utf-8'))
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ai_responses (cache_key, response, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now)
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"[AI Cache] Write failed: {e}")
+
+    def _evict(self, conn, now: float) -> None:
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        conn.execute("DELETE FROM ai_responses WHERE created_at < ?", (now - self.ttl,))
+
+        total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ai_responses").fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+
+        excess = total_size - self.max_bytes
+        evict_keys = []
+        for cache_key, size in conn.execute("SELECT cache_key, size FROM ai_responses ORDER BY accessed_at"):
+            evict_keys.append((cache_key,))
+            excess -= size
+            if excess <= 0:
+                break
+
+        conn.executemany("DELETE FROM ai_responses WHERE cache_key = ?", evict_keys)
+
+    def clear(self) -> None:
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute("DELETE FROM ai_responses")
+        except sqlite3.Error as e:
+            print(f"[AI Cache] Clear failed: {e}")
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache, creating the configured backend on first use"""
+    global _response_cache
+
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                if not AI_CACHE_ENABLED:
+                    _response_cache = ResponseCache()
+                else:
+                    try:
+                        _response_cache = SQLiteResponseCache()
+                    except sqlite3.Error as e:
+                        print(f"[AI Cache] Disabled, could not open {AI_CACHE_PATH}: {e}")
+                        _response_cache = ResponseCache()
+
+    return _response_cache
+
+
+def set_response_cache(cache: ResponseCache) -> None:
+    """Replace the process-wide response cache (e.g. with a shared-store backend)"""
+    global _response_cache
+    _response_cache = cache
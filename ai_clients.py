@@ -0,0 +1,139 @@
+"""
+AI Client Registry Module
+Reuses provider clients (and their HTTP connection pools) across calls in a worker process
+Clients are keyed by provider and a hash of the API key, bounded in number and evicted when idle
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from openai import OpenAI
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+
+# Client registry configuration
+AI_CLIENT_MAX_SIZE = int(os.getenv('AI_CLIENT_MAX_SIZE', '32'))  # Clients kept per worker process
+AI_CLIENT_IDLE_TIMEOUT = int(os.getenv('AI_CLIENT_IDLE_TIMEOUT', '900'))  # Seconds before an unused client is dropped
+
+
+def _key_fingerprint(api_key: Optional[str]) -> str:
+    """Hash an API key so raw keys are never used as registry keys"""
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()
+
+
+class ClientRegistry:
+    """
+    Thread-safe LRU registry of provider clients
+
+    Evicted clients are only dropped, not closed, because another thread may
+    still be using them; their connections are released when they are collected.
+    """
+
+    def __init__(self, max_size: int = AI_CLIENT_MAX_SIZE, idle_timeout: int = AI_CLIENT_IDLE_TIMEOUT):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._clients = OrderedDict()  # key -> (client, last_used)
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, factory: Callable):
+        """
+        Get the client for key, creating it with factory on a miss
+
+        Args:
+            key: Registry key, e.g. (provider, key fingerprint)
+            factory: Zero-argument callable building a new client
+
+        Returns:
+            The cached or newly created client
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+
+            entry = self._clients.get(key)
+            if entry is not None:
+                self._clients[key] = (entry[0], now)
+                self._clients.move_to_end(key)
+                return entry[0]
+
+            client = factory()
+            self._clients[key] = (client, now)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+
+            return client
+
+    def _evict_idle(self, now: float) -> None:
+        """Drop clients not used within idle_timeout (oldest first)"""
+        while self._clients:
+            key, (client, last_used) = next(iter(self._clients.items()))
+            if now - last_used <= self.idle_timeout:
+                break
+            del self._clients[key]
+
+    def clear(self) -> None:
+        """Drop all cached clients"""
+        with self._lock:
+            self._clients.clear()
+
+    def __len__(self):
+        return len(self._clients)
+
+
+_registry = ClientRegistry()
+
+# genai keeps its configuration in module globals, so configuring and binding
+# a model to the configured client must happen atomically
+_gemini_lock = threading.Lock()
+_gemini_configured_key = None
+
+
+def get_openai_client(api_key: Optional[str] = None) -> OpenAI:
+    """
+    Get a pooled OpenAI client for an API key
+
+    Args:
+        api_key: OpenAI API key (None uses OPENAI_API_KEY from the environment)
+
+    Returns:
+        OpenAI client shared by all calls with the same key
+    """
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+    return _registry.get(('openai', _key_fingerprint(api_key)), lambda: OpenAI(api_key=api_key))
+
+
+def get_gemini_model(api_key: Optional[str], model: str):
+    """
+    Get a pooled Gemini model bound to the client for an API key
+
+    Args:
+        api_key: Gemini API key (None uses GEMINI_API_KEY from the environment)
+        model: Gemini model name
+
+    Returns:
+        GenerativeModel shared by all calls with the same key and model
+    """
+    api_key = api_key or os.getenv('GEMINI_API_KEY')
+
+    def create_model():
+        global _gemini_configured_key
+
+        with _gemini_lock:
+            # Reconfiguring drops genai's cached clients, so only do it when the key changes
+            if api_key != _gemini_configured_key:
+                genai.configure(api_key=api_key)
+                _gemini_configured_key = api_key
+
+            gemini_model = genai.GenerativeModel(model)
+            # Bind the client now so later configure() calls for other keys do not affect this model.
+            # GenerativeModel has no public way to pass a client; _client is what it reads in
+            # google-generativeai 0.3.1, which requirements.txt pins for this reason.
+            gemini_model._client = genai_client.get_default_generative_client()
+            return gemini_model
+
+    return _registry.get(('gemini', _key_fingerprint(api_key), model), create_model)
+
@@ -1,15 +1,19 @@
 import os
+import hmac
+import hashlib
 from functools import wraps
 from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, session, abort, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, abort, jsonify, g
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, undefer
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 import openai
 
 # Import database models
-from models import User, Document, Question, Exam, ExamQuestion, OrganizationSettings, get_engine, get_session
+from models import User, Document, Question, QuestionSignatureBand, Exam, ExamQuestion, ExamAttempt, ExamAttemptAnswer, OrganizationSettings, GenerationJob, CsvImport, get_engine, get_session
 
 # Import utility functions
 from utils import (
@@ -17,7 +21,7 @@ from utils import (
     extract_text_from_file,
     get_file_size_mb,
     validate_file_content,
-    validate_question_complete,
+    validate_questions_batch,
     auto_fix_question_formatting,
     auto_fix_option_formatting,
     calculate_difficulty_score
@@ -29,9 +33,38 @@ from question_generator import (
     generate_true_false_questions,
     generate_short_answer_questions,
     generate_questions_mixed,
+    estimate_ai_calls,
     AI_MODELS
 )
 
+# Import background generation jobs
+from generation_jobs import enqueue_generation_job, fail_if_stale, job_status
+
+# Import AI rate limiting
+from rate_limiter import get_rate_limiter, make_rate_limit_key
+
+# Import short answer grading
+from grading import grade_short_answers_batch
+from grading_jobs import DEFERRED_GRADING, enqueue_exam_grading, retry_if_stale
+
+# Import server-side exam state
+import exam_state
+
+# Import admin dashboard statistics
+from admin_stats import get_admin_stats, compute_document_breakdown
+
+# Import keyset pagination for long listings
+from pagination import paginate_keyset
+
+# Import near-duplicate question detection
+from question_index import PersistedDuplicateIndex
+
+# Import streaming CSV question import
+from csv_import import open_csv_reader, import_questions, MAX_STORED_ERRORS
+
+# Import per-worker caches
+from cache import get_cached_user, cache_user, invalidate_user, get_cached_org_settings, invalidate_org_settings
+
 # Load environment variables
 load_dotenv()
 
@@ -57,6 +90,21 @@ openai.api_key = os.getenv('OPENAI_API_KEY')
 # Initialize database
 db_engine = get_engine(app.config['DATABASE_URL'])
 
+
+def get_db_session():
+    """Get the database session for the current request, opened on first use"""
+    if 'db_session' not in g:
+        g.db_session = get_session(db_engine)
+    return g.db_session
+
+
+@app.teardown_appcontext
+def close_db_session(exception=None):
+    """Return the request's database connection to the pool"""
+    db_session = g.pop('db_session', None)
+    if db_session is not None:
+        db_session.close()
+
 # Initialize Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -75,109 +123,61 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
 
-def grade_short_answer(user_answer, model_answer, key_points, provider='gemini', api_key=None):
+def count_questions_by_document(db_session, document_ids, status=None):
     """
-    Grade a short answer using AI semantic comparison
+    Count questions per document in a single grouped query
 
     Args:
-        user_answer: Student's answer text
-        model_answer: Correct answer text
-        key_points: List of key points that should be covered
-        provider: AI provider ('openai' or 'gemini')
-        api_key: API key for the provider
+        db_session: Database session
+        document_ids: List of document IDs, or a query selecting them
+        status: Only count questions with this status (e.g. 'approved')
 
     Returns:
-        tuple: (is_correct: bool, similarity_score: float, feedback: str)
+        dict: {document_id: question_count} (documents without questions are omitted)
     """
-    if not user_answer or not user_answer.strip():
-        return False, 0.0, "No answer provided"
-
-    # Construct grading prompt
-    prompt = f"""You are an exam grader. Grade the following short answer question.
-
-Model Answer: {model_answer}
-
-Key Points to Cover:
-{chr(10).join(f'- {point}' for point in key_points) if key_points else 'N/A'}
+    query = db_session.query(Question.document_id, func.count(Question.id))\
+        .filter(Question.document_id.in_(document_ids))
 
-Student's Answer: {user_answer}
+    if status:
+        query = query.filter(Question.status == status)
 
-Evaluate the student's answer based on:
-1. Semantic similarity to the model answer
-2. Coverage of key points
-3. Accuracy of information
-4. Completeness
+    return dict(query.group_by(Question.document_id).all())
 
-Provide your response in this exact format:
-SCORE: [0-100]
-PASS: [YES/NO]
-FEEDBACK: [Brief feedback about what was good or missing]"""
-
-    try:
-        if provider == 'gemini':
-            import google.generativeai as genai
-            if api_key:
-                genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            response = model.generate_content(prompt)
-            result_text = response.text
-        else:  # openai
-            if api_key:
-                client = openai.OpenAI(api_key=api_key)
-            else:
-                client = openai.OpenAI()
 
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            result_text = response.choices[0].message.content
-
-        # Parse response
-        lines = result_text.strip().split('\n')
-        score = 0
-        is_correct = False
-        feedback = "Graded by AI"
-
-        for line in lines:
-            if line.startswith('SCORE:'):
-                score = float(line.split(':')[1].strip())
-            elif line.startswith('PASS:'):
-                is_correct = 'YES' in line.upper()
-            elif line.startswith('FEEDBACK:'):
-                feedback = line.split(':', 1)[1].strip()
+def count_documents_by_user(db_session, user_ids):
+    """
+    Count uploaded documents per user in a single grouped query
 
-        # If score >= 60%, consider it correct
-        if score >= 60:
-            is_correct = True
+    Returns:
+        dict: {user_id: document_count} (users without documents are omitted)
+    """
+    return dict(
+        db_session.query(Document.uploaded_by, func.count(Document.id))
+        .filter(Document.uploaded_by.in_(user_ids))
+        .group_by(Document.uploaded_by)
+        .all()
+    )
 
-        return is_correct, score, feedback
 
-    except Exception as e:
-        # Fallback: simple keyword matching
-        user_lower = user_answer.lower()
-        model_lower = model_answer.lower() if model_answer else ""
+def count_exams_by_user(db_session, user_ids, completed_only=False):
+    """
+    Count exams per user in a single grouped query
 
-        # Count how many key points are mentioned
-        if key_points:
-            points_covered = sum(1 for point in key_points if point.lower() in user_lower)
-            coverage = (points_covered / len(key_points)) * 100
+    Args:
+        db_session: Database session
+        user_ids: List of user IDs
+        completed_only: Only count exams that were submitted
 
-            if coverage >= 50:
-                return True, coverage, f"Covered {points_covered}/{len(key_points)} key points"
-            else:
-                return False, coverage, f"Only covered {points_covered}/{len(key_points)} key points"
+    Returns:
+        dict: {user_id: exam_count} (users without exams are omitted)
+    """
+    query = db_session.query(Exam.user_id, func.count(Exam.id))\
+        .filter(Exam.user_id.in_(user_ids))
 
-        # Simple word overlap if no key points
-        model_words = set(model_lower.split())
-        user_words = set(user_lower.split())
-        overlap = len(model_words & user_words) / len(model_words) if model_words else 0
+    if completed_only:
+        query = query.filter(Exam.completed_at.isnot(None))
 
-        if overlap >= 0.3:
-            return True, overlap * 100, "Partial match with model answer"
-        else:
-            return False, overlap * 100, "Low similarity to model answer"
+    return dict(query.group_by(Exam.user_id).all())
 
 
 # Custom decorators for role-based access control
@@ -242,29 +242,35 @@ def superadmin_required(f):
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user for Flask-Login"""
-    db_session = get_session(db_engine)
+    """Load user for Flask-Login (a cached, read-only snapshot of the User row)"""
     try:
-        user = db_session.query(User).get(int(user_id))
-        return user
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    snapshot = get_cached_user(user_id)
+    if snapshot is not None:
+        return snapshot
+
+    db_session = get_db_session()
+    try:
+        user = db_session.query(User).get(user_id)
+        return cache_user(user) if user else None
     except:
+        db_session.rollback()
         return None
-    finally:
-        db_session.close()
 
 
 @app.context_processor
 def inject_org_settings():
     """Make organization settings available to all templates"""
-    db_session = get_session(db_engine)
+    db_session = get_db_session()
     try:
         org_settings = None
 
         # Try to get organization from current user
         if current_user.is_authenticated and current_user.organization:
-            org_settings = db_session.query(OrganizationSettings)\
-                .filter_by(organization_name=current_user.organization)\
-                .first()
+            org_settings = get_cached_org_settings(db_session, 'organization_name', current_user.organization)
 
         # If no org settings found, try to get from subdomain or path
         if not org_settings:
@@ -272,24 +278,71 @@ def inject_org_settings():
             host = request.host.split(':')[0]
             subdomain = host.split('.')[0] if '.' in host else None
             if subdomain and subdomain not in ['www', 'localhost', '127']:
-                org_settings = db_session.query(OrganizationSettings)\
-                    .filter_by(subdomain=subdomain)\
-                    .first()
+                org_settings = get_cached_org_settings(db_session, 'subdomain', subdomain)
 
             # Check URL path
             if not org_settings and request.path.startswith('/org/'):
                 path_parts = request.path.split('/')
                 if len(path_parts) > 2:
                     org_path = path_parts[2]
-                    org_settings = db_session.query(OrganizationSettings)\
-                        .filter_by(url_path=org_path)\
-                        .first()
+                    org_settings = get_cached_org_settings(db_session, 'url_path', org_path)
 
         return {'org_settings': org_settings}
     except:
+        db_session.rollback()
         return {'org_settings': None}
-    finally:
-        db_session.close()
+
+
+def org_theme_token(org_id):
+    """Signed token that keeps theme CSS URLs from being enumerated by organization ID"""
+    message = f'org-theme:{org_id}'.encode('utf-8')
+    return hmac.new(app.config['SECRET_KEY'].encode('utf-8'), message, hashlib.sha256).hexdigest()[:16]
+
+
+@app.template_global()
+def org_theme_css_url(org_settings):
+    """URL of an organization's theme CSS, versioned by when its settings last changed"""
+    return url_for('org_theme_css', org_id=org_settings.id, token=org_theme_token(org_settings.id),
+                   v=org_settings.get_theme_version())
+
+
+@app.route('/org-theme/<int:org_id>-<token>.css')
+def org_theme_css(org_id, token):
+    """
+    Organization theme and custom CSS, cacheable by browsers until the settings change
+
+    The stylesheet is served without login because organization login pages
+    use it too; the signed token in the URL keeps other organizations' custom
+    CSS from being fetched by guessing IDs.
+    """
+    if not hmac.compare_digest(token, org_theme_token(org_id)):
+        abort(404)
+
+    db_session = get_db_session()
+    org_settings = get_cached_org_settings(db_session, 'id', org_id)
+    requested_version = request.args.get('v', type=int)
+
+    # A page rendered from fresher settings than this worker's cache asks for a newer version
+    if org_settings and requested_version is not None and requested_version != org_settings.get_theme_version():
+        invalidate_org_settings()
+        org_settings = get_cached_org_settings(db_session, 'id', org_id)
+
+    if not org_settings:
+        abort(404)
+
+    css = org_settings.get_theme_css()
+    if org_settings.custom_css:
+        css += '\n' + org_settings.custom_css
+
+    response = app.response_class(css, mimetype='text/css')
+    response.set_etag(hashlib.sha256(css.encode('utf-8')).hexdigest()[:32])
+    if requested_version == org_settings.get_theme_version():
+        # The URL is versioned by updated_at, so the response can be cached for a long time
+        response.cache_control.public = True
+        response.cache_control.max_age = 60 * 60 * 24 * 365
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 @app.route('/')
@@ -313,27 +366,24 @@ def login():
             flash('Please provide both email and password', 'error')
             return redirect(url_for('login'))
 
-        db_session = get_session(db_engine)
-        try:
-            user = db_session.query(User).filter_by(email=email).first()
+        db_session = get_db_session()
+        user = db_session.query(User).filter_by(email=email).first()
 
-            if user and user.check_password(password):
-                # Login user with remember me option
-                login_user(user, remember=bool(remember))
+        if user and user.check_password(password):
+            # Login user with remember me option
+            login_user(user, remember=bool(remember))
 
-                # Make session permanent if remember me is checked
-                if remember:
-                    session.permanent = True
+            # Make session permanent if remember me is checked
+            if remember:
+                session.permanent = True
 
-                flash(f'Welcome back, {user.name}!', 'success')
+            flash(f'Welcome back, {user.name}!', 'success')
 
-                # Redirect to next page or index
-                next_page = request.args.get('next')
-                return redirect(next_page) if next_page else redirect(url_for('index'))
-            else:
-                flash('Invalid email or password', 'error')
-        finally:
-            db_session.close()
+            # Redirect to next page or index
+            next_page = request.args.get('next')
+            return redirect(next_page) if next_page else redirect(url_for('index'))
+        else:
+            flash('Invalid email or password', 'error')
 
     return render_template('login.html')
 
@@ -355,7 +405,7 @@ def register():
             flash('Please provide email, password, and name', 'error')
             return redirect(url_for('register'))
 
-        db_session = get_session(db_engine)
+        db_session = get_db_session()
         try:
             # Check if user already exists
             existing_user = db_session.query(User).filter_by(email=email).first()
@@ -380,8 +430,6 @@ def register():
         except Exception as e:
             db_session.rollback()
             flash(f'Registration failed: {str(e)}', 'error')
-        finally:
-            db_session.close()
 
     return render_template('register.html')
 
@@ -454,7 +502,7 @@ def upload():
 
             # Store document in database
             print("Saving to database...")
-            db_session = get_session(db_engine)
+            db_session = get_db_session()
             try:
                 new_document = Document(
                     filename=original_filename,
@@ -474,8 +522,6 @@ def upload():
                 db_session.rollback()
                 os.remove(file_path)  # Remove file if database insert fails
                 flash(f'Error saving document: {str(e)}', 'error')
-            finally:
-                db_session.close()
 
         except Exception as e:
             # Clean up file if anything goes wrong
@@ -491,70 +537,64 @@ def upload():
 @login_required
 def documents():
     """Display list of uploaded documents (organization-wide for students/teachers)"""
-    db_session = get_session(db_engine)
-    try:
-        # Students and teachers can see all documents in their organization
-        # This allows them to access study materials uploaded by teachers
-        if current_user.organization:
-            user_documents = db_session.query(Document)\
-                .filter_by(organization=current_user.organization)\
-                .order_by(Document.created_at.desc())\
-                .all()
-        else:
-            # Users without organization see only their own documents
-            user_documents = db_session.query(Document)\
-                .filter_by(uploaded_by=current_user.id)\
-                .order_by(Document.created_at.desc())\
-                .all()
-
-        return render_template('documents.html', documents=user_documents)
-    finally:
-        db_session.close()
+    db_session = get_db_session()
+    # Students and teachers can see all documents in their organization
+    # This allows them to access study materials uploaded by teachers
+    if current_user.organization:
+        user_documents = db_session.query(Document)\
+            .filter_by(organization=current_user.organization)\
+            .order_by(Document.created_at.desc())\
+            .all()
+    else:
+        # Users without organization see only their own documents
+        user_documents = db_session.query(Document)\
+            .filter_by(uploaded_by=current_user.id)\
+            .order_by(Document.created_at.desc())\
+            .all()
+
+    return render_template('documents.html', documents=user_documents)
 
 
 @app.route('/document/<int:document_id>')
 @login_required
 def view_document(document_id):
     """View document content and details (accessible to organization members)"""
-    db_session = get_session(db_engine)
-    try:
-        # Get document and verify ownership
-        document = db_session.query(Document).get(document_id)
+    db_session = get_db_session()
+    # Get document with its content and verify ownership
+    document = db_session.query(Document).options(undefer(Document.content)).get(document_id)
 
-        if not document:
-            flash('Document not found', 'error')
-            return redirect(url_for('documents'))
+    if not document:
+        flash('Document not found', 'error')
+        return redirect(url_for('documents'))
 
-        # Check if user has access to this document
-        # Users can access documents in their organization or their own documents
-        has_access = (
-            document.uploaded_by == current_user.id or
-            (current_user.organization and document.organization == current_user.organization) or
-            current_user.is_superadmin()
-        )
+    # Check if user has access to this document
+    # Users can access documents in their organization or their own documents
+    has_access = (
+        document.uploaded_by == current_user.id or
+        (current_user.organization and document.organization == current_user.organization) or
+        current_user.is_superadmin()
+    )
 
-        if not has_access:
-            flash('You do not have permission to view this document', 'error')
-            return redirect(url_for('documents'))
+    if not has_access:
+        flash('You do not have permission to view this document', 'error')
+        return redirect(url_for('documents'))
 
-        # Get questions generated from this document (if any)
-        questions = db_session.query(Question)\
-            .filter_by(document_id=document_id)\
-            .all()
+    # Get questions generated from this document (if any)
+    questions = db_session.query(Question)\
+        .filter_by(document_id=document_id)\
+        .all()
 
-        return render_template('view_document.html',
-                               document=document,
-                               questions=questions,
-                               question_count=len(questions))
-    finally:
-        db_session.close()
+    return render_template('view_document.html',
+                           document=document,
+                           questions=questions,
+                           question_count=len(questions))
 
 
 @app.route('/document/<int:document_id>/delete', methods=['POST'])
 @login_required
 def delete_document(document_id):
     """Delete a document and its associated data"""
-    db_session = get_session(db_engine)
+    db_session = get_db_session()
     try:
         # Get document and verify ownership
         document = db_session.query(Document).get(document_id)
@@ -579,8 +619,6 @@ def delete_document(document_id):
     except Exception as e:
         db_session.rollback()
         flash(f'Error deleting document: {str(e)}', 'error')
-    finally:
-        db_session.close()
 
     return redirect(url_for('documents'))
 
@@ -589,94 +627,137 @@ def delete_document(document_id):
 @login_required
 def generate_questions(document_id):
     """Generate questions from a document using AI"""
-    db_session = get_session(db_engine)
-    try:
-        # Get document and verify ownership
-        document = db_session.query(Document).get(document_id)
+    db_session = get_db_session()
+    # Get document with its content and verify ownership
+    document = db_session.query(Document).options(undefer(Document.content)).get(document_id)
 
-        if not document:
-            flash('Document not found', 'error')
-            return redirect(url_for('documents'))
+    if not document:
+        flash('Document not found', 'error')
+        return redirect(url_for('documents'))
 
-        # Check if user owns this document or is a superadmin/admin with org access
-        is_superadmin = current_user.is_superadmin()
-        is_org_admin = current_user.is_org_admin() and current_user.organization == document.organization
+    # Check if user owns this document or is a superadmin/admin with org access
+    is_superadmin = current_user.is_superadmin()
+    is_org_admin = current_user.is_org_admin() and current_user.organization == document.organization
 
-        if not (document.uploaded_by == current_user.id or is_superadmin or is_org_admin):
-            flash('You do not have permission to access this document', 'error')
-            return redirect(url_for('documents'))
+    if not (document.uploaded_by == current_user.id or is_superadmin or is_org_admin):
+        flash('You do not have permission to access this document', 'error')
+        return redirect(url_for('documents'))
 
-        if request.method == 'POST':
-            num_mcq = request.form.get('num_mcq', 0, type=int)
-            num_true_false = request.form.get('num_true_false', 0, type=int)
-            num_short_answer = request.form.get('num_short_answer', 0, type=int)
+    if request.method == 'POST':
+        num_mcq = request.form.get('num_mcq', 0, type=int)
+        num_true_false = request.form.get('num_true_false', 0, type=int)
+        num_short_answer = request.form.get('num_short_answer', 0, type=int)
 
-            total_questions = num_mcq + num_true_false + num_short_answer
+        total_questions = num_mcq + num_true_false + num_short_answer
 
-            if total_questions == 0:
-                flash('Please specify at least one question to generate', 'error')
-                return redirect(url_for('generate_questions', document_id=document_id))
+        if total_questions == 0:
+            flash('Please specify at least one question to generate', 'error')
+            return redirect(url_for('generate_questions', document_id=document_id))
 
-            if total_questions > 50:
-                flash('Maximum 50 questions can be generated at once', 'error')
+        if total_questions > 50:
+            flash('Maximum 50 questions can be generated at once', 'error')
+            return redirect(url_for('generate_questions', document_id=document_id))
+
+        try:
+            # Get user's AI preferences (teachers/admins can customize, students use default)
+            provider = current_user.ai_provider or 'gemini'
+            model = current_user.ai_model or 'gemini-2.5-flash'
+
+            # Surface the organization's rate limit instead of queueing a job that would fail;
+            # the job waits for tokens while it runs, so check for roughly the calls it will make
+            ai_calls = estimate_ai_calls(document.content or '', num_mcq, num_true_false, num_short_answer)
+            retry_after = get_rate_limiter().retry_after(make_rate_limit_key(current_user.organization, provider),
+                                                         calls=ai_calls)
+            if retry_after > 0:
+                flash(f'AI rate limit reached for your organization. Please try again in {retry_after:.0f} seconds.', 'warning')
                 return redirect(url_for('generate_questions', document_id=document_id))
 
-            try:
-                # Get user's AI preferences (teachers/admins can customize, students use default)
-                provider = current_user.ai_provider or 'gemini'
-                model = current_user.ai_model or 'gemini-2.5-flash'
-
-                # Get organization's API keys if available
-                openai_key = None
-                gemini_key = None
-
-                if current_user.organization:
-                    org_settings = db_session.query(OrganizationSettings)\
-                        .filter_by(organization_name=current_user.organization)\
-                        .first()
-
-                    if org_settings:
-                        openai_key = org_settings.openai_api_key
-                        gemini_key = org_settings.gemini_api_key
-
-                # Generate mixed questions using user's preferred AI with organization API keys
-                results = generate_questions_mixed(
-                    text=document.content,
-                    num_mcq=num_mcq,
-                    num_true_false=num_true_false,
-                    num_short_answer=num_short_answer,
-                    model=model,
-                    provider=provider,
-                    openai_api_key=openai_key,
-                    gemini_api_key=gemini_key
-                )
+            # Generation runs on the background worker pool; the page polls for the result
+            job = enqueue_generation_job(
+                db_engine,
+                db_session,
+                user=current_user,
+                document=document,
+                num_mcq=num_mcq,
+                num_true_false=num_true_false,
+                num_short_answer=num_short_answer,
+                provider=provider,
+                model=model
+            )
 
-                # Store generated questions in session for review
-                session['generated_questions'] = {
-                    'mcq': results.get('mcq', []),
-                    'true_false': results.get('true_false', []),
-                    'short_answer': results.get('short_answer', []),
-                    'document_id': document_id
-                }
+            return redirect(url_for('generate_questions', document_id=document_id, job_id=job.id))
 
-                if results.get('errors'):
-                    for error in results['errors']:
-                        flash(error, 'warning')
+        except Exception as e:
+            db_session.rollback()
+            flash(f'Error generating questions: {str(e)}', 'error')
+
+    # Show progress for a job started from this page
+    job = None
+    job_id = request.args.get('job_id', type=int)
+    if job_id:
+        job = db_session.query(GenerationJob)\
+            .filter_by(id=job_id, user_id=current_user.id, document_id=document_id)\
+            .first()
 
-                total_generated = len(results.get('mcq', [])) + len(results.get('true_false', [])) + len(results.get('short_answer', []))
+    return render_template('generate_questions.html', document=document, job=job)
 
-                if total_generated > 0:
-                    flash(f'Successfully generated {total_generated} questions! Please review and approve.', 'success')
-                    return redirect(url_for('review_questions'))
-                else:
-                    flash('No questions were generated. Please try again.', 'error')
 
-            except Exception as e:
-                flash(f'Error generating questions: {str(e)}', 'error')
+@app.route('/generation-jobs/<int:job_id>/status')
+@login_required
+def generation_job_status(job_id):
+    """Lightweight JSON status of a background generation job (polled by the generate page)"""
+    db_session = get_db_session()
+    job = db_session.query(GenerationJob)\
+        .filter_by(id=job_id, user_id=current_user.id)\
+        .first()
 
-        return render_template('generate_questions.html', document=document)
-    finally:
-        db_session.close()
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+
+    fail_if_stale(db_session, job)
+
+    payload = job_status(job)
+    payload['success'] = True
+    if job.is_finished():
+        payload['review_url'] = url_for('review_generation_job', job_id=job.id)
+    return jsonify(payload)
+
+
+@app.route('/generation-jobs/<int:job_id>/review')
+@login_required
+def review_generation_job(job_id):
+    """Move the results of a finished generation job into the review flow"""
+    db_session = get_db_session()
+    job = db_session.query(GenerationJob)\
+        .filter_by(id=job_id, user_id=current_user.id)\
+        .first()
+
+    if not job:
+        flash('Generation job not found', 'error')
+        return redirect(url_for('documents'))
+
+    if not job.is_finished():
+        return redirect(url_for('generate_questions', document_id=job.document_id, job_id=job.id))
+
+    for error in job.errors_json or []:
+        flash(error, 'warning')
+
+    total_generated = job.total_generated()
+    if total_generated == 0:
+        flash('No questions were generated. Please try again.', 'error')
+        return redirect(url_for('generate_questions', document_id=job.document_id))
+
+    # Store generated questions in session for review
+    results = job.result_json
+    session['generated_questions'] = {
+        'mcq': results.get('mcq', []),
+        'true_false': results.get('true_false', []),
+        'short_answer': results.get('short_answer', []),
+        'document_id': job.document_id
+    }
+
+    flash(f'Successfully generated {total_generated} questions! Please review and approve.', 'success')
+    return redirect(url_for('review_questions'))
 
 
 @app.route('/review-questions', methods=['GET', 'POST'])
@@ -689,19 +770,16 @@ def review_questions():
 
     generated_data = session['generated_questions']
 
-    db_session = get_session(db_engine)
-    try:
-        document = db_session.query(Document).get(generated_data['document_id'])
+    db_session = get_db_session()
+    document = db_session.query(Document).get(generated_data['document_id'])
 
-        if not document or document.uploaded_by != current_user.id:
-            flash('Invalid document access', 'error')
-            return redirect(url_for('documents'))
+    if not document or document.uploaded_by != current_user.id:
+        flash('Invalid document access', 'error')
+        return redirect(url_for('documents'))
 
-        return render_template('review_questions.html',
-                             questions=generated_data,
-                             document=document)
-    finally:
-        db_session.close()
+    return render_template('review_questions.html',
+                         questions=generated_data,
+                         document=document)
 
 
 @app.route('/save-questions', methods=['POST'])
@@ -712,7 +790,7 @@ def save_questions():
         flash('No questions to save', 'error')
         return redirect(url_for('documents'))
 
-    db_session = get_session(db_engine)
+    db_session = get_db_session()
     try:
         generated_data = session['generated_questions']
         document_id = generated_data['document_id']
@@ -730,14 +808,10 @@ def save_questions():
             flash('No questions selected for approval', 'warning')
             return redirect(url_for('review_questions'))
 
-        saved_count = 0
-        validation_errors = []
-
-        # Get existing questions for duplicate detection
-        existing_questions_obj = db_session.query(Question).filter_by(document_id=document_id).all()
-        existing_question_texts = [q.question_text for q in existing_questions_obj]
+        # Collect approved questions (with any edits) for batch validation
+        candidates = []
 
-        # Process MCQ questions
+        # MCQ questions
         for idx, q in enumerate(generated_data.get('mcq', [])):
             question_id = f'mcq_{idx}'
             if question_id in approved_ids:
@@ -750,84 +824,38 @@ def save_questions():
                 correct_answer = request.form.get(f'{question_id}_correct', q['correct_answer'])
                 explanation = request.form.get(f'{question_id}_explanation', q.get('explanation', ''))
 
-                # Build options dict
-                options = {'A': option_a, 'B': option_b, 'C': option_c, 'D': option_d}
-
-                # Validate and auto-fix
-                is_valid, errors, fixed_data = validate_question_complete(
-                    question_text=question_text,
-                    question_type='mcq',
-                    correct_answer=correct_answer,
-                    options=options,
-                    existing_questions=existing_question_texts,
-                    auto_fix=True
-                )
-
-                if not is_valid:
-                    validation_errors.append(f"MCQ Question {idx + 1}: {', '.join(errors)}")
-                    continue
-
-                # Use fixed data
-                new_question = Question(
-                    question_text=fixed_data['question_text'],
-                    question_type='mcq',
-                    options_json=fixed_data['options'],
-                    correct_answer=correct_answer,
-                    explanation=explanation,
-                    document_id=document_id,
-                    difficulty=fixed_data['difficulty'],
-                    status='approved',
-                    created_by=current_user.id
-                )
-                db_session.add(new_question)
-                existing_question_texts.append(fixed_data['question_text'])
-                saved_count += 1
+                candidates.append({
+                    'label': f'MCQ Question {idx + 1}',
+                    'question_text': question_text,
+                    'question_type': 'mcq',
+                    'correct_answer': correct_answer,
+                    'options': {'A': option_a, 'B': option_b, 'C': option_c, 'D': option_d},
+                    'fields': {'correct_answer': correct_answer, 'explanation': explanation}
+                })
 
-        # Process True/False questions
+        # True/False questions
         for idx, q in enumerate(generated_data.get('true_false', [])):
             question_id = f'tf_{idx}'
             if question_id in approved_ids:
-                question_text = request.form.get(f'{question_id}_question', q['question'])
                 correct_answer = request.form.get(f'{question_id}_correct', str(q['correct_answer']).lower())
-                explanation = request.form.get(f'{question_id}_explanation', q.get('explanation', ''))
-
-                # Validate and auto-fix
-                is_valid, errors, fixed_data = validate_question_complete(
-                    question_text=question_text,
-                    question_type='true_false',
-                    correct_answer=correct_answer,
-                    existing_questions=existing_question_texts,
-                    auto_fix=True
-                )
-
-                if not is_valid:
-                    validation_errors.append(f"True/False Question {idx + 1}: {', '.join(errors)}")
-                    continue
-
-                new_question = Question(
-                    question_text=fixed_data['question_text'],
-                    question_type='true_false',
-                    options_json=None,  # True/False questions don't have options
-                    correct_answer=correct_answer,
-                    model_answer=None,
-                    key_points=None,
-                    explanation=explanation,
-                    document_id=document_id,
-                    difficulty=fixed_data['difficulty'],
-                    status='approved',
-                    created_by=current_user.id
-                )
-                db_session.add(new_question)
-                existing_question_texts.append(fixed_data['question_text'])
-                saved_count += 1
-
-        # Process Short Answer questions
+                candidates.append({
+                    'label': f'True/False Question {idx + 1}',
+                    'question_text': request.form.get(f'{question_id}_question', q['question']),
+                    'question_type': 'true_false',
+                    'correct_answer': correct_answer,
+                    'fields': {
+                        'options_json': None,  # True/False questions don't have options
+                        'correct_answer': correct_answer,
+                        'model_answer': None,
+                        'key_points': None,
+                        'explanation': request.form.get(f'{question_id}_explanation', q.get('explanation', ''))
+                    }
+                })
+
+        # Short Answer questions
         for idx, q in enumerate(generated_data.get('short_answer', [])):
             question_id = f'sa_{idx}'
             if question_id in approved_ids:
-                question_text = request.form.get(f'{question_id}_question', q['question'])
-                model_answer = request.form.get(f'{question_id}_model_answer', q.get('model_answer', ''))
-
                 # Get key points (assuming they're submitted as a textarea with newlines)
                 key_points_text = request.form.get(f'{question_id}_key_points', '')
                 if key_points_text:
@@ -835,31 +863,45 @@ def save_questions():
                 else:
                     key_points = q.get('key_points', [])
 
-                # Validate and auto-fix
-                is_valid, errors, fixed_data = validate_question_complete(
-                    question_text=question_text,
-                    question_type='short_answer',
-                    existing_questions=existing_question_texts,
-                    auto_fix=True
-                )
+                candidates.append({
+                    'label': f'Short Answer Question {idx + 1}',
+                    'question_text': request.form.get(f'{question_id}_question', q['question']),
+                    'question_type': 'short_answer',
+                    'fields': {
+                        'model_answer': request.form.get(f'{question_id}_model_answer', q.get('model_answer', '')),
+                        'key_points': key_points
+                    }
+                })
+
+        # Validate and auto-fix, checking duplicates against the document's stored
+        # question fingerprints and the other approved questions
+        duplicate_index = PersistedDuplicateIndex(db_session, document_id=document_id)
+        results = validate_questions_batch(candidates, duplicate_index=duplicate_index, auto_fix=True)
 
-                if not is_valid:
-                    validation_errors.append(f"Short Answer Question {idx + 1}: {', '.join(errors)}")
-                    continue
-
-                new_question = Question(
-                    question_text=fixed_data['question_text'],
-                    question_type='short_answer',
-                    model_answer=model_answer,
-                    key_points=key_points,
-                    document_id=document_id,
-                    difficulty=fixed_data['difficulty'],
-                    status='approved',
-                    created_by=current_user.id
-                )
-                db_session.add(new_question)
-                existing_question_texts.append(fixed_data['question_text'])
-                saved_count += 1
+        saved_count = 0
+        validation_errors = []
+
+        for candidate, (is_valid, errors, fixed_data) in zip(candidates, results):
+            if not is_valid:
+                validation_errors.append(f"{candidate['label']}: {', '.join(errors)}")
+                continue
+
+            # Use fixed data
+            fields = dict(candidate['fields'])
+            if candidate['question_type'] == 'mcq':
+                fields['options_json'] = fixed_data['options']
+
+            new_question = Question(
+                question_text=fixed_data['question_text'],
+                question_type=candidate['question_type'],
+                **fields,
+                document_id=document_id,
+                difficulty=fixed_data['difficulty'],
+                status='approved',
+                created_by=current_user.id
+            )
+            db_session.add(new_question)
+            saved_count += 1
 
         # Show validation errors if any
         if validation_errors:
@@ -885,98 +927,124 @@ def save_questions():
         db_session.rollback()
         flash(f'Error saving questions: {str(e)}', 'error')
         return redirect(url_for('review_questions'))
-    finally:
-        db_session.close()
 
 
-@app.route('/question-bank')
-@login_required
-def question_bank():
-    """Display all approved questions (organization-wide)"""
-    db_session = get_session(db_engine)
-    try:
-        # Get filter parameters
-        document_id = request.args.get('document_id', type=int)
-        question_type = request.args.get('type')
-        status = request.args.get('status', 'approved')
-
-        # Build query - show all questions from organization's documents
-        if current_user.organization:
-            # Users with organization see all questions from their organization
-            query = db_session.query(Question).join(Document).filter(
-                Document.organization == current_user.organization
-            )
-        else:
-            # Users without organization see only their own questions
-            query = db_session.query(Question).join(Document).filter(
-                Document.uploaded_by == current_user.id
-            )
+def build_question_bank_query(db_session, document_id=None, question_type=None, status=None):
+    """
+    Build the question bank query for the current user (organization-wide, or own questions)
 
-        if document_id:
-            query = query.filter(Question.document_id == document_id)
+    Args:
+        db_session: Database session
+        document_id: Only questions from this document
+        question_type: Only questions of this type
+        status: Only questions with this status
 
-        if question_type:
-            query = query.filter(Question.question_type == question_type)
+    Returns:
+        Query of Question joined to Document
+    """
+    if current_user.organization:
+        # Users with organization see all questions from their organization
+        query = db_session.query(Question).join(Document).filter(
+            Document.organization == current_user.organization
+        )
+    else:
+        # Users without organization see only their own questions
+        query = db_session.query(Question).join(Document).filter(
+            Document.uploaded_by == current_user.id
+        )
 
-        if status:
-            query = query.filter(Question.status == status)
+    if document_id:
+        query = query.filter(Question.document_id == document_id)
 
-        questions = query.order_by(Question.created_at.desc()).all()
+    if question_type:
+        query = query.filter(Question.question_type == question_type)
 
-        # Get organization's documents for filter dropdown
-        if current_user.organization:
-            documents = db_session.query(Document).filter_by(
-                organization=current_user.organization
-            ).all()
-        else:
-            documents = db_session.query(Document).filter_by(
-                uploaded_by=current_user.id
-            ).all()
-
-        # Count by type - match the same logic as main query (organization-wide or user-only)
-        if current_user.organization:
-            # Count all questions from organization
-            base_filter = (Document.organization == current_user.organization,)
-        else:
-            # Count only user's questions
-            base_filter = (Document.uploaded_by == current_user.id,)
-
-        total_mcq = db_session.query(Question).join(Document).filter(
-            *base_filter,
-            Question.question_type == 'mcq',
-            Question.status == 'approved'
-        ).count()
-
-        total_tf = db_session.query(Question).join(Document).filter(
-            *base_filter,
-            Question.question_type == 'true_false',
-            Question.status == 'approved'
-        ).count()
-
-        total_sa = db_session.query(Question).join(Document).filter(
-            *base_filter,
-            Question.question_type == 'short_answer',
-            Question.status == 'approved'
-        ).count()
-
-        return render_template('question_bank.html',
-                             questions=questions,
-                             documents=documents,
-                             total_mcq=total_mcq,
-                             total_tf=total_tf,
-                             total_sa=total_sa,
-                             selected_document=document_id,
-                             selected_type=question_type,
-                             selected_status=status)
-    finally:
-        db_session.close()
+    if status:
+        query = query.filter(Question.status == status)
+
+    return query
+
+
+def get_question_bank_page(db_session):
+    """
+    Load one page of the question bank using the filter and cursor query parameters
+
+    Returns:
+        Page of questions, with document and creator loaded
+    """
+    query = build_question_bank_query(db_session,
+                                      document_id=request.args.get('document_id', type=int),
+                                      question_type=request.args.get('type'),
+                                      status=request.args.get('status', 'approved'))
+    query = query.options(joinedload(Question.document), joinedload(Question.creator))
+
+    return paginate_keyset(query, Question,
+                           cursor=request.args.get('cursor'),
+                           per_page=request.args.get('per_page', type=int))
+
+
+@app.route('/question-bank')
+@login_required
+def question_bank():
+    """Display approved questions (organization-wide), one page at a time"""
+    db_session = get_db_session()
+    # Get filter parameters
+    document_id = request.args.get('document_id', type=int)
+    question_type = request.args.get('type')
+    status = request.args.get('status', 'approved')
+
+    page = get_question_bank_page(db_session)
+
+    # Get organization's documents for filter dropdown
+    documents_query = db_session.query(Document.id, Document.filename)
+    if current_user.organization:
+        documents_query = documents_query.filter(Document.organization == current_user.organization)
+    else:
+        documents_query = documents_query.filter(Document.uploaded_by == current_user.id)
+    documents = documents_query.order_by(Document.filename).all()
+
+    # Count by type and status in one grouped query - same scope as the main query
+    type_counts = dict(
+        build_question_bank_query(db_session)
+        .with_entities(Question.question_type, func.count(Question.id))
+        .filter(Question.status == 'approved')
+        .group_by(Question.question_type)
+        .all()
+    )
+
+    return render_template('question_bank.html',
+                         questions=page.items,
+                         next_cursor=page.next_cursor,
+                         per_page=page.per_page,
+                         documents=documents,
+                         total_mcq=type_counts.get('mcq', 0),
+                         total_tf=type_counts.get('true_false', 0),
+                         total_sa=type_counts.get('short_answer', 0),
+                         selected_document=document_id,
+                         selected_type=question_type,
+                         selected_status=status)
+
+
+@app.route('/question-bank/data')
+@login_required
+def question_bank_data():
+    """Next page of the question bank as rendered cards (for infinite scroll)"""
+    db_session = get_db_session()
+    page = get_question_bank_page(db_session)
+
+    return jsonify({
+        'success': True,
+        'html': render_template('question_bank_items.html', questions=page.items),
+        'count': len(page.items),
+        'next_cursor': page.next_cursor
+    })
 
 
 @app.route('/question/<int:question_id>/delete', methods=['POST'])
 @login_required
 def delete_question(question_id):
     """Delete a question"""
-    db_session = get_session(db_engine)
+    db_session = get_db_session()
     try:
         question = db_session.query(Question).get(question_id)
 
@@ -996,108 +1064,129 @@ def delete_question(question_id):
     except Exception as e:
         db_session.rollback()
         flash(f'Error deleting question: {str(e)}', 'error')
-    finally:
-        db_session.close()
 
     return redirect(url_for('question_bank'))
 
 
+LEGACY_EXAM_SESSION_KEYS = ('exam_questions', 'exam_document_id', 'exam_start_time', 'exam_duration',
+                            'exam_answers', 'question_times', 'question_start_time')
+
+
+def clear_exam_session():
+    """Remove the active exam (and exam data kept by older versions) from the session"""
+    for key in ('exam_id',) + LEGACY_EXAM_SESSION_KEYS:
+        session.pop(key, None)
+
+
+def get_exam_attempt(db_session, exam_id):
+    """
+    Get the server-side state of the session's exam
+
+    Exams started before exam state moved server-side still carry it in the
+    session; it is moved to the database on first use so those exams can
+    be finished.
+    """
+    attempt = exam_state.get_attempt(db_session, exam_id)
+    if attempt is None and session.get('exam_questions'):
+        exam = db_session.query(Exam).get(exam_id)
+        if exam and not exam.is_completed():
+            attempt = exam_state.attempt_from_session(db_session, exam, session)
+        for key in LEGACY_EXAM_SESSION_KEYS:
+            session.pop(key, None)
+    return attempt
+
+
 @app.route('/exam', methods=['GET', 'POST'])
 @login_required
 def exam():
     """Take exam - select document and generate questions"""
-    db_session = get_session(db_engine)
-    try:
-        # Check if there's an active exam session
-        if 'exam_id' in session and 'exam_questions' in session:
-            exam_id = session.get('exam_id')
-            exam = db_session.query(Exam).get(exam_id)
+    db_session = get_db_session()
+    # Check if there's an active exam session
+    if 'exam_id' in session:
+        exam_id = session.get('exam_id')
+        exam = db_session.query(Exam).get(exam_id)
 
-            # If exam exists and is not completed, redirect to continue it
-            if exam and not exam.is_completed():
-                flash('You have an exam in progress. Continue where you left off.', 'info')
-                return redirect(url_for('start_exam'))
-
-        # Get documents - show organization documents if user has organization, otherwise just their own
-        if current_user.organization:
-            # Show all documents from the user's organization
-            user_documents = db_session.query(Document)\
-                .filter_by(organization=current_user.organization)\
-                .order_by(Document.created_at.desc())\
-                .all()
-        else:
-            # Show only user's own documents
-            user_documents = db_session.query(Document)\
-                .filter_by(uploaded_by=current_user.id)\
-                .order_by(Document.created_at.desc())\
-                .all()
-
-        # Count questions for each document
-        for doc in user_documents:
-            doc.question_count = db_session.query(Question)\
-                .filter_by(document_id=doc.id, status='approved')\
-                .count()
+        # If exam exists and is not completed, redirect to continue it
+        if exam and not exam.is_completed():
+            flash('You have an exam in progress. Continue where you left off.', 'info')
+            return redirect(url_for('start_exam'))
 
-        if request.method == 'POST':
-            document_id = request.form.get('document_id')
-            num_questions = request.form.get('num_questions', 10, type=int)
-            difficulty = request.form.get('difficulty', 'all')
-            duration = request.form.get('duration', 30, type=int)  # Get user-selected duration
-
-            if not document_id:
-                flash('Please select a document', 'error')
-                return redirect(url_for('exam'))
-
-            # Get questions from selected document
-            query = db_session.query(Question)\
-                .filter_by(document_id=document_id, status='approved')
-
-            if difficulty != 'all':
-                query = query.filter_by(difficulty=difficulty)
-
-            # Get all matching questions
-            all_questions = query.all()
-
-            if not all_questions:
-                flash('No questions available for this document. Please generate questions first.', 'warning')
-                return redirect(url_for('exam'))
-
-            # Random selection using a seed for reproducibility
-            import random
-            num_questions = min(num_questions, len(all_questions))
-
-            # Create a seed based on user ID and timestamp for uniqueness
-            random_seed = int(current_user.id * 1000 + datetime.utcnow().timestamp() % 1000)
-            random.seed(random_seed)
-            selected_questions = random.sample(all_questions, num_questions)
-            random.seed()  # Reset to system time
-
-            # Create exam record in database (in progress)
-            new_exam = Exam(
-                user_id=current_user.id,
-                total_questions=num_questions,
-                completed_at=None  # Not completed yet
-            )
-            db_session.add(new_exam)
-            db_session.flush()  # Get exam ID
-
-            # Store exam session data
-            session['exam_id'] = new_exam.id
-            session['exam_questions'] = [q.id for q in selected_questions]
-            session['exam_document_id'] = int(document_id)
-            session['exam_start_time'] = datetime.utcnow().isoformat()
-            session['exam_duration'] = int(duration)  # User-selected duration (ensure integer)
-            session['exam_answers'] = {}  # Store user answers
-            session['question_times'] = {}  # Track time per question
-            session['question_start_time'] = None  # Track current question start time
+    # Get documents - show organization documents if user has organization, otherwise just their own
+    if current_user.organization:
+        # Show all documents from the user's organization
+        documents_query = db_session.query(Document)\
+            .filter_by(organization=current_user.organization)
+    else:
+        # Show only user's own documents
+        documents_query = db_session.query(Document)\
+            .filter_by(uploaded_by=current_user.id)
+
+    user_documents = documents_query.order_by(Document.created_at.desc()).all()
+
+    # Count approved questions for all documents at once
+    question_counts = count_questions_by_document(
+        db_session, documents_query.with_entities(Document.id), status='approved'
+    )
+    for doc in user_documents:
+        doc.question_count = question_counts.get(doc.id, 0)
 
-            db_session.commit()
+    if request.method == 'POST':
+        document_id = request.form.get('document_id')
+        num_questions = request.form.get('num_questions', 10, type=int)
+        difficulty = request.form.get('difficulty', 'all')
+        duration = request.form.get('duration', 30, type=int)  # Get user-selected duration
 
-            return redirect(url_for('start_exam'))
+        if not document_id:
+            flash('Please select a document', 'error')
+            return redirect(url_for('exam'))
 
-        return render_template('exam.html', documents=user_documents)
-    finally:
-        db_session.close()
+        # Get questions from selected document
+        query = db_session.query(Question)\
+            .filter_by(document_id=document_id, status='approved')
+
+        if difficulty != 'all':
+            query = query.filter_by(difficulty=difficulty)
+
+        # Get all matching questions
+        all_questions = query.all()
+
+        if not all_questions:
+            flash('No questions available for this document. Please generate questions first.', 'warning')
+            return redirect(url_for('exam'))
+
+        # Random selection using a seed for reproducibility
+        import random
+        num_questions = min(num_questions, len(all_questions))
+
+        # Create a seed based on user ID and timestamp for uniqueness
+        random_seed = int(current_user.id * 1000 + datetime.utcnow().timestamp() % 1000)
+        random.seed(random_seed)
+        selected_questions = random.sample(all_questions, num_questions)
+        random.seed()  # Reset to system time
+
+        # Create exam record in database (in progress)
+        new_exam = Exam(
+            user_id=current_user.id,
+            total_questions=num_questions,
+            completed_at=None  # Not completed yet
+        )
+        db_session.add(new_exam)
+        db_session.flush()  # Get exam ID
+
+        # Exam state is kept server-side; the session only carries the exam ID
+        exam_state.start_attempt(db_session, new_exam,
+                                 question_ids=[q.id for q in selected_questions],
+                                 document_id=int(document_id),
+                                 duration=int(duration))  # User-selected duration (ensure integer)
+
+        db_session.commit()
+
+        clear_exam_session()
+        session['exam_id'] = new_exam.id
+
+        return redirect(url_for('start_exam'))
+
+    return render_template('exam.html', documents=user_documents)
 
 
 @app.route('/start-exam')
@@ -1105,117 +1194,154 @@ def exam():
 def start_exam():
     """Start taking the exam (handles browser refresh)"""
     # Check if exam session exists
-    if 'exam_questions' not in session or 'exam_id' not in session:
+    if 'exam_id' not in session:
         flash('No active exam session. Please start a new exam.', 'warning')
         return redirect(url_for('exam'))
 
-    db_session = get_session(db_engine)
-    try:
-        exam_id = session.get('exam_id')
-        exam = db_session.query(Exam).get(exam_id)
+    db_session = get_db_session()
+    exam_id = session.get('exam_id')
+    exam = db_session.query(Exam).get(exam_id)
 
-        # Check if exam is already completed
-        if exam and exam.is_completed():
-            flash('This exam has already been completed.', 'warning')
-            session.pop('exam_id', None)
-            session.pop('exam_questions', None)
-            session.pop('exam_answers', None)
-            session.pop('exam_start_time', None)
-            session.pop('exam_duration', None)
-            session.pop('question_times', None)
-            session.pop('submission_failed', None)
-            session.pop('submission_error', None)
-            return redirect(url_for('exam_results', exam_id=exam.id))
+    # Check if exam is already completed
+    if exam and exam.is_completed():
+        flash('This exam has already been completed.', 'warning')
+        clear_exam_session()
+        session.pop('submission_failed', None)
+        session.pop('submission_error', None)
+        return redirect(url_for('exam_results', exam_id=exam.id))
 
-        # Check if submission has failed previously (infinite loop prevention)
-        if session.get('submission_failed'):
-            submission_error = session.get('submission_error', 'Unknown error')
-            session.pop('submission_failed', None)
-            session.pop('submission_error', None)
+    # Check if submission has failed previously (infinite loop prevention)
+    if session.get('submission_failed'):
+        submission_error = session.get('submission_error', 'Unknown error')
+        session.pop('submission_failed', None)
+        session.pop('submission_error', None)
 
-            # Show helpful error message
-            if 'Data too long' in submission_error or '1406' in submission_error:
-                flash('Database migration required: Your answer is too long. Please contact support to run: python3 migrate_user_answer_column.py', 'error')
-            else:
-                flash(f'Previous submission failed: {submission_error}. Please try again or contact support.', 'error')
+        # Show helpful error message
+        if 'Data too long' in submission_error or '1406' in submission_error:
+            flash('Database migration required: Your answer is too long. Please contact support to run: python3 migrate_user_answer_column.py', 'error')
+        else:
+            flash(f'Previous submission failed: {submission_error}. Please try again or contact support.', 'error')
 
-        # Get questions for the exam
-        question_ids = session.get('exam_questions', [])
-        questions = db_session.query(Question).filter(Question.id.in_(question_ids)).all()
+    attempt = get_exam_attempt(db_session, exam_id)
+    if not attempt:
+        clear_exam_session()
+        flash('No active exam session. Please start a new exam.', 'warning')
+        return redirect(url_for('exam'))
 
-        if not questions:
-            flash('No questions found. Please start a new exam.', 'error')
-            return redirect(url_for('exam'))
+    # Get questions for the exam
+    question_ids = attempt.question_ids or []
+    questions = db_session.query(Question).filter(Question.id.in_(question_ids)).all()
 
-        # Sort questions by their order in session
-        questions_dict = {q.id: q for q in questions}
-        ordered_questions = [questions_dict[qid] for qid in question_ids if qid in questions_dict]
-
-        # Get exam metadata
-        start_time = session.get('exam_start_time')
-        duration = int(session.get('exam_duration', 30))  # Ensure duration is an integer
-        user_answers = session.get('exam_answers', {})
-        question_times = session.get('question_times', {})
-
-        return render_template('take_exam.html',
-                             questions=ordered_questions,
-                             start_time=start_time,
-                             duration=duration,
-                             user_answers=user_answers,
-                             question_times=question_times,
-                             total_questions=len(ordered_questions),
-                             exam_id=exam_id)
-    finally:
-        db_session.close()
+    if not questions:
+        flash('No questions found. Please start a new exam.', 'error')
+        return redirect(url_for('exam'))
+
+    # Sort questions by their order in the exam
+    questions_dict = {q.id: q for q in questions}
+    ordered_questions = [questions_dict[qid] for qid in question_ids if qid in questions_dict]
+
+    # Get exam metadata
+    start_time = attempt.started_at.isoformat()
+    duration = int(attempt.duration or 30)  # Ensure duration is an integer
+    user_answers, question_times = exam_state.load_answers(db_session, exam_id)
+
+    return render_template('take_exam.html',
+                         questions=ordered_questions,
+                         start_time=start_time,
+                         duration=duration,
+                         user_answers=user_answers,
+                         question_times=question_times,
+                         total_questions=len(ordered_questions),
+                         exam_id=exam_id)
 
 
 @app.route('/save-answer', methods=['POST'])
 @login_required
 def save_answer():
     """Save user answer via AJAX with time tracking"""
-    question_id = request.json.get('question_id')
-    answer = request.json.get('answer')
-    time_spent = request.json.get('time_spent', 0)  # Time in seconds
+    data = request.get_json(silent=True) or {}
+    question_id = data.get('question_id')
+    answer = data.get('answer')
+    time_spent = data.get('time_spent', 0)  # Time in seconds
 
     if not question_id:
         return jsonify({'success': False, 'message': 'Question ID required'}), 400
 
-    # Initialize exam_answers if not exists
-    if 'exam_answers' not in session:
-        session['exam_answers'] = {}
+    try:
+        question_id = int(question_id)
+        time_spent = int(time_spent or 0)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid question ID or time spent'}), 400
+
+    exam_id = session.get('exam_id')
+    if not exam_id:
+        return jsonify({'success': False, 'message': 'No active exam session'}), 400
 
-    if 'question_times' not in session:
-        session['question_times'] = {}
+    db_session = get_db_session()
+    attempt = get_exam_attempt(db_session, exam_id)
+    if not attempt:
+        return jsonify({'success': False, 'message': 'No active exam session'}), 400
 
-    # Save answer and time to session
-    session['exam_answers'][str(question_id)] = answer
-    session['question_times'][str(question_id)] = time_spent
-    session.modified = True
+    # Save answer and time to the server-side exam state
+    try:
+        exam_state.save_answer(db_session, attempt, question_id, answer, time_spent)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
 
     return jsonify({'success': True, 'message': 'Answer saved', 'time_spent': time_spent})
 
 
+@app.route('/save-answers', methods=['POST'])
+@login_required
+def save_answers():
+    """Save a batch of queued answers via AJAX (or sendBeacon on page unload)"""
+    data = request.get_json(silent=True) or {}
+    answers = data.get('answers')
+
+    if not isinstance(answers, list):
+        return jsonify({'success': False, 'message': 'Answers list required'}), 400
+
+    exam_id = session.get('exam_id')
+    if not exam_id:
+        return jsonify({'success': False, 'message': 'No active exam session'}), 400
+
+    try:
+        entries = [(int(item['question_id']), item.get('answer'), int(item.get('time_spent') or 0))
+                   for item in answers]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid answer entry'}), 400
+
+    db_session = get_db_session()
+    attempt = get_exam_attempt(db_session, exam_id)
+    if not attempt:
+        return jsonify({'success': False, 'message': 'No active exam session'}), 400
+
+    try:
+        saved = exam_state.save_answers(db_session, attempt, entries)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    return jsonify({'success': True, 'message': 'Answers saved', 'saved': saved})
+
+
 @app.route('/submit-exam', methods=['POST'])
 @login_required
 def submit_exam():
     """Submit exam and calculate results with detailed statistics"""
     # Check if exam session exists
-    if 'exam_questions' not in session or 'exam_id' not in session:
+    if 'exam_id' not in session:
         flash('No active exam session.', 'error')
         return redirect(url_for('exam'))
 
-    db_session = get_session(db_engine)
+    db_session = get_db_session()
     try:
         exam_id = session.get('exam_id')
-        question_ids = session.get('exam_questions', [])
-        user_answers = session.get('exam_answers', {})
-        question_times = session.get('question_times', {})
-        start_time = datetime.fromisoformat(session.get('exam_start_time'))
 
         # Get the existing exam record
         exam = db_session.query(Exam).get(exam_id)
+        attempt = get_exam_attempt(db_session, exam_id)
 
-        if not exam:
+        if not exam or not attempt:
             flash('Exam record not found.', 'error')
             return redirect(url_for('exam'))
 
@@ -1224,13 +1350,46 @@ def submit_exam():
             flash('This exam has already been submitted.', 'warning')
             return redirect(url_for('exam_results', exam_id=exam.id))
 
+        question_ids = attempt.question_ids or []
+        user_answers, question_times = exam_state.load_answers(db_session, exam_id)
+
         # Get questions
         questions = db_session.query(Question).filter(Question.id.in_(question_ids)).all()
         questions_dict = {q.id: q for q in questions}
 
+        # Grade all short answers concurrently before scoring the exam
+        short_answer_items = {}
+        for question_id in question_ids:
+            question = questions_dict.get(question_id)
+            user_answer = user_answers.get(str(question_id))
+            if question and user_answer and question.question_type == 'short_answer':
+                short_answer_items[question_id] = (user_answer, question.model_answer, question.key_points)
+
+        # In deferred mode short answers are graded in the background after submission
+        short_answer_grades = {}
+        if short_answer_items and not DEFERRED_GRADING:
+            # Get organization's API key if available
+            org_api_key = None
+            provider = current_user.ai_provider or 'gemini'
+
+            if current_user.organization:
+                org_settings = db_session.query(OrganizationSettings)\
+                    .filter_by(organization_name=current_user.organization)\
+                    .first()
+                if org_settings:
+                    org_api_key = org_settings.gemini_api_key if provider == 'gemini' else org_settings.openai_api_key
+
+            short_answer_grades = grade_short_answers_batch(
+                short_answer_items,
+                provider=provider,
+                api_key=org_api_key,
+                organization=current_user.organization
+            )
+
         # Process each question and save results
         correct_count = 0
         unanswered_count = 0
+        pending_count = 0
 
         for question_id in question_ids:
             question = questions_dict.get(question_id)
@@ -1246,29 +1405,11 @@ def submit_exam():
                 if question.question_type == 'true_false':
                     is_correct = user_answer.lower() == question.correct_answer.lower()
                 elif question.question_type == 'short_answer':
-                    # Use AI-based grading for short answers
-                    try:
-                        # Get organization's API key if available
-                        org_api_key = None
-                        provider = current_user.ai_provider or 'gemini'
-
-                        if current_user.organization:
-                            org_settings = db_session.query(OrganizationSettings)\
-                                .filter_by(organization_name=current_user.organization)\
-                                .first()
-                            if org_settings:
-                                org_api_key = org_settings.gemini_api_key if provider == 'gemini' else org_settings.openai_api_key
-
-                        is_correct, score, feedback = grade_short_answer(
-                            user_answer=user_answer,
-                            model_answer=question.model_answer,
-                            key_points=question.key_points,
-                            provider=provider,
-                            api_key=org_api_key
-                        )
-                    except Exception as e:
-                        # Fallback to marking as incorrect if AI grading fails
-                        is_correct = False
+                    if question_id in short_answer_grades:
+                        is_correct, score, feedback = short_answer_grades[question_id]
+                    else:
+                        is_correct = None  # Graded by the background grading job
+                        pending_count += 1
                 else:  # MCQ
                     is_correct = user_answer == question.correct_answer
             else:
@@ -1290,24 +1431,26 @@ def submit_exam():
         # Calculate score and update exam
         exam.score = (correct_count / len(question_ids) * 100) if question_ids else 0
         exam.completed_at = datetime.utcnow()
+        exam.grading_status = 'pending' if pending_count else 'complete'
 
+        # The answers now live in the ExamQuestion records
+        exam_state.finish_attempt(db_session, exam.id)
         db_session.commit()
 
+        if pending_count:
+            enqueue_exam_grading(db_engine, exam.id)
+
         # Clear exam session
-        session.pop('exam_id', None)
-        session.pop('exam_questions', None)
-        session.pop('exam_document_id', None)
-        session.pop('exam_start_time', None)
-        session.pop('exam_duration', None)
-        session.pop('exam_answers', None)
-        session.pop('question_times', None)
-        session.pop('question_start_time', None)
+        clear_exam_session()
 
         # Success message with statistics
-        message = f'Exam submitted! Score: {exam.score:.1f}% ({correct_count}/{len(question_ids)} correct'
+        score_label = 'Score so far' if pending_count > 0 else 'Score'
+        message = f'Exam submitted! {score_label}: {exam.score:.1f}% ({correct_count}/{len(question_ids)} correct'
         if unanswered_count > 0:
             message += f', {unanswered_count} unanswered'
         message += ')'
+        if pending_count > 0:
+            message += f'. {pending_count} short answer(s) are still being graded.'
 
         flash(message, 'success')
         return redirect(url_for('exam_results', exam_id=exam.id))
@@ -1332,27 +1475,22 @@ def submit_exam():
         # to prevent infinite loop, but with a note
         try:
             exam = db_session.query(Exam).get(exam_id)
-            if exam and not exam.is_completed():
+            attempt = exam_state.get_attempt(db_session, exam_id)
+            if exam and attempt and not exam.is_completed():
                 # Check if time has truly expired
-                start_time_dt = datetime.fromisoformat(session.get('exam_start_time'))
-                exam_duration = session.get('exam_duration', 30)
+                start_time_dt = attempt.started_at
+                exam_duration = attempt.duration or 30
                 time_elapsed = (datetime.utcnow() - start_time_dt).total_seconds() / 60
 
                 if time_elapsed >= exam_duration:
                     # Time expired - mark as completed with error state
                     exam.completed_at = datetime.utcnow()
                     exam.score = 0.0  # Mark as 0 due to submission error
+                    exam_state.finish_attempt(db_session, exam.id)
                     db_session.commit()
 
                     # Clear session to prevent reloading
-                    session.pop('exam_id', None)
-                    session.pop('exam_questions', None)
-                    session.pop('exam_document_id', None)
-                    session.pop('exam_start_time', None)
-                    session.pop('exam_duration', None)
-                    session.pop('exam_answers', None)
-                    session.pop('question_times', None)
-                    session.pop('question_start_time', None)
+                    clear_exam_session()
 
                     flash('Your exam time has expired. Due to a technical error, your answers could not be saved. Please contact support.', 'warning')
                     return redirect(url_for('exam'))
@@ -1360,37 +1498,35 @@ def submit_exam():
             pass  # If this fails, fall through to normal error handling
 
         return redirect(url_for('start_exam'))
-    finally:
-        db_session.close()
 
 
 @app.route('/exam-results/<int:exam_id>')
 @login_required
 def exam_results(exam_id):
     """View detailed exam results"""
-    db_session = get_session(db_engine)
-    try:
-        # Get exam and verify ownership
-        exam = db_session.query(Exam).get(exam_id)
+    db_session = get_db_session()
+    # Get exam and verify ownership
+    exam = db_session.query(Exam).get(exam_id)
 
-        if not exam:
-            flash('Exam not found', 'error')
-            return redirect(url_for('results'))
+    if not exam:
+        flash('Exam not found', 'error')
+        return redirect(url_for('results'))
 
-        if exam.user_id != current_user.id:
-            flash('You do not have permission to view this exam', 'error')
-            return redirect(url_for('results'))
+    if exam.user_id != current_user.id:
+        flash('You do not have permission to view this exam', 'error')
+        return redirect(url_for('results'))
 
-        # Get exam questions with details
-        exam_questions = db_session.query(ExamQuestion)\
-            .filter_by(exam_id=exam_id)\
-            .all()
+    # Pick up deferred grading lost to a worker restart
+    retry_if_stale(db_engine, exam)
 
-        return render_template('exam_results.html',
-                             exam=exam,
-                             exam_questions=exam_questions)
-    finally:
-        db_session.close()
+    # Get exam questions with details
+    exam_questions = db_session.query(ExamQuestion)\
+        .filter_by(exam_id=exam_id)\
+        .all()
+
+    return render_template('exam_results.html',
+                         exam=exam,
+                         exam_questions=exam_questions)
 
 
 @app.route('/exam/<int:exam_id>/download-pdf')
@@ -1404,7 +1540,7 @@ def download_exam_pdf(exam_id):
         flash('PDF generation not available. Please install xhtml2pdf: pip install xhtml2pdf', 'error')
         return redirect(url_for('exam_results', exam_id=exam_id))
 
-    db_session = get_session(db_engine)
+    db_session = get_db_session()
     try:
         # Get exam and verify ownership
         exam = db_session.query(Exam).get(exam_id)
@@ -1459,104 +1595,96 @@ def download_exam_pdf(exam_id):
     except Exception as e:
         flash(f'Error generating PDF: {str(e)}', 'error')
         return redirect(url_for('exam_results', exam_id=exam_id))
-    finally:
-        db_session.close()
 
 
 @app.route('/results')
 @login_required
 def results():
     """View all exam results"""
-    db_session = get_session(db_engine)
-    try:
-        # Get all exams for current user
-        user_exams = db_session.query(Exam)\
-            .filter_by(user_id=current_user.id)\
-            .filter(Exam.completed_at.isnot(None))\
-            .order_by(Exam.completed_at.desc())\
-            .all()
-
-        # Calculate statistics
-        total_exams = len(user_exams)
-        avg_score = sum(exam.score for exam in user_exams) / total_exams if total_exams > 0 else 0
-        best_score = max((exam.score for exam in user_exams), default=0)
-        recent_exams = user_exams[:10]  # Last 10 exams
-
-        return render_template('results.html',
-                             exams=recent_exams,
-                             total_exams=total_exams,
-                             avg_score=avg_score,
-                             best_score=best_score)
-    finally:
-        db_session.close()
+    db_session = get_db_session()
+    # Get all exams for current user
+    user_exams = db_session.query(Exam)\
+        .filter_by(user_id=current_user.id)\
+        .filter(Exam.completed_at.isnot(None))\
+        .order_by(Exam.completed_at.desc())\
+        .all()
+
+    # Calculate statistics
+    total_exams = len(user_exams)
+    avg_score = sum(exam.score for exam in user_exams) / total_exams if total_exams > 0 else 0
+    best_score = max((exam.score for exam in user_exams), default=0)
+    recent_exams = user_exams[:10]  # Last 10 exams
+
+    return render_template('results.html',
+                         exams=recent_exams,
+                         total_exams=total_exams,
+                         avg_score=avg_score,
+                         best_score=best_score)
 
 
 @app.route('/analytics')
 @login_required
 def analytics():
     """Analytics dashboard with exam history and statistics"""
-    db_session = get_session(db_engine)
-    try:
-        # Get all completed exams for current user
-        user_exams = db_session.query(Exam)\
-            .filter_by(user_id=current_user.id)\
-            .filter(Exam.completed_at.isnot(None))\
-            .order_by(Exam.completed_at.desc())\
-            .all()
-
-        # Calculate basic statistics
-        total_exams = len(user_exams)
-        avg_score = sum(exam.score for exam in user_exams) / total_exams if total_exams > 0 else 0
-
-        # Calculate total questions attempted
-        total_questions = sum(exam.total_questions for exam in user_exams)
-
-        # Get all exam questions for the user to calculate success rate by difficulty
-        exam_ids = [exam.id for exam in user_exams]
-        all_exam_questions = db_session.query(ExamQuestion)\
-            .filter(ExamQuestion.exam_id.in_(exam_ids))\
-            .all() if exam_ids else []
-
-        # Calculate success rate by difficulty
-        difficulty_stats = {'easy': {'correct': 0, 'total': 0},
-                           'medium': {'correct': 0, 'total': 0},
-                           'hard': {'correct': 0, 'total': 0}}
-
-        for eq in all_exam_questions:
-            difficulty = eq.question.difficulty
-            if difficulty in difficulty_stats:
-                difficulty_stats[difficulty]['total'] += 1
-                if eq.is_correct:
-                    difficulty_stats[difficulty]['correct'] += 1
-
-        # Calculate success rates
-        difficulty_rates = {}
-        for diff, stats in difficulty_stats.items():
-            if stats['total'] > 0:
-                difficulty_rates[diff] = {
-                    'rate': (stats['correct'] / stats['total']) * 100,
-                    'correct': stats['correct'],
-                    'total': stats['total']
-                }
-            else:
-                difficulty_rates[diff] = {'rate': 0, 'correct': 0, 'total': 0}
+    db_session = get_db_session()
+    # Get all completed exams for current user
+    user_exams = db_session.query(Exam)\
+        .filter_by(user_id=current_user.id)\
+        .filter(Exam.completed_at.isnot(None))\
+        .order_by(Exam.completed_at.desc())\
+        .all()
+
+    # Calculate basic statistics
+    total_exams = len(user_exams)
+    avg_score = sum(exam.score for exam in user_exams) / total_exams if total_exams > 0 else 0
+
+    # Calculate total questions attempted
+    total_questions = sum(exam.total_questions for exam in user_exams)
+
+    # Get all exam questions for the user to calculate success rate by difficulty
+    exam_ids = [exam.id for exam in user_exams]
+    all_exam_questions = db_session.query(ExamQuestion)\
+        .filter(ExamQuestion.exam_id.in_(exam_ids))\
+        .all() if exam_ids else []
+
+    # Calculate success rate by difficulty
+    difficulty_stats = {'easy': {'correct': 0, 'total': 0},
+                       'medium': {'correct': 0, 'total': 0},
+                       'hard': {'correct': 0, 'total': 0}}
+
+    for eq in all_exam_questions:
+        difficulty = eq.question.difficulty
+        if difficulty in difficulty_stats:
+            difficulty_stats[difficulty]['total'] += 1
+            if eq.is_correct:
+                difficulty_stats[difficulty]['correct'] += 1
+
+    # Calculate success rates
+    difficulty_rates = {}
+    for diff, stats in difficulty_stats.items():
+        if stats['total'] > 0:
+            difficulty_rates[diff] = {
+                'rate': (stats['correct'] / stats['total']) * 100,
+                'correct': stats['correct'],
+                'total': stats['total']
+            }
+        else:
+            difficulty_rates[diff] = {'rate': 0, 'correct': 0, 'total': 0}
 
-        # Prepare data for Chart.js (last 10 exams in chronological order)
-        chart_exams = user_exams[:10][::-1]  # Reverse to get chronological order
-        chart_data = {
-            'labels': [exam.completed_at.strftime('%b %d') for exam in chart_exams],
-            'scores': [exam.score for exam in chart_exams]
-        }
+    # Prepare data for Chart.js (last 10 exams in chronological order)
+    chart_exams = user_exams[:10][::-1]  # Reverse to get chronological order
+    chart_data = {
+        'labels': [exam.completed_at.strftime('%b %d') for exam in chart_exams],
+        'scores': [exam.score for exam in chart_exams]
+    }
 
-        return render_template('analytics.html',
-                             exams=user_exams,
-                             total_exams=total_exams,
-                             avg_score=avg_score,
-                             total_questions=total_questions,
-                             difficulty_rates=difficulty_rates,
-                             chart_data=chart_data)
-    finally:
-        db_session.close()
+    return render_template('analytics.html',
+                         exams=user_exams,
+                         total_exams=total_exams,
+                         avg_score=avg_score,
+                         total_questions=total_questions,
+                         difficulty_rates=difficulty_rates,
+                         chart_data=chart_data)
 
 
 @app.route('/analytics/export-csv')
@@ -1567,183 +1695,164 @@ def export_analytics_csv():
     from io import StringIO
     from flask import make_response
 
-    db_session = get_session(db_engine)
-    try:
-        # Get all completed exams for current user
-        user_exams = db_session.query(Exam)\
-            .filter_by(user_id=current_user.id)\
-            .filter(Exam.completed_at.isnot(None))\
-            .order_by(Exam.completed_at.desc())\
-            .all()
+    db_session = get_db_session()
+    # Get all completed exams for current user
+    user_exams = db_session.query(Exam)\
+        .filter_by(user_id=current_user.id)\
+        .filter(Exam.completed_at.isnot(None))\
+        .order_by(Exam.completed_at.desc())\
+        .all()
 
-        # Create CSV
-        output = StringIO()
-        fieldnames = ['Exam ID', 'Date', 'Total Questions', 'Score (%)', 'Correct', 'Wrong', 'Duration (min)']
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-
-        writer.writeheader()
-        for exam in user_exams:
-            correct_count = sum(1 for eq in exam.exam_questions if eq.is_correct)
-            wrong_count = exam.total_questions - correct_count
-            duration = (exam.completed_at - exam.created_at).total_seconds() / 60 if exam.completed_at else 0
-
-            writer.writerow({
-                'Exam ID': exam.id,
-                'Date': exam.completed_at.strftime('%Y-%m-%d %H:%M:%S') if exam.completed_at else 'N/A',
-                'Total Questions': exam.total_questions,
-                'Score (%)': f'{exam.score:.2f}',
-                'Correct': correct_count,
-                'Wrong': wrong_count,
-                'Duration (min)': f'{duration:.1f}'
-            })
-
-        # Create response
-        response = make_response(output.getvalue())
-        response.headers['Content-Disposition'] = f'attachment; filename=exam_analytics_{datetime.now().strftime("%Y%m%d")}.csv'
-        response.headers['Content-Type'] = 'text/csv'
-
-        return response
-    finally:
-        db_session.close()
+    # Create CSV
+    output = StringIO()
+    fieldnames = ['Exam ID', 'Date', 'Total Questions', 'Score (%)', 'Correct', 'Wrong', 'Duration (min)']
+    writer = csv.DictWriter(output, fieldnames=fieldnames)
+
+    writer.writeheader()
+    for exam in user_exams:
+        correct_count = sum(1 for eq in exam.exam_questions if eq.is_correct)
+        wrong_count = exam.total_questions - correct_count
+        duration = (exam.completed_at - exam.created_at).total_seconds() / 60 if exam.completed_at else 0
+
+        writer.writerow({
+            'Exam ID': exam.id,
+            'Date': exam.completed_at.strftime('%Y-%m-%d %H:%M:%S') if exam.completed_at else 'N/A',
+            'Total Questions': exam.total_questions,
+            'Score (%)': f'{exam.score:.2f}',
+            'Correct': correct_count,
+            'Wrong': wrong_count,
+            'Duration (min)': f'{duration:.1f}'
+        })
+
+    # Create response
+    response = make_response(output.getvalue())
+    response.headers['Content-Disposition'] = f'attachment; filename=exam_analytics_{datetime.now().strftime("%Y%m%d")}.csv'
+    response.headers['Content-Type'] = 'text/csv'
+
+    return response
 
 
 @app.route('/admin')
 @admin_required
 def admin_dashboard():
     """Admin dashboard with comprehensive statistics and management tools"""
-    db_session = get_session(db_engine)
-    try:
-        # Check if user is superadmin or org admin
-        is_superadmin = current_user.is_superadmin()
-
-        # Build base queries with organization filter
-        if is_superadmin:
-            # Superadmin sees everything
-            users_query = db_session.query(User)
-            documents_query = db_session.query(Document)
-            questions_query = db_session.query(Question)
-            exams_query = db_session.query(Exam)
-        else:
-            # Org admin sees only their organization
-            users_query = db_session.query(User).filter_by(organization=current_user.organization)
-            documents_query = db_session.query(Document).filter_by(organization=current_user.organization)
-            questions_query = db_session.query(Question).join(Document).filter(
-                Document.organization == current_user.organization
-            )
-            exams_query = db_session.query(Exam).join(User).filter(
-                User.organization == current_user.organization
-            )
-
-        # Get comprehensive statistics
-        total_users = users_query.count()
-        total_documents = documents_query.count()
-        total_questions = questions_query.count()
-        total_exams = exams_query.count()
-
-        # Count users by role
-        admin_count = users_query.filter_by(role='admin').count()
-        teacher_count = users_query.filter_by(role='teacher').count()
-        student_count = users_query.filter_by(role='student').count()
-
-        # Get unique organizations (superadmin only)
-        if is_superadmin:
-            organizations = db_session.query(User.organization).distinct().all()
-            organization_list = [org[0] for org in organizations if org[0]]
-            organization_count = len(organization_list)
-        else:
-            organization_count = 1  # Current organization only
-
-        # Get recent users (last 5)
-        recent_users = users_query\
-            .order_by(User.created_at.desc())\
-            .limit(5)\
-            .all()
-
-        # Get recent documents (last 5)
-        recent_documents = documents_query\
-            .order_by(Document.created_at.desc())\
-            .limit(5)\
-            .all()
-
-        return render_template('admin_dashboard.html',
-                               total_users=total_users,
-                               total_documents=total_documents,
-                               total_questions=total_questions,
-                               total_exams=total_exams,
-                               admin_count=admin_count,
-                               teacher_count=teacher_count,
-                               student_count=student_count,
-                               organization_count=organization_count,
-                               recent_users=recent_users,
-                               recent_documents=recent_documents,
-                               is_superadmin=is_superadmin)
-    finally:
-        db_session.close()
+    db_session = get_db_session()
+    # Check if user is superadmin or org admin
+    is_superadmin = current_user.is_superadmin()
+
+    # Build base queries with organization filter
+    if is_superadmin:
+        # Superadmin sees everything
+        users_query = db_session.query(User)
+        documents_query = db_session.query(Document)
+    else:
+        # Org admin sees only their organization
+        users_query = db_session.query(User).filter_by(organization=current_user.organization)
+        documents_query = db_session.query(Document).filter_by(organization=current_user.organization)
+
+    # Get comprehensive statistics (totals, users per role, organizations) in two queries
+    stats = get_admin_stats(db_session, current_user.organization, all_orgs=is_superadmin)
+
+    # Get recent users (last 5)
+    recent_users = users_query\
+        .order_by(User.created_at.desc())\
+        .limit(5)\
+        .all()
+
+    # Get recent documents (last 5)
+    recent_documents = documents_query\
+        .order_by(Document.created_at.desc())\
+        .limit(5)\
+        .all()
+
+    return render_template('admin_dashboard.html',
+                           recent_users=recent_users,
+                           recent_documents=recent_documents,
+                           is_superadmin=is_superadmin,
+                           **stats)
 
 
 @app.route('/admin/users')
 @admin_required
 def admin_users():
     """View all users in the system (filtered by organization for org admins)"""
-    db_session = get_session(db_engine)
-    try:
-        # Check if user is superadmin or org admin
-        is_superadmin = current_user.is_superadmin()
-
-        # Build query with organization filter
-        if is_superadmin:
-            # Superadmin sees all users
-            users_query = db_session.query(User)
-        else:
-            # Org admin sees only their organization's users
-            users_query = db_session.query(User).filter_by(organization=current_user.organization)
-
-        # Get all users
-        users = users_query.order_by(User.created_at.desc()).all()
-
-        # Add document count for each user
-        for user in users:
-            user.document_count = db_session.query(Document)\
-                .filter_by(uploaded_by=user.id)\
-                .count()
-            user.exam_count = db_session.query(Exam)\
-                .filter_by(user_id=user.id)\
-                .count()
-
-        return render_template('admin_users.html', users=users, is_superadmin=is_superadmin)
-    finally:
-        db_session.close()
+    db_session = get_db_session()
+    # Check if user is superadmin or org admin
+    is_superadmin = current_user.is_superadmin()
+
+    # Build query with organization filter
+    if is_superadmin:
+        # Superadmin sees all users
+        users_query = db_session.query(User)
+    else:
+        # Org admin sees only their organization's users
+        users_query = db_session.query(User).filter_by(organization=current_user.organization)
+
+    # Get one page of users, newest first
+    page = paginate_keyset(users_query, User,
+                           cursor=request.args.get('cursor'),
+                           per_page=request.args.get('per_page', type=int))
+    users = page.items
+
+    # Add document and exam counts for the page in two grouped queries
+    user_ids = [user.id for user in users]
+    document_counts = count_documents_by_user(db_session, user_ids)
+    exam_counts = count_exams_by_user(db_session, user_ids)
+    for user in users:
+        user.document_count = document_counts.get(user.id, 0)
+        user.exam_count = exam_counts.get(user.id, 0)
+
+    # Totals for the whole listing, not just this page
+    stats = get_admin_stats(db_session, current_user.organization, all_orgs=is_superadmin)
+
+    return render_template('admin_users.html',
+                           users=users,
+                           next_cursor=page.next_cursor,
+                           per_page=page.per_page,
+                           is_superadmin=is_superadmin,
+                           **stats)
 
 
 @app.route('/admin/documents')
 @admin_required
 def admin_documents():
     """View all documents in the system (filtered by organization for org admins)"""
-    db_session = get_session(db_engine)
-    try:
-        # Check if user is superadmin or org admin
-        is_superadmin = current_user.is_superadmin()
-
-        # Build query with organization filter
-        if is_superadmin:
-            # Superadmin sees all documents
-            documents_query = db_session.query(Document)
-        else:
-            # Org admin sees only their organization's documents
-            documents_query = db_session.query(Document).filter_by(organization=current_user.organization)
-
-        # Get all documents with uploader information
-        documents = documents_query.order_by(Document.created_at.desc()).all()
-
-        # Add question count for each document
-        for doc in documents:
-            doc.question_count = db_session.query(Question)\
-                .filter_by(document_id=doc.id)\
-                .count()
-
-        return render_template('admin_documents.html', documents=documents, is_superadmin=is_superadmin)
-    finally:
-        db_session.close()
+    db_session = get_db_session()
+    # Check if user is superadmin or org admin
+    is_superadmin = current_user.is_superadmin()
+
+    # Build query with organization filter
+    if is_superadmin:
+        # Superadmin sees all documents
+        documents_query = db_session.query(Document)
+    else:
+        # Org admin sees only their organization's documents
+        documents_query = db_session.query(Document).filter_by(organization=current_user.organization)
+
+    # Get one page of documents, newest first, with uploader information
+    documents_query = documents_query.options(joinedload(Document.uploader))
+    page = paginate_keyset(documents_query, Document,
+                           cursor=request.args.get('cursor'),
+                           per_page=request.args.get('per_page', type=int))
+    documents = page.items
+
+    # Add question count for the page in one grouped query
+    question_counts = count_questions_by_document(db_session, [doc.id for doc in documents])
+    for doc in documents:
+        doc.question_count = question_counts.get(doc.id, 0)
+
+    # Totals for the whole listing, not just this page
+    stats = get_admin_stats(db_session, current_user.organization, all_orgs=is_superadmin)
+    breakdown = compute_document_breakdown(db_session, current_user.organization, all_orgs=is_superadmin)
+
+    return render_template('admin_documents.html',
+                           documents=documents,
+                           next_cursor=page.next_cursor,
+                           per_page=page.per_page,
+                           is_superadmin=is_superadmin,
+                           total_documents=stats['total_documents'],
+                           total_questions=stats['total_questions'],
+                           **breakdown)
 
 
 @app.route('/admin/user/<int:user_id>/role', methods=['POST'])
@@ -1759,7 +1868,7 @@ def admin_change_role(user_id):
         flash('Invalid role specified', 'error')
         return redirect(url_for('admin_users'))
 
-    db_session = get_session(db_engine)
+    db_session = get_db_session()
     try:
         user = db_session.query(User).get(user_id)
 
@@ -1786,13 +1895,12 @@ def admin_change_role(user_id):
         old_role = user.role
         user.role = new_role
         db_session.commit()
+        invalidate_user(user.id)
 
         flash(f'User "{user.name}" role changed from {old_role} to {new_role}', 'success')
     except Exception as e:
         db_session.rollback()
         flash(f'Error changing user role: {str(e)}', 'error')
-    finally:
-        db_session.close()
 
     return redirect(url_for('admin_users'))
 
@@ -1801,7 +1909,7 @@ def admin_change_role(user_id):
 @admin_required
 def admin_create_demo_orgs():
     """Create demo organizations with sample users"""
-    db_session = get_session(db_engine)
+    db_session = get_db_session()
     try:
         demo_orgs = [
             {
@@ -1860,8 +1968,6 @@ def admin_create_demo_orgs():
     except Exception as e:
         db_session.rollback()
         flash(f'Error creating demo organizations: {str(e)}', 'error')
-    finally:
-        db_session.close()
 
     return redirect(url_for('admin_dashboard'))
 
@@ -1876,19 +1982,25 @@ def admin_reset_database():
         flash('Database reset cancelled. You must type RESET to confirm.', 'error')
         return redirect(url_for('admin_dashboard'))
 
-    db_session = get_session(db_engine)
+    db_session = get_db_session()
     try:
         # Store current admin info
         admin_id = current_user.id
 
         # Delete all data except current admin
         db_session.query(ExamQuestion).delete()
+        db_session.query(ExamAttemptAnswer).delete()
+        db_session.query(ExamAttempt).delete()
+        db_session.query(GenerationJob).delete()
+        db_session.query(CsvImport).delete()
+        db_session.query(QuestionSignatureBand).delete()
         db_session.query(Question).delete()
         db_session.query(Exam).delete()
         db_session.query(Document).delete()
         db_session.query(User).filter(User.id != admin_id).delete()
 
         db_session.commit()
+        invalidate_user()
 
         # Clear uploads folder
         upload_folder = app.config['UPLOAD_FOLDER']
@@ -1905,8 +2017,6 @@ def admin_reset_database():
     except Exception as e:
         db_session.rollback()
         flash(f'Error resetting database: {str(e)}', 'error')
-    finally:
-        db_session.close()
 
     return redirect(url_for('admin_dashboard'))
 
@@ -1915,15 +2025,12 @@ def admin_reset_database():
 @role_required('teacher', 'admin')
 def teacher_dashboard():
     """Teacher dashboard - accessible to teachers and admins"""
-    db_session = get_session(db_engine)
-    try:
-        # Get documents uploaded by current user
-        documents = db_session.query(Document).filter_by(uploaded_by=current_user.id).all()
+    db_session = get_db_session()
+    # Get documents uploaded by current user
+    documents = db_session.query(Document).filter_by(uploaded_by=current_user.id).all()
 
-        return render_template('teacher_dashboard.html',
-                               documents=documents)
-    finally:
-        db_session.close()
+    return render_template('teacher_dashboard.html',
+                           documents=documents)
 
 
 @app.route('/settings', methods=['GET', 'POST'])
@@ -1931,7 +2038,7 @@ def teacher_dashboard():
 @role_required('teacher', 'admin', 'superadmin')
 def settings():
     """AI Settings page for teachers and admins - includes API key management for admins"""
-    db_session = get_session(db_engine)
+    db_session = get_db_session()
     try:
         is_superadmin = current_user.is_superadmin()
         is_admin = current_user.role in ['admin', 'superadmin']
@@ -1975,9 +2082,10 @@ def settings():
             model = request.form.get('ai_model')
 
             if provider and model:
-                current_user.ai_provider = provider
-                current_user.ai_model = model
-                db_session.add(current_user)
+                # current_user is a read-only snapshot, so update the User row
+                user = db_session.query(User).get(current_user.id)
+                user.ai_provider = provider
+                user.ai_model = model
                 flash(f'AI preferences updated! Now using {AI_MODELS.get(provider, {}).get(model, model)}', 'success')
 
             # Handle organization API keys (admins only)
@@ -2004,6 +2112,8 @@ def settings():
                     flash('Gemini API key updated successfully!', 'success')
 
             db_session.commit()
+            invalidate_user(current_user.id)
+            invalidate_org_settings()
 
             # Redirect back with org parameter for superadmin
             if is_superadmin and target_org:
@@ -2022,8 +2132,6 @@ def settings():
         db_session.rollback()
         flash(f'Error updating settings: {str(e)}', 'error')
         return redirect(url_for('settings'))
-    finally:
-        db_session.close()
 
 
 @app.route('/members')
@@ -2034,37 +2142,41 @@ def organization_members():
         flash('You are not part of an organization', 'warning')
         return redirect(url_for('index'))
 
-    db_session = get_session(db_engine)
-    try:
-        # Get all users in the same organization
-        members = db_session.query(User)\
-            .filter_by(organization=current_user.organization)\
-            .order_by(User.role.desc(), User.name)\
-            .all()
-
-        # Group by role
-        admins = [u for u in members if u.role == 'admin']
-        teachers = [u for u in members if u.role == 'teacher']
-        students = [u for u in members if u.role == 'student']
-
-        # Get statistics for each member
-        for member in members:
-            member.document_count = db_session.query(Document)\
-                .filter_by(uploaded_by=member.id)\
-                .count()
-            member.exam_count = db_session.query(Exam)\
-                .filter_by(user_id=member.id)\
-                .filter(Exam.completed_at.isnot(None))\
-                .count()
-
-        return render_template('organization_members.html',
-                             admins=admins,
-                             teachers=teachers,
-                             students=students,
-                             total_members=len(members),
-                             organization_name=current_user.organization)
-    finally:
-        db_session.close()
+    db_session = get_db_session()
+    # Get one page of users in the same organization, newest first
+    members_query = db_session.query(User).filter_by(organization=current_user.organization)
+    page = paginate_keyset(members_query, User,
+                           cursor=request.args.get('cursor'),
+                           per_page=request.args.get('per_page', type=int))
+    members = sorted(page.items, key=lambda u: u.name or '')
+
+    # Group by role
+    admins = [u for u in members if u.role == 'admin']
+    teachers = [u for u in members if u.role == 'teacher']
+    students = [u for u in members if u.role == 'student']
+
+    # Get statistics for the page in two grouped queries
+    member_ids = [member.id for member in members]
+    document_counts = count_documents_by_user(db_session, member_ids)
+    exam_counts = count_exams_by_user(db_session, member_ids, completed_only=True)
+    for member in members:
+        member.document_count = document_counts.get(member.id, 0)
+        member.exam_count = exam_counts.get(member.id, 0)
+
+    # Role totals for the whole organization, not just this page
+    stats = get_admin_stats(db_session, current_user.organization)
+
+    return render_template('organization_members.html',
+                         admins=admins,
+                         teachers=teachers,
+                         students=students,
+                         total_members=stats['total_users'],
+                         admin_count=stats['admin_count'],
+                         teacher_count=stats['teacher_count'],
+                         student_count=stats['student_count'],
+                         next_cursor=page.next_cursor,
+                         per_page=page.per_page,
+                         organization_name=current_user.organization)
 
 
 @app.route('/organization-settings', methods=['GET', 'POST'])
@@ -2072,7 +2184,7 @@ def organization_members():
 @role_required('admin', 'superadmin')
 def organization_settings():
     """Organization branding and white-label settings (admin and superadmin)"""
-    db_session = get_session(db_engine)
+    db_session = get_db_session()
     try:
         is_superadmin = current_user.is_superadmin()
 
@@ -2145,6 +2257,7 @@ def organization_settings():
             org_settings.enable_analytics = 'enable_analytics' in request.form
             org_settings.enable_csv_export = 'enable_csv_export' in request.form
             org_settings.enable_pdf_export = 'enable_pdf_export' in request.form
+            org_settings.enable_ai_cache = 'enable_ai_cache' in request.form
 
             # Update contact info
             org_settings.contact_email = request.form.get('contact_email') or None
@@ -2185,6 +2298,7 @@ def organization_settings():
                         flash('Invalid logo file type. Allowed: PNG, JPG, JPEG, GIF, SVG', 'warning')
 
             db_session.commit()
+            invalidate_org_settings()
             flash('Organization settings updated successfully!', 'success')
 
             # Redirect back to org settings with org parameter for superadmin
@@ -2202,171 +2316,114 @@ def organization_settings():
         db_session.rollback()
         flash(f'Error updating organization settings: {str(e)}', 'error')
         return redirect(url_for('organization_settings'))
-    finally:
-        db_session.close()
 
 
 @app.route('/upload-csv-questions', methods=['GET', 'POST'])
 @login_required
 @role_required('teacher', 'admin')
 def upload_csv_questions():
-    """Upload MCQ questions via CSV file"""
-    db_session = get_session(db_engine)
-    try:
-        if request.method == 'POST':
-            if 'csv_file' not in request.files:
-                flash('No file selected', 'error')
-                return redirect(request.url)
+    """Upload questions via CSV file, or resume an unfinished CSV import"""
+    db_session = get_db_session()
+    if request.method == 'POST':
+        if 'csv_file' not in request.files:
+            flash('No file selected', 'error')
+            return redirect(request.url)
 
-            file = request.files['csv_file']
+        file = request.files['csv_file']
 
-            if file.filename == '':
-                flash('No file selected', 'error')
-                return redirect(request.url)
+        if file.filename == '':
+            flash('No file selected', 'error')
+            return redirect(request.url)
 
-            # Check file extension
-            if not file.filename.endswith('.csv'):
-                flash('Invalid file type. Please upload a CSV file.', 'error')
-                return redirect(request.url)
+        # Check file extension
+        if not file.filename.endswith('.csv'):
+            flash('Invalid file type. Please upload a CSV file.', 'error')
+            return redirect(request.url)
 
-            try:
-                import csv
-                from io import StringIO
+        try:
+            # Rows are decoded from the upload stream as they are imported
+            csv_reader = open_csv_reader(file.stream)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(request.url)
 
-                # Read CSV content
-                csv_content = file.read().decode('utf-8')
-                csv_file = StringIO(csv_content)
-                csv_reader = csv.DictReader(csv_file)
+        try:
+            resume_import_id = request.form.get('resume_import_id', type=int)
+            if resume_import_id:
+                csv_import = db_session.query(CsvImport)\
+                    .filter_by(id=resume_import_id, user_id=current_user.id).first()
+                if not csv_import or csv_import.status == 'completed':
+                    flash('Import not found or already completed', 'error')
+                    return redirect(request.url)
+                csv_import.status = 'running'
+                csv_import.completed_at = None
+            else:
+                csv_import = CsvImport(user_id=current_user.id, filename=secure_filename(file.filename))
+                db_session.add(csv_import)
 
-                # Validate CSV headers
-                required_headers = ['question', 'option_a', 'option_b', 'option_c', 'option_d',
-                                  'correct_answer', 'explanation', 'difficulty']
+            # Create or get "CSV Import" document for this user
+            csv_doc = db_session.query(Document)\
+                .filter_by(uploaded_by=current_user.id, filename='CSV Import').first()
 
-                if not csv_reader.fieldnames:
-                    flash('CSV file is empty or invalid', 'error')
-                    return redirect(request.url)
+            if not csv_doc:
+                csv_doc = Document(
+                    filename='CSV Import',
+                    content='Questions imported from CSV files',
+                    uploaded_by=current_user.id,
+                    organization=current_user.organization
+                )
+                db_session.add(csv_doc)
 
-                missing_headers = set(required_headers) - set(csv_reader.fieldnames)
-                if missing_headers:
-                    flash(f'CSV is missing required columns: {", ".join(missing_headers)}', 'error')
-                    return redirect(request.url)
+            # Keep the import record even if the first chunk fails
+            db_session.commit()
 
-                # Create or get "CSV Import" document for this user
-                csv_doc = db_session.query(Document)\
-                    .filter_by(uploaded_by=current_user.id, filename='CSV Import').first()
+            previously_imported = csv_import.imported_count
+            import_questions(db_session, csv_reader, csv_import, csv_doc.id, current_user.id)
 
-                if not csv_doc:
-                    csv_doc = Document(
-                        filename='CSV Import',
-                        content='Questions imported from CSV files',
-                        uploaded_by=current_user.id,
-                        organization=current_user.organization
-                    )
-                    db_session.add(csv_doc)
-                    db_session.flush()  # Get the document ID
-
-                # Get existing questions for duplicate detection
-                existing_questions_obj = db_session.query(Question)\
-                    .filter_by(document_id=csv_doc.id).all()
-                existing_question_texts = [q.question_text for q in existing_questions_obj]
-
-                # Parse CSV and create questions
-                saved_count = 0
-                error_count = 0
-                validation_errors = []
-
-                for row_num, row in enumerate(csv_reader, start=2):  # Start from 2 (accounting for header)
-                    try:
-                        question_text = row.get('question', '').strip()
-                        option_a = row.get('option_a', '').strip()
-                        option_b = row.get('option_b', '').strip()
-                        option_c = row.get('option_c', '').strip()
-                        option_d = row.get('option_d', '').strip()
-                        correct_answer = row.get('correct_answer', '').strip().upper()
-                        explanation = row.get('explanation', '').strip()
-                        difficulty = row.get('difficulty', 'medium').strip().lower()
-
-                        # Validate difficulty
-                        if difficulty not in ['easy', 'medium', 'hard']:
-                            difficulty = 'medium'
-
-                        # Build options dict
-                        options = {
-                            'A': option_a,
-                            'B': option_b,
-                            'C': option_c,
-                            'D': option_d
-                        }
-
-                        # Validate question
-                        is_valid, errors, fixed_data = validate_question_complete(
-                            question_text=question_text,
-                            question_type='mcq',
-                            correct_answer=correct_answer,
-                            options=options,
-                            existing_questions=existing_question_texts,
-                            auto_fix=True
-                        )
-
-                        if not is_valid:
-                            validation_errors.append(f"Row {row_num}: {', '.join(errors)}")
-                            error_count += 1
-                            continue
-
-                        # Create question
-                        new_question = Question(
-                            question_text=fixed_data['question_text'],
-                            question_type='mcq',
-                            options_json=fixed_data['options'],
-                            correct_answer=correct_answer,
-                            explanation=explanation,
-                            document_id=csv_doc.id,
-                            difficulty=fixed_data['difficulty'],
-                            status='approved',
-                            created_by=current_user.id
-                        )
-                        db_session.add(new_question)
-                        existing_question_texts.append(fixed_data['question_text'])
-                        saved_count += 1
-
-                    except Exception as e:
-                        validation_errors.append(f"Row {row_num}: {str(e)}")
-                        error_count += 1
-
-                # Commit if any questions were saved
-                if saved_count > 0:
-                    db_session.commit()
-                    flash(f'Successfully imported {saved_count} MCQ questions from CSV!', 'success')
-
-                if error_count > 0:
-                    flash(f'{error_count} rows had errors and were skipped.', 'warning')
-                    # Show first 5 errors
-                    for error in validation_errors[:5]:
-                        flash(error, 'warning')
-                    if len(validation_errors) > 5:
-                        flash(f'... and {len(validation_errors) - 5} more errors', 'warning')
-
-                if saved_count == 0 and error_count > 0:
-                    flash('No questions were imported due to validation errors.', 'error')
-                    return redirect(request.url)
+        except Exception as e:
+            db_session.rollback()
+            flash(f'Error processing CSV file: {str(e)}', 'error')
+            return redirect(request.url)
 
-                return redirect(url_for('question_bank'))
+        imported = csv_import.imported_count - previously_imported
+        if imported > 0:
+            flash(f'Successfully imported {imported} questions from CSV!', 'success')
 
-            except Exception as e:
-                db_session.rollback()
-                flash(f'Error processing CSV file: {str(e)}', 'error')
-                return redirect(request.url)
+        if csv_import.status == 'failed':
+            flash(f'Import stopped after {csv_import.rows_processed} rows: {csv_import.error_message}. '
+                  'Upload the file again from the import report to resume.', 'error')
+        elif csv_import.error_count > 0:
+            flash(f'{csv_import.error_count} rows had errors and were skipped.', 'warning')
 
-        return render_template('upload_csv.html')
-    finally:
-        db_session.close()
+        return redirect(url_for('csv_import_report', import_id=csv_import.id))
+
+    unfinished_imports = db_session.query(CsvImport)\
+        .filter(CsvImport.user_id == current_user.id, CsvImport.status != 'completed')\
+        .order_by(CsvImport.created_at.desc()).limit(5).all()
+
+    return render_template('upload_csv.html', unfinished_imports=unfinished_imports)
+
+
+@app.route('/upload-csv-questions/imports/<int:import_id>')
+@login_required
+@role_required('teacher', 'admin')
+def csv_import_report(import_id):
+    """Show the progress and row errors of a CSV import"""
+    db_session = get_db_session()
+    csv_import = db_session.query(CsvImport).filter_by(id=import_id, user_id=current_user.id).first()
+
+    if not csv_import:
+        flash('Import not found', 'error')
+        return redirect(url_for('upload_csv_questions'))
+
+    return render_template('csv_import.html', csv_import=csv_import, max_stored_errors=MAX_STORED_ERRORS)
 
 
 @app.route('/download-sample-csv')
 @login_required
 @role_required('teacher', 'admin')
 def download_sample_csv():
-    """Download sample CSV template for MCQ questions"""
+    """Download sample CSV template for MCQ, True/False and Short Answer questions"""
     import csv
     from io import StringIO
     from flask import make_response
@@ -2374,6 +2431,7 @@ def download_sample_csv():
     # Create sample CSV content
     sample_data = [
         {
+            'question_type': 'mcq',
             'question': 'What is the capital of France?',
             'option_a': 'London',
             'option_b': 'Paris',
@@ -2384,6 +2442,7 @@ def download_sample_csv():
             'difficulty': 'easy'
         },
         {
+            'question_type': 'mcq',
             'question': 'Which programming language is known for its use in web development?',
             'option_a': 'C++',
             'option_b': 'Python',
@@ -2394,6 +2453,7 @@ def download_sample_csv():
             'difficulty': 'medium'
         },
         {
+            'question_type': 'mcq',
             'question': 'What is the time complexity of binary search?',
             'option_a': 'O(n)',
             'option_b': 'O(log n)',
@@ -2402,13 +2462,28 @@ def download_sample_csv():
             'correct_answer': 'B',
             'explanation': 'Binary search has a time complexity of O(log n) as it divides the search space in half each iteration.',
             'difficulty': 'hard'
+        },
+        {
+            'question_type': 'true_false',
+            'question': 'Python lists can hold values of different types.',
+            'correct_answer': 'true',
+            'explanation': 'A Python list may mix integers, strings and any other objects.',
+            'difficulty': 'easy'
+        },
+        {
+            'question_type': 'short_answer',
+            'question': 'Explain why a hash table lookup is usually faster than searching a list.',
+            'explanation': 'Hashing maps a key directly to its bucket.',
+            'difficulty': 'medium',
+            'model_answer': 'A hash table computes where a key is stored from its hash, so a lookup takes constant time on average instead of scanning every element.',
+            'key_points': 'Hash function maps keys to buckets|Average O(1) lookup|List search is O(n)'
         }
     ]
 
     # Create CSV string
     output = StringIO()
-    fieldnames = ['question', 'option_a', 'option_b', 'option_c', 'option_d',
-                  'correct_answer', 'explanation', 'difficulty']
+    fieldnames = ['question_type', 'question', 'option_a', 'option_b', 'option_c', 'option_d',
+                  'correct_answer', 'explanation', 'difficulty', 'model_answer', 'key_points']
     writer = csv.DictWriter(output, fieldnames=fieldnames)
 
     writer.writeheader()
@@ -2417,7 +2492,7 @@ def download_sample_csv():
 
     # Create response
     response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = 'attachment; filename=mcq_questions_template.csv'
+    response.headers['Content-Disposition'] = 'attachment; filename=questions_template.csv'
     response.headers['Content-Type'] = 'text/csv'
 
     return response
@@ -2428,40 +2503,37 @@ def download_sample_csv():
 @login_required
 def debug_user():
     """Debug route to check current user's status"""
-    db_session = get_session(db_engine)
-    try:
-        user_info = {
-            'email': current_user.email,
-            'name': current_user.name,
-            'role': current_user.role,
-            'organization': current_user.organization,
-            'is_superadmin': current_user.is_superadmin(),
-            'is_org_admin': current_user.is_org_admin(),
-            'is_authenticated': current_user.is_authenticated
-        }
-
-        # Get org settings if available
-        org_settings = None
-        if current_user.organization:
-            org_settings = db_session.query(OrganizationSettings)\
-                .filter_by(organization_name=current_user.organization)\
-                .first()
+    db_session = get_db_session()
+    user_info = {
+        'email': current_user.email,
+        'name': current_user.name,
+        'role': current_user.role,
+        'organization': current_user.organization,
+        'is_superadmin': current_user.is_superadmin(),
+        'is_org_admin': current_user.is_org_admin(),
+        'is_authenticated': current_user.is_authenticated
+    }
+
+    # Get org settings if available
+    org_settings = None
+    if current_user.organization:
+        org_settings = db_session.query(OrganizationSettings)\
+            .filter_by(organization_name=current_user.organization)\
+            .first()
 
-        org_info = None
-        if org_settings:
-            org_info = {
-                'display_name': org_settings.display_name,
-                'has_openai_key': org_settings.has_openai_key(),
-                'has_gemini_key': org_settings.has_gemini_key()
-            }
+    org_info = None
+    if org_settings:
+        org_info = {
+            'display_name': org_settings.display_name,
+            'has_openai_key': org_settings.has_openai_key(),
+            'has_gemini_key': org_settings.has_gemini_key()
+        }
 
-        return jsonify({
-            'user': user_info,
-            'organization': org_info,
-            'message': 'If is_superadmin is True, you should see superadmin UI in /admin'
-        })
-    finally:
-        db_session.close()
+    return jsonify({
+        'user': user_info,
+        'organization': org_info,
+        'message': 'If is_superadmin is True, you should see superadmin UI in /admin'
+    })
 
 
 @app.errorhandler(403)
@@ -0,0 +1,188 @@
+"""
+In-Process Cache Module
+Small per-worker caches for hot, rarely changing rows (e.g. the logged-in user)
+Each gunicorn worker has its own copy, so entries use a short TTL and are
+invalidated explicitly when the worker handling a change knows about it.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from flask_login import UserMixin
+
+from models import User, OrganizationSettings
+
+# Cache configuration
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))  # Seconds a cached user is trusted
+USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', '10000'))
+ORG_SETTINGS_CACHE_TTL = int(os.getenv('ORG_SETTINGS_CACHE_TTL', '300'))  # Seconds cached branding is trusted
+
+_MISSING = object()  # Cached marker for lookups that matched no row
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, ttl: int, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Remove key if cached"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+
+class ReadOnlySnapshot:
+    """Immutable, session-independent copy of selected columns of a database row"""
+
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only; update the database row instead (tried to set {name})")
+
+    @classmethod
+    def from_row(cls, row):
+        """Copy the snapshot's fields from a database row"""
+        return cls(**{name: getattr(row, name) for name in cls.__slots__})
+
+
+class UserSnapshot(ReadOnlySnapshot, UserMixin):
+    """
+    Read-only User for Flask-Login
+
+    Holds the columns templates and permission checks read from current_user.
+    To change a user, load the User row in a database session instead.
+    """
+
+    __slots__ = ('id', 'email', 'name', 'organization', 'role', 'ai_provider', 'ai_model', 'created_at')
+
+    # Share role logic with the User model
+    is_superadmin = User.is_superadmin
+    is_org_admin = User.is_org_admin
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.email}>'
+
+
+user_cache = TTLCache(ttl=USER_CACHE_TTL, max_size=USER_CACHE_MAX_SIZE)
+
+
+def get_cached_user(user_id: int) -> Optional[UserSnapshot]:
+    """Return the cached snapshot for user_id, or None on a miss"""
+    return user_cache.get(user_id)
+
+
+def cache_user(user: User) -> UserSnapshot:
+    """Snapshot a User row and cache it"""
+    snapshot = UserSnapshot.from_row(user)
+    user_cache.set(user.id, snapshot)
+    return snapshot
+
+
+def invalidate_user(user_id: Optional[int] = None) -> None:
+    """Drop one cached user, or all of them when user_id is None"""
+    if user_id is None:
+        user_cache.clear()
+    else:
+        user_cache.delete(user_id)
+
+
+class OrgSettingsSnapshot(ReadOnlySnapshot):
+    """
+    Read-only organization branding for templates
+
+    API keys are deliberately not copied. The theme CSS is rendered once when
+    the snapshot is taken instead of on every page.
+    """
+
+    __slots__ = ('id', 'organization_name', 'display_name', 'subdomain', 'url_path',
+                 'logo_filename', 'favicon_filename',
+                 'primary_color', 'secondary_color', 'success_color', 'danger_color',
+                 'custom_css', 'custom_footer_html',
+                 'enable_analytics', 'enable_csv_export', 'enable_pdf_export', 'enable_ai_cache',
+                 'contact_email', 'support_url', 'updated_at', 'theme_css')
+
+    @classmethod
+    def from_row(cls, row: OrganizationSettings) -> 'OrgSettingsSnapshot':
+        fields = {name: getattr(row, name) for name in cls.__slots__ if name != 'theme_css'}
+        return cls(theme_css=row.get_theme_css(), **fields)
+
+    def get_theme_css(self):
+        """Return the theme CSS rendered when the snapshot was taken"""
+        return self.theme_css
+
+    # Share URL helpers with the OrganizationSettings model
+    get_logo_url = OrganizationSettings.get_logo_url
+    get_theme_version = OrganizationSettings.get_theme_version
+
+    def __repr__(self):
+        return f'<OrgSettingsSnapshot {self.organization_name}>'
+
+
+org_settings_cache = TTLCache(ttl=ORG_SETTINGS_CACHE_TTL, max_size=4096)
+
+
+def get_cached_org_settings(db_session, field: str, value) -> Optional[OrgSettingsSnapshot]:
+    """
+    Look up organization settings by one unique column, caching hits and misses
+
+    Args:
+        db_session: Database session used on a cache miss
+        field: 'id', 'organization_name', 'subdomain' or 'url_path'
+        value: Value to match
+
+    Returns:
+        OrgSettingsSnapshot, or None if no organization matches
+    """
+    key = (field, value)
+    snapshot = org_settings_cache.get(key)
+
+    if snapshot is None:
+        row = db_session.query(OrganizationSettings).filter_by(**{field: value}).first()
+        snapshot = OrgSettingsSnapshot.from_row(row) if row else _MISSING
+        org_settings_cache.set(key, snapshot)
+
+    return None if snapshot is _MISSING else snapshot
+
+
+def invalidate_org_settings() -> None:
+    """Drop all cached organization settings (lookups by subdomain or path may change too)"""
+    org_settings_cache.clear()
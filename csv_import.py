@@ -0,0 +1,256 @@
+"""
+CSV Question Import Module
+Streams an uploaded CSV file row by row and imports its questions in chunks:
+each chunk is validated in one batch, written with bulk INSERTs and committed
+together with the CsvImport progress record, so memory use does not grow with
+the file and a failed import can be resumed after its last committed chunk.
+A running hash of the committed rows makes sure a resume continues the same file.
+"""
+
+import io
+import os
+import csv
+from datetime import datetime
+from hashlib import sha256
+from typing import Dict, List
+
+from utils import validate_questions_batch
+from question_index import PersistedDuplicateIndex, bulk_insert_questions
+
+# Import configuration
+CSV_IMPORT_CHUNK_SIZE = int(os.getenv('CSV_IMPORT_CHUNK_SIZE', '500'))  # Rows validated and committed together
+MAX_STORED_ERRORS = 500  # Row errors kept on the import record; error_count keeps counting
+
+REQUIRED_HEADERS = ['question']
+QUESTION_TYPE_ALIASES = {
+    'mcq': 'mcq',
+    'multiple_choice': 'mcq',
+    'true_false': 'true_false',
+    'true/false': 'true_false',
+    'tf': 'true_false',
+    'short_answer': 'short_answer',
+    'short answer': 'short_answer',
+}
+KEY_POINTS_SEPARATOR = '|'
+
+
+def open_csv_reader(stream) -> csv.DictReader:
+    """
+    Open a binary upload stream as a CSV reader that decodes incrementally
+
+    Args:
+        stream: Binary file object (e.g. FileStorage.stream)
+
+    Returns:
+        csv.DictReader positioned after the header row
+
+    Raises:
+        ValueError: If the file is empty, not UTF-8, or misses required columns
+    """
+    # utf-8-sig also accepts the byte order mark spreadsheet programs write
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+
+    try:
+        fieldnames = reader.fieldnames
+    except UnicodeDecodeError:
+        raise ValueError('CSV file must be UTF-8 encoded')
+
+    if not fieldnames:
+        raise ValueError('CSV file is empty or invalid')
+
+    missing_headers = set(REQUIRED_HEADERS) - {name.strip() for name in fieldnames}
+    if missing_headers:
+        raise ValueError(f'CSV is missing required columns: {", ".join(sorted(missing_headers))}')
+
+    reader.fieldnames = [name.strip() for name in fieldnames]
+    return reader
+
+
+def _cell(row: Dict, column: str) -> str:
+    """Stripped value of a CSV cell, '' when the column or value is missing"""
+    return (row.get(column) or '').strip()
+
+
+def parse_question_row(row: Dict, row_num: int) -> Dict:
+    """
+    Turn a CSV row into a candidate for utils.validate_questions_batch
+
+    Rows without a question_type column are MCQ, as in the original template.
+
+    Args:
+        row: CSV row from csv.DictReader
+        row_num: Row number in the file (the header is row 1)
+
+    Returns:
+        Candidate dict; 'fields' holds the extra Question columns of its type
+
+    Raises:
+        ValueError: If the question type is unknown or a short answer has no model answer
+    """
+    type_name = _cell(row, 'question_type').lower() or 'mcq'
+    question_type = QUESTION_TYPE_ALIASES.get(type_name)
+    if not question_type:
+        raise ValueError(f"Unknown question type '{type_name}'. Use mcq, true_false, or short_answer")
+
+    candidate = {
+        'row_num': row_num,
+        'question_text': _cell(row, 'question'),
+        'question_type': question_type,
+        'fields': {'explanation': _cell(row, 'explanation')}
+    }
+
+    if question_type == 'mcq':
+        candidate['correct_answer'] = _cell(row, 'correct_answer').upper()
+        candidate['options'] = {
+            'A': _cell(row, 'option_a'),
+            'B': _cell(row, 'option_b'),
+            'C': _cell(row, 'option_c'),
+            'D': _cell(row, 'option_d')
+        }
+        candidate['fields']['correct_answer'] = candidate['correct_answer']
+
+    elif question_type == 'true_false':
+        candidate['correct_answer'] = _cell(row, 'correct_answer').lower()
+        candidate['fields']['correct_answer'] = candidate['correct_answer']
+
+    else:
+        model_answer = _cell(row, 'model_answer')
+        if not model_answer:
+            raise ValueError("Short answer questions require a model_answer")
+
+        key_points = _cell(row, 'key_points')
+        candidate['fields']['model_answer'] = model_answer
+        candidate['fields']['key_points'] = [
+            point.strip() for point in key_points.split(KEY_POINTS_SEPARATOR) if point.strip()
+        ]
+
+    return candidate
+
+
+def _row_bytes(values) -> bytes:
+    """Serialize a header or row for the running hash of an import"""
+    return repr(list(values)).encode('utf-8')
+
+
+def _check_resume(csv_import, rows_hash: str) -> None:
+    """Refuse to resume an import from a file whose first rows differ from the rows already committed"""
+    # Imports recorded before rows were hashed cannot be checked
+    if csv_import.rows_hash and rows_hash != csv_import.rows_hash:
+        raise ValueError(f'The uploaded file does not match the first {csv_import.rows_processed} rows '
+                         f'already imported from {csv_import.filename}. Upload the same file to resume')
+
+
+def _import_chunk(db_session, duplicate_index, csv_import, candidates: List[Dict], row_errors: List[Dict],
+                  rows: int, rows_hash: str, document_id: int, created_by: int) -> None:
+    """Validate, insert and commit one chunk of parsed rows together with the import progress"""
+    results = validate_questions_batch(candidates, duplicate_index=duplicate_index, auto_fix=True)
+
+    mappings = []
+    for candidate, (is_valid, errors, fixed_data) in zip(candidates, results):
+        if not is_valid:
+            row_errors.append({'row': candidate['row_num'], 'error': ', '.join(errors)})
+            continue
+
+        mapping = dict(candidate['fields'])
+        if candidate['question_type'] == 'mcq':
+            mapping['options_json'] = fixed_data['options']
+
+        mapping.update({
+            'question_text': fixed_data['question_text'],
+            'question_type': candidate['question_type'],
+            'document_id': document_id,
+            'difficulty': fixed_data['difficulty'],
+            'status': 'approved',
+            'created_by': created_by
+        })
+        mappings.append(mapping)
+
+    if mappings:
+        bulk_insert_questions(db_session, mappings)
+
+    stored_errors = csv_import.errors_json or []
+    room = MAX_STORED_ERRORS - len(stored_errors)
+    if row_errors and room > 0:
+        # Reassign so the JSON column sees the change
+        csv_import.errors_json = stored_errors + sorted(row_errors, key=lambda error: error['row'])[:room]
+
+    csv_import.rows_processed += rows
+    csv_import.rows_hash = rows_hash
+    csv_import.imported_count += len(mappings)
+    csv_import.error_count += len(row_errors)
+    db_session.commit()
+
+    # Committed questions are now found through the database
+    duplicate_index.clear_pending()
+
+
+def import_questions(db_session, reader: csv.DictReader, csv_import, document_id: int, created_by: int,
+                     chunk_size: int = CSV_IMPORT_CHUNK_SIZE):
+    """
+    Import questions from a CSV reader in committed chunks
+
+    Rows already processed by an earlier run of csv_import are skipped, so
+    uploading the same file again resumes the import; the import fails without
+    importing anything if those rows differ from the ones committed before.
+    On an unexpected error the current chunk is rolled back and the import is
+    marked failed.
+
+    Args:
+        db_session: Database session
+        reader: Reader from open_csv_reader()
+        csv_import: CsvImport record to update
+        document_id: Document the questions are stored under
+        created_by: ID of the importing user
+        chunk_size: Rows validated and committed together
+
+    Returns:
+        The updated CsvImport record
+    """
+    duplicate_index = PersistedDuplicateIndex(db_session, document_id=document_id)
+    skip_rows = csv_import.rows_processed
+    rows_hasher = sha256(_row_bytes(reader.fieldnames))
+    candidates = []
+    row_errors = []
+    rows = 0
+    rows_read = 0
+
+    try:
+        for row_num, row in enumerate(reader, start=2):  # Start from 2 (accounting for header)
+            rows_read += 1
+            rows_hasher.update(_row_bytes(row.values()))
+            if rows_read <= skip_rows:
+                if rows_read == skip_rows:
+                    _check_resume(csv_import, rows_hasher.hexdigest())
+                continue
+
+            try:
+                candidates.append(parse_question_row(row, row_num))
+            except ValueError as e:
+                row_errors.append({'row': row_num, 'error': str(e)})
+
+            rows += 1
+            if rows == chunk_size:
+                _import_chunk(db_session, duplicate_index, csv_import, candidates, row_errors, rows,
+                              rows_hasher.hexdigest(), document_id, created_by)
+                candidates, row_errors, rows = [], [], 0
+
+        if rows_read < skip_rows:
+            raise ValueError(f'The uploaded file has only {rows_read} rows, but {skip_rows} rows '
+                             f'were already imported from {csv_import.filename}. Upload the same file to resume')
+
+        if rows:
+            _import_chunk(db_session, duplicate_index, csv_import, candidates, row_errors, rows,
+                          rows_hasher.hexdigest(), document_id, created_by)
+
+        csv_import.status = 'completed'
+        csv_import.error_message = None
+
+    except Exception as e:
+        db_session.rollback()
+        print(f"✗ CSV import {csv_import.id} failed after {csv_import.rows_processed} rows: {e}")
+        csv_import.status = 'failed'
+        csv_import.error_message = 'File is not valid UTF-8' if isinstance(e, UnicodeDecodeError) else str(e)
+
+    csv_import.completed_at = datetime.utcnow()
+    db_session.commit()
+    return csv_import
@@ -0,0 +1,177 @@
+"""
+Near-Duplicate Question Detection
+MinHash signatures over character shingles, bucketed with LSH banding, so a
+new question is compared with SequenceMatcher only against the few existing
+questions that share a band instead of the whole question bank.
+Uses only the standard library.
+"""
+
+import random
+from difflib import SequenceMatcher
+from hashlib import blake2b, sha256
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# MinHash / LSH configuration
+# Questions at a SequenceMatcher ratio of 0.85 that differ by a few words keep a
+# shingle Jaccard similarity of about 0.6 or more, and 32 bands of 4 rows make
+# them candidates with about 99% probability (1 - (1 - 0.6^4)^32), while
+# unrelated questions of the same topic (Jaccard around 0.15) rarely share a band.
+# Characters substituted evenly through a question can keep a ratio of 0.85 at a
+# Jaccard similarity of only 0.35; catching those too would take over a hundred
+# bands per question and return a third of a same-topic bank as candidates.
+SHINGLE_SIZE = 3
+NUM_BANDS = 32
+ROWS_PER_BAND = 4
+SIGNATURE_SIZE = NUM_BANDS * ROWS_PER_BAND
+DEFAULT_THRESHOLD = 0.85  # Same default as utils.check_duplicate_question
+
+_EMPTY_BIN = 1 << 64  # Larger than any bin minimum
+
+# Fixed seed so signatures are stable across processes and restarts
+_rng = random.Random(1729)
+_PROBE_ORDER = [_rng.sample(range(SIGNATURE_SIZE), SIGNATURE_SIZE) for _ in range(SIGNATURE_SIZE)]
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a question the way duplicate checks compare it"""
+    return text.strip().lower()
+
+
+def is_similar(normalized: str, other_normalized: str, threshold: float) -> bool:
+    """SequenceMatcher comparison of utils.check_duplicate_question, with its cheap upper bounds tried first"""
+    matcher = SequenceMatcher(None, normalized, other_normalized)
+    return matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold \
+        and matcher.ratio() >= threshold
+
+
+def shingle_hashes(normalized: str) -> Set[int]:
+    """Hash the character shingles of normalized text to 64-bit integers"""
+    if len(normalized) <= SHINGLE_SIZE:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+    return {int.from_bytes(blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big') for shingle in shingles}
+
+
+def minhash_signature(normalized: str) -> Tuple[int, ...]:
+    """
+    Compute the MinHash signature of normalized text
+
+    Uses one-permutation hashing: each shingle hash picks one of
+    SIGNATURE_SIZE bins and each bin keeps its minimum, which costs one pass
+    over the shingles instead of one per signature value. Empty bins borrow
+    another bin's minimum (densification) so that similar texts still agree on them.
+
+    Returns:
+        Tuple of SIGNATURE_SIZE minimum hash values
+    """
+    mins = [None] * SIGNATURE_SIZE
+    for value in shingle_hashes(normalized):
+        position, rank = value % SIGNATURE_SIZE, value // SIGNATURE_SIZE
+        if mins[position] is None or rank < mins[position]:
+            mins[position] = rank
+
+    # Each empty bin takes the minimum of the first filled bin in its own fixed
+    # pseudo-random probe order, which keeps empty bins nearly independent
+    signature = list(mins)
+    for position in range(SIGNATURE_SIZE):
+        if signature[position] is None:
+            source = next((other for other in _PROBE_ORDER[position] if mins[other] is not None), None)
+            signature[position] = mins[source] if source is not None else _EMPTY_BIN
+
+    return tuple(signature)
+
+
+def signature_bands(signature: Tuple[int, ...]) -> List[int]:
+    """Hash each LSH band of a signature to one bucket key per band"""
+    bands = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = blake2b(repr((band,) + rows).encode('ascii'), digest_size=8).digest()
+        # Signed 64-bit range so keys also fit a BIGINT column
+        bands.append(int.from_bytes(digest, 'big', signed=True))
+    return bands
+
+
+def question_fingerprint(text: str) -> Tuple[str, List[int]]:
+    """
+    Fingerprint a question for persisted duplicate lookup
+
+    Returns:
+        Tuple of (SHA-256 hex digest of the normalized text, LSH band keys)
+    """
+    normalized = normalize_text(text)
+    text_hash = sha256(normalized.encode('utf-8')).hexdigest()
+    return text_hash, signature_bands(minhash_signature(normalized))
+
+
+class NearDuplicateIndex:
+    """
+    In-memory near-duplicate index for question texts
+
+    Build it once from the existing questions of a document (or organization)
+    and add each accepted question as it is saved. find_duplicate() returns the
+    same answer as a full SequenceMatcher scan whenever LSH surfaces the match.
+    """
+
+    def __init__(self, texts: Optional[Iterable[str]] = None, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._texts: List[str] = []
+        self._normalized: List[str] = []
+        self._exact: Dict[str, int] = {}
+        self._buckets: Dict[int, List[int]] = {}
+
+        for text in texts or ():
+            self.add(text)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, text: str) -> None:
+        """Add a question text to the index"""
+        normalized = normalize_text(text)
+        position = len(self._texts)
+
+        self._texts.append(text)
+        self._normalized.append(normalized)
+        self._exact.setdefault(normalized, position)
+
+        for key in signature_bands(minhash_signature(normalized)):
+            self._buckets.setdefault(key, []).append(position)
+
+    def candidates(self, normalized: str) -> List[int]:
+        """Positions of indexed texts sharing at least one LSH band, in insertion order"""
+        found = set()
+        for key in signature_bands(minhash_signature(normalized)):
+            found.update(self._buckets.get(key, ()))
+        return sorted(found)
+
+    def find_duplicate(self, text: str, threshold: Optional[float] = None) -> Optional[str]:
+        """
+        Find an indexed question similar to text
+
+        Args:
+            text: Question text to check
+            threshold: SequenceMatcher ratio treated as a duplicate (defaults to the index threshold)
+
+        Returns:
+            The first similar indexed text (in insertion order), or None
+        """
+        if not self._texts:
+            return None
+
+        threshold = self.threshold if threshold is None else threshold
+        normalized = normalize_text(text)
+
+        exact = self._exact.get(normalized)
+        candidates = self.candidates(normalized)
+
+        for position in candidates:
+            if exact is not None and position > exact:
+                # An identical text earlier in the bank is always similar enough
+                break
+            if is_similar(normalized, self._normalized[position], threshold):
+                return self._texts[position]
+
+        return self._texts[exact] if exact is not None else None
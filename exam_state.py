@@ -0,0 +1,208 @@
+"""
+Exam State Module
+Server-side storage for exams in progress. The Flask session only carries the
+exam ID; the question order, timing and saved answers live in the database so
+requests stay small and answers survive a browser crash.
+"""
+
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import update, delete
+from sqlalchemy.exc import IntegrityError
+
+from models import ExamAttempt, ExamAttemptAnswer
+
+
+def start_attempt(db_session, exam, question_ids, document_id: Optional[int], duration: int) -> ExamAttempt:
+    """
+    Create the server-side state for a new exam (committed by the caller)
+
+    Args:
+        db_session: Database session
+        exam: Exam record being started
+        question_ids: Ordered list of question IDs for the exam
+        document_id: Document the questions were drawn from
+        duration: Exam duration in minutes
+
+    Returns:
+        The new ExamAttempt
+    """
+    attempt = ExamAttempt(
+        exam_id=exam.id,
+        document_id=document_id,
+        question_ids=list(question_ids),
+        started_at=datetime.utcnow(),
+        duration=duration
+    )
+    db_session.add(attempt)
+    return attempt
+
+
+def get_attempt(db_session, exam_id: int) -> Optional[ExamAttempt]:
+    """Get the server-side state of an exam, or None if it has none"""
+    return db_session.query(ExamAttempt).filter_by(exam_id=exam_id).first()
+
+
+def attempt_from_session(db_session, exam, session_data) -> Optional[ExamAttempt]:
+    """
+    Move the state of an exam started before exam state was kept server-side
+    out of the session cookie and into the database (committed here)
+
+    Older versions kept the question order, timing and answers in the session;
+    exams in progress during the upgrade are carried over once so their answers
+    are not lost.
+
+    Args:
+        db_session: Database session
+        exam: Exam record in progress
+        session_data: The Flask session
+
+    Returns:
+        The new ExamAttempt, or None if the session holds no exam state
+    """
+    question_ids = session_data.get('exam_questions')
+    if not question_ids:
+        return None
+
+    try:
+        started_at = datetime.fromisoformat(session_data.get('exam_start_time'))
+    except (TypeError, ValueError):
+        started_at = datetime.utcnow()
+
+    attempt = start_attempt(db_session, exam, question_ids,
+                            document_id=session_data.get('exam_document_id'),
+                            duration=int(session_data.get('exam_duration') or 30))
+    attempt.started_at = started_at
+
+    question_times = session_data.get('question_times') or {}
+    for question_id, answer in (session_data.get('exam_answers') or {}).items():
+        db_session.add(ExamAttemptAnswer(exam_id=exam.id, question_id=int(question_id), answer=answer,
+                                         time_spent=int(question_times.get(question_id) or 0)))
+
+    db_session.commit()
+    return attempt
+
+
+def finish_attempt(db_session, exam_id: int) -> None:
+    """
+    Delete the server-side state of a submitted exam (committed by the caller)
+
+    The answers are copied to ExamQuestion records on submission, so the
+    attempt rows are no longer needed.
+    """
+    db_session.execute(delete(ExamAttemptAnswer).where(ExamAttemptAnswer.exam_id == exam_id))
+    db_session.execute(delete(ExamAttempt).where(ExamAttempt.exam_id == exam_id))
+
+
+def _check_question_ids(attempt: ExamAttempt, question_ids) -> None:
+    """Raise ValueError unless every question ID is part of the attempt"""
+    allowed = set(attempt.question_ids or [])
+    for question_id in question_ids:
+        if question_id not in allowed:
+            raise ValueError(f'Question {question_id} is not part of this exam')
+
+
+def load_answers(db_session, exam_id: int) -> Tuple[Dict[str, str], Dict[str, int]]:
+    """
+    Load the answers saved so far for an exam
+
+    Returns:
+        Tuple of (answers, question_times), both keyed by question ID as a string
+    """
+    rows = db_session.query(ExamAttemptAnswer.question_id, ExamAttemptAnswer.answer, ExamAttemptAnswer.time_spent)\
+        .filter_by(exam_id=exam_id)\
+        .all()
+
+    answers = {str(question_id): answer for question_id, answer, time_spent in rows}
+    question_times = {str(question_id): time_spent or 0 for question_id, answer, time_spent in rows}
+    return answers, question_times
+
+
+def save_answer(db_session, attempt: ExamAttempt, question_id: int, answer: Optional[str], time_spent: int) -> None:
+    """
+    Insert or update the saved answer for one question and commit
+
+    Updates first, since most saves overwrite an existing answer, and falls
+    back to an insert; a concurrent insert of the same answer is retried as an update.
+
+    Raises:
+        ValueError: If the question is not part of the exam
+    """
+    _check_question_ids(attempt, [question_id])
+    exam_id = attempt.exam_id
+    values = {'answer': answer, 'time_spent': time_spent, 'updated_at': datetime.utcnow()}
+
+    result = db_session.execute(
+        update(ExamAttemptAnswer)
+        .where(ExamAttemptAnswer.exam_id == exam_id, ExamAttemptAnswer.question_id == question_id)
+        .values(**values)
+    )
+
+    if result.rowcount == 0:
+        try:
+            db_session.add(ExamAttemptAnswer(exam_id=exam_id, question_id=question_id, **values))
+            db_session.commit()
+            return
+        except IntegrityError:
+            db_session.rollback()
+            db_session.execute(
+                update(ExamAttemptAnswer)
+                .where(ExamAttemptAnswer.exam_id == exam_id, ExamAttemptAnswer.question_id == question_id)
+                .values(**values)
+            )
+
+    db_session.commit()
+
+
+def save_answers(db_session, attempt: ExamAttempt, entries) -> int:
+    """
+    Save a batch of answers in one transaction and commit
+
+    Entries for the same question are coalesced so only the last one is
+    written; existing rows are updated and new ones inserted in bulk.
+
+    Args:
+        db_session: Database session
+        attempt: ExamAttempt of the exam in progress
+        entries: Iterable of (question_id, answer, time_spent) in the order they were made
+
+    Returns:
+        Number of questions written
+
+    Raises:
+        ValueError: If a question is not part of the exam (nothing is saved)
+    """
+    now = datetime.utcnow()
+    latest = {}
+    for question_id, answer, time_spent in entries:
+        latest[question_id] = {'answer': answer, 'time_spent': time_spent, 'updated_at': now}
+
+    if not latest:
+        return 0
+
+    _check_question_ids(attempt, latest.keys())
+    exam_id = attempt.exam_id
+
+    existing = dict(
+        db_session.query(ExamAttemptAnswer.question_id, ExamAttemptAnswer.id)
+        .filter(ExamAttemptAnswer.exam_id == exam_id, ExamAttemptAnswer.question_id.in_(latest.keys()))
+        .all()
+    )
+
+    updates = [dict(values, id=existing[question_id]) for question_id, values in latest.items() if question_id in existing]
+    inserts = [dict(values, exam_id=exam_id, question_id=question_id) for question_id, values in latest.items() if question_id not in existing]
+
+    try:
+        if updates:
+            db_session.bulk_update_mappings(ExamAttemptAnswer, updates)
+        if inserts:
+            db_session.bulk_insert_mappings(ExamAttemptAnswer, inserts)
+        db_session.commit()
+    except IntegrityError:
+        # Another request inserted one of these answers first; save them one at a time instead
+        db_session.rollback()
+        for question_id, values in latest.items():
+            save_answer(db_session, attempt, question_id, values['answer'], values['time_spent'])
+
+    return len(latest)
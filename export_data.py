@@ -1,6 +1,8 @@
 import json
 from datetime import datetime
+from sqlalchemy.orm import undefer
 from models import User, Document, Question, Exam, ExamQuestion, OrganizationSettings, get_engine, get_session
+from models import DOCUMENT_COMPRESSION, compress_text
 
 # Connect to SQLite database
 engine = get_engine('sqlite:///exam_simulator.db')
@@ -62,11 +64,12 @@ for org in session.query(OrganizationSettings).all():
 
 # Export documents
 print("Exporting documents...")
-for doc in session.query(Document).all():
+for doc in session.query(Document).options(undefer(Document.content)).all():
     data['documents'].append({
         'id': doc.id,
         'filename': doc.filename,
-        'content': doc.content,
+        # Compressed in the same 'z1:' format as the database; import_data decompresses it
+        'content': compress_text(doc.content) if DOCUMENT_COMPRESSION else doc.content,
         'uploaded_by': doc.uploaded_by,
         'organization': doc.organization,
         'created_at': doc.created_at.isoformat() if doc.created_at else None
@@ -0,0 +1,192 @@
+"""
+Background Question Generation Jobs
+Runs AI question generation outside the request cycle on a local worker pool.
+Jobs are persisted in the generation_jobs table so any web worker can report their status.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from sqlalchemy.orm import joinedload
+
+from models import GenerationJob, Document, OrganizationSettings, get_session
+from question_generator import generate_questions_mixed
+
+# Job configuration
+GENERATION_WORKERS = int(os.getenv('GENERATION_WORKERS', '4'))  # Concurrent jobs per web worker process
+GENERATION_JOB_TIMEOUT = int(os.getenv('GENERATION_JOB_TIMEOUT', '300'))  # Seconds a running job may take
+GENERATION_QUEUE_TIMEOUT = int(os.getenv('GENERATION_QUEUE_TIMEOUT', '900'))  # Seconds a job may wait to start
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the process-local worker pool, created on first use so it survives gunicorn's fork"""
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS,
+                                               thread_name_prefix='generation-job')
+
+    return _executor
+
+
+def enqueue_generation_job(engine, db_session, user, document, num_mcq: int, num_true_false: int,
+                           num_short_answer: int, provider: str, model: str) -> GenerationJob:
+    """
+    Persist a generation job and schedule it on the worker pool
+
+    Args:
+        engine: Database engine the worker uses to open its own session
+        db_session: Request database session used to create the job
+        user: User requesting the questions
+        document: Document to generate questions from
+        num_mcq: Number of MCQ questions
+        num_true_false: Number of True/False questions
+        num_short_answer: Number of Short Answer questions
+        provider: 'openai' or 'gemini'
+        model: AI model to use
+
+    Returns:
+        The committed GenerationJob
+    """
+    job = GenerationJob(
+        user_id=user.id,
+        document_id=document.id,
+        status='pending',
+        params_json={
+            'num_mcq': num_mcq,
+            'num_true_false': num_true_false,
+            'num_short_answer': num_short_answer,
+            'provider': provider,
+            'model': model
+        }
+    )
+    db_session.add(job)
+    db_session.commit()
+
+    get_executor().submit(run_generation_job, engine, job.id)
+    return job
+
+
+def run_generation_job(engine, job_id: int) -> None:
+    """
+    Execute a pending generation job and store its results
+
+    Args:
+        engine: Database engine
+        job_id: ID of the GenerationJob to run
+    """
+    db_session = get_session(engine)
+    try:
+        job = db_session.query(GenerationJob)\
+            .options(joinedload(GenerationJob.document).undefer(Document.content))\
+            .get(job_id)
+        if not job or job.status != 'pending':
+            return
+
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db_session.commit()
+
+        params = job.params_json or {}
+
+        # Organization API keys are read at run time so they are never stored on the job
+        openai_key = None
+        gemini_key = None
+        use_cache = True
+
+        organization = job.user.organization if job.user else None
+        if organization:
+            org_settings = db_session.query(OrganizationSettings)\
+                .filter_by(organization_name=organization)\
+                .first()
+
+            if org_settings:
+                openai_key = org_settings.openai_api_key
+                gemini_key = org_settings.gemini_api_key
+                use_cache = org_settings.enable_ai_cache is not False
+
+        results = generate_questions_mixed(
+            text=job.document.content,
+            num_mcq=params.get('num_mcq', 0),
+            num_true_false=params.get('num_true_false', 0),
+            num_short_answer=params.get('num_short_answer', 0),
+            model=params.get('model', 'gemini-2.5-flash'),
+            provider=params.get('provider', 'gemini'),
+            openai_api_key=openai_key,
+            gemini_api_key=gemini_key,
+            use_cache=use_cache,
+            organization=organization,
+            deadline=GENERATION_JOB_TIMEOUT * 0.9,
+            wait_for_rate_limit=True
+        )
+
+        job.result_json = {
+            'mcq': results.get('mcq', []),
+            'true_false': results.get('true_false', []),
+            'short_answer': results.get('short_answer', [])
+        }
+        job.errors_json = results.get('errors', [])
+        job.status = 'completed' if job.total_generated() > 0 else 'failed'
+        job.completed_at = datetime.utcnow()
+        db_session.commit()
+
+    except Exception as e:
+        db_session.rollback()
+        print(f"Generation job {job_id} failed: {e}")
+        try:
+            job = db_session.query(GenerationJob).get(job_id)
+            if job:
+                job.status = 'failed'
+                job.errors_json = [f"Error generating questions: {str(e)}"]
+                job.completed_at = datetime.utcnow()
+                db_session.commit()
+        except Exception:
+            db_session.rollback()
+    finally:
+        db_session.close()
+
+
+def fail_if_stale(db_session, job: GenerationJob) -> bool:
+    """
+    Mark an unfinished job as failed if it has been running for longer than
+    GENERATION_JOB_TIMEOUT, or waiting to start for longer than
+    GENERATION_QUEUE_TIMEOUT (for example because the worker process
+    holding it was restarted)
+
+    Returns:
+        True if the job was marked as failed
+    """
+    if job.is_finished():
+        return False
+
+    # Time spent queued behind other jobs does not count against a running job
+    if job.started_at:
+        if datetime.utcnow() - job.started_at < timedelta(seconds=GENERATION_JOB_TIMEOUT):
+            return False
+    elif datetime.utcnow() - job.created_at < timedelta(seconds=GENERATION_QUEUE_TIMEOUT):
+        return False
+
+    job.status = 'failed'
+    job.errors_json = (job.errors_json or []) + ['Question generation did not finish in time. Please try again.']
+    job.completed_at = datetime.utcnow()
+    db_session.commit()
+    return True
+
+
+def job_status(job: GenerationJob) -> Dict:
+    """Build the JSON status payload polled by the generate questions page"""
+    return {
+        'id': job.id,
+        'status': job.status,
+        'finished': job.is_finished(),
+        'total_generated': job.total_generated(),
+        'errors': job.errors_json or []
+    }
@@ -0,0 +1,203 @@
+"""
+Short Answer Grading Module
+Grades short answers with AI semantic comparison, falling back to keyword overlap
+Supports grading all short answers of an exam submission concurrently under one deadline
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from ai_clients import get_openai_client, get_gemini_model
+from rate_limiter import get_grading_rate_limiter, make_rate_limit_key
+
+# Grading configuration
+# Keep the deadline below gunicorn's worker timeout so the submission can still respond
+GRADING_DEADLINE = float(os.getenv('AI_GRADING_DEADLINE', '20'))  # Seconds for a whole submission
+GRADING_WORKERS = int(os.getenv('AI_GRADING_WORKERS', '8'))  # Parallel AI calls per submission
+PASS_SCORE = 60  # Scores at or above this are marked correct
+
+GRADING_PROMPT_TEMPLATE = """You are an exam grader. Grade the following short answer question.
+
+Model Answer: {model_answer}
+
+Key Points to Cover:
+{key_points}
+
+Student's Answer: {user_answer}
+
+Evaluate the student's answer based on:
+1. Semantic similarity to the model answer
+2. Coverage of key points
+3. Accuracy of information
+4. Completeness
+
+Provide your response in this exact format:
+SCORE: [0-100]
+PASS: [YES/NO]
+FEEDBACK: [Brief feedback about what was good or missing]"""
+
+
+def keyword_grade(user_answer: str, model_answer: Optional[str], key_points: Optional[List[str]]) -> Tuple[bool, float, str]:
+    """
+    Grade a short answer by key point coverage, or word overlap with the model answer
+
+    Returns:
+        tuple: (is_correct: bool, similarity_score: float, feedback: str)
+    """
+    user_lower = user_answer.lower()
+    model_lower = model_answer.lower() if model_answer else ""
+
+    # Count how many key points are mentioned
+    if key_points:
+        points_covered = sum(1 for point in key_points if point.lower() in user_lower)
+        coverage = (points_covered / len(key_points)) * 100
+
+        if coverage >= 50:
+            return True, coverage, f"Covered {points_covered}/{len(key_points)} key points"
+        else:
+            return False, coverage, f"Only covered {points_covered}/{len(key_points)} key points"
+
+    # Simple word overlap if no key points
+    model_words = set(model_lower.split())
+    user_words = set(user_lower.split())
+    overlap = len(model_words & user_words) / len(model_words) if model_words else 0
+
+    if overlap >= 0.3:
+        return True, overlap * 100, "Partial match with model answer"
+    else:
+        return False, overlap * 100, "Low similarity to model answer"
+
+
+def parse_grading_response(result_text: str) -> Tuple[bool, float, str]:
+    """Parse the SCORE / PASS / FEEDBACK lines of a grading response"""
+    score = 0
+    is_correct = False
+    feedback = "Graded by AI"
+
+    for line in result_text.strip().split('\n'):
+        if line.startswith('SCORE:'):
+            score = float(line.split(':')[1].strip())
+        elif line.startswith('PASS:'):
+            is_correct = 'YES' in line.upper()
+        elif line.startswith('FEEDBACK:'):
+            feedback = line.split(':', 1)[1].strip()
+
+    if score >= PASS_SCORE:
+        is_correct = True
+
+    return is_correct, score, feedback
+
+
+def grade_short_answer(user_answer, model_answer, key_points, provider='gemini', api_key=None,
+                       organization=None, wait_until=None):
+    """
+    Grade a short answer using AI semantic comparison
+
+    Args:
+        user_answer: Student's answer text
+        model_answer: Correct answer text
+        key_points: List of key points that should be covered
+        provider: AI provider ('openai' or 'gemini')
+        api_key: API key for the provider
+        organization: Organization the AI call is rate limited under (grading has its own buckets)
+        wait_until: time.monotonic() value up to which to wait for a rate limit token
+                    (None does not wait); rate limited answers are keyword graded
+
+    Returns:
+        tuple: (is_correct: bool, similarity_score: float, feedback: str)
+    """
+    if not user_answer or not user_answer.strip():
+        return False, 0.0, "No answer provided"
+
+    prompt = GRADING_PROMPT_TEMPLATE.format(
+        model_answer=model_answer,
+        key_points='\n'.join(f'- {point}' for point in key_points) if key_points else 'N/A',
+        user_answer=user_answer
+    )
+
+    limiter = get_grading_rate_limiter()
+    key = make_rate_limit_key(organization, provider, 'grading')
+    if wait_until is None:
+        allowed, retry_after = limiter.try_acquire(key)
+    else:
+        allowed, retry_after = limiter.acquire(key, max(0.0, wait_until - time.monotonic()))
+    if not allowed:
+        print(f"[Grading] AI rate limit reached for {organization or 'default'}, using keyword fallback")
+        return keyword_grade(user_answer, model_answer, key_points)
+
+    try:
+        if provider == 'gemini':
+            model = get_gemini_model(api_key, 'gemini-2.0-flash-exp')
+            response = model.generate_content(prompt)
+            result_text = response.text
+        else:  # openai
+            client = get_openai_client(api_key)
+            response = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3
+            )
+            result_text = response.choices[0].message.content
+
+        return parse_grading_response(result_text)
+
+    except Exception as e:
+        print(f"[Grading] AI grading failed, using keyword fallback: {e}")
+        return keyword_grade(user_answer, model_answer, key_points)
+
+
+def grade_short_answers_batch(items: Dict[int, Tuple[str, Optional[str], Optional[List[str]]]],
+                              provider: str = 'gemini', api_key: Optional[str] = None,
+                              deadline: float = GRADING_DEADLINE,
+                              organization: Optional[str] = None,
+                              wait_for_rate_limit: bool = False) -> Dict[int, Tuple[bool, float, str]]:
+    """
+    Grade several short answers concurrently
+
+    Args:
+        items: Mapping of question ID to (user_answer, model_answer, key_points)
+        provider: AI provider ('openai' or 'gemini')
+        api_key: API key for the provider
+        deadline: Seconds to wait for the whole batch; answers not graded
+                  in time are graded by keyword overlap instead
+        organization: Organization the AI calls are rate limited under
+        wait_for_rate_limit: Wait for rate limit tokens until the deadline instead of
+                             keyword grading at once (for background jobs, not web requests)
+
+    Returns:
+        Mapping of question ID to (is_correct, similarity_score, feedback)
+    """
+    if not items:
+        return {}
+
+    wait_until = time.monotonic() + deadline if wait_for_rate_limit else None
+    executor = ThreadPoolExecutor(max_workers=min(GRADING_WORKERS, len(items)),
+                                  thread_name_prefix='short-answer-grading')
+    try:
+        futures = {
+            executor.submit(grade_short_answer, user_answer, model_answer, key_points, provider, api_key,
+                            organization, wait_until): item_id
+            for item_id, (user_answer, model_answer, key_points) in items.items()
+        }
+        wait(futures, timeout=deadline)
+    finally:
+        # Do not block the submission on graders still running past the deadline
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    results = {}
+    for future, item_id in futures.items():
+        if future.done() and not future.cancelled() and future.exception() is None:
+            results[item_id] = future.result()
+            continue
+
+        if future.done() and not future.cancelled():
+            print(f"[Grading] Question {item_id} grading failed, using keyword fallback: {future.exception()}")
+        else:
+            print(f"[Grading] Question {item_id} not graded within {deadline} seconds, using keyword fallback")
+
+        user_answer, model_answer, key_points = items[item_id]
+        results[item_id] = keyword_grade(user_answer, model_answer, key_points)
+
+    return results
@@ -0,0 +1,130 @@
+"""
+Deferred Exam Grading Jobs
+Grades short answers after an exam is submitted, on a local worker pool,
+then finalizes the exam score. Pending state lives on the Exam row so any
+web worker can show partial results and pick up grading that was lost.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from models import Exam, ExamQuestion, Question, OrganizationSettings, get_session
+from grading import grade_short_answers_batch
+
+# Deferred grading configuration
+DEFERRED_GRADING = os.getenv('DEFERRED_GRADING', 'false').lower() == 'true'
+GRADING_JOB_WORKERS = int(os.getenv('GRADING_JOB_WORKERS', '2'))  # Concurrent exams graded per web worker process
+GRADING_JOB_TIMEOUT = int(os.getenv('GRADING_JOB_TIMEOUT', '120'))  # Seconds before pending grading is retried
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = set()  # Exam IDs being graded by this process
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the process-local grading pool, created on first use so it survives gunicorn's fork"""
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=GRADING_JOB_WORKERS,
+                                               thread_name_prefix='exam-grading')
+
+    return _executor
+
+
+def enqueue_exam_grading(engine, exam_id: int) -> bool:
+    """
+    Schedule grading of an exam's pending short answers
+
+    Args:
+        engine: Database engine the worker uses to open its own session
+        exam_id: ID of the submitted Exam
+
+    Returns:
+        False if this process is already grading the exam
+    """
+    with _executor_lock:
+        if exam_id in _in_flight:
+            return False
+        _in_flight.add(exam_id)
+
+    get_executor().submit(run_exam_grading, engine, exam_id)
+    return True
+
+
+def run_exam_grading(engine, exam_id: int) -> None:
+    """
+    Grade the pending short answers of an exam and finalize its score
+
+    Args:
+        engine: Database engine
+        exam_id: ID of the Exam to grade
+    """
+    db_session = get_session(engine)
+    try:
+        exam = db_session.query(Exam).get(exam_id)
+        if not exam or not exam.is_grading_pending():
+            return
+
+        pending = db_session.query(ExamQuestion, Question)\
+            .join(Question, ExamQuestion.question_id == Question.id)\
+            .filter(ExamQuestion.exam_id == exam_id, ExamQuestion.is_correct.is_(None))\
+            .all()
+
+        # Organization API key is read at grading time, as for generation jobs
+        user = exam.user
+        provider = user.ai_provider or 'gemini'
+        org_api_key = None
+
+        if user.organization:
+            org_settings = db_session.query(OrganizationSettings)\
+                .filter_by(organization_name=user.organization)\
+                .first()
+            if org_settings:
+                org_api_key = org_settings.gemini_api_key if provider == 'gemini' else org_settings.openai_api_key
+
+        items = {
+            exam_question.id: (exam_question.user_answer or '', question.model_answer, question.key_points)
+            for exam_question, question in pending
+        }
+        grades = grade_short_answers_batch(items, provider=provider, api_key=org_api_key,
+                                           deadline=GRADING_JOB_TIMEOUT * 0.9, organization=user.organization,
+                                           wait_for_rate_limit=True)
+
+        for exam_question, question in pending:
+            is_correct, score, feedback = grades[exam_question.id]
+            exam_question.is_correct = is_correct
+
+        exam.calculate_score()
+        exam.grading_status = 'complete'
+        db_session.commit()
+
+    except Exception as e:
+        db_session.rollback()
+        # Leave the exam pending; exam_results retries once GRADING_JOB_TIMEOUT has passed
+        print(f"Grading job for exam {exam_id} failed: {e}")
+    finally:
+        db_session.close()
+        with _executor_lock:
+            _in_flight.discard(exam_id)
+
+
+def retry_if_stale(engine, exam: Exam) -> bool:
+    """
+    Re-schedule grading for an exam still pending after GRADING_JOB_TIMEOUT
+    (for example because the worker process grading it was restarted)
+
+    Returns:
+        True if grading was scheduled again
+    """
+    if not exam.is_grading_pending():
+        return False
+
+    if datetime.utcnow() - exam.completed_at < timedelta(seconds=GRADING_JOB_TIMEOUT):
+        return False
+
+    return enqueue_exam_grading(engine, exam.id)
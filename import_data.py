@@ -13,7 +13,7 @@ from datetime import datetime
 from dotenv import load_dotenv
 from models import (
     User, Document, Question, Exam, ExamQuestion, OrganizationSettings,
-    get_engine, get_session, create_all_tables
+    get_engine, get_session, create_all_tables, decompress_text
 )
 
 def parse_datetime(dt_string):
@@ -142,7 +142,7 @@ def import_data(filename='exam_data_export.json', clear_existing=False):
         doc = Document(
             id=doc_data['id'],
             filename=doc_data['filename'],
-            content=doc_data['content'],
+            content=decompress_text(doc_data['content']),
             uploaded_by=doc_data['uploaded_by'],
             organization=doc_data.get('organization'),
             created_at=parse_datetime(doc_data.get('created_at'))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Migration Script: Compress stored document text
+
+Rewrites documents.content of existing rows in the compressed 'z1:' format
+used by models.CompressedText, a batch at a time, and records content_length
+for each document. Rows that are already compressed are skipped, so the
+script can be stopped and run again safely.
+
+Run migrate_db.py first so the content_length column exists.
+
+Usage:
+    python migrate_compress_documents.py [batch_size]
+    python migrate_compress_documents.py --decompress [batch_size]
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+from sqlalchemy import text
+from models import COMPRESSION_MARKER, compress_text, decompress_text, get_engine
+
+DEFAULT_BATCH_SIZE = 200
+
+
+def migrate_documents(engine, batch_size=DEFAULT_BATCH_SIZE, decompress=False):
+    """
+    Compress (or decompress) document text in batches, committing after each batch
+
+    Args:
+        engine: Database engine
+        batch_size: Documents rewritten per transaction
+        decompress: Restore plain text instead, e.g. before rolling back to
+                    a version without compression support
+
+    Returns:
+        tuple: (documents rewritten, bytes before, bytes after)
+    """
+    last_id = 0
+    rewritten = 0
+    bytes_before = 0
+    bytes_after = 0
+
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text("SELECT id, content FROM documents WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {'last_id': last_id, 'limit': batch_size}
+            ).fetchall()
+
+            if not rows:
+                break
+
+            updates = []
+            for row_id, stored in rows:
+                last_id = row_id
+                if stored is None:
+                    continue
+
+                is_compressed = stored.startswith(COMPRESSION_MARKER) and decompress_text(stored) != stored
+                if is_compressed != decompress:
+                    continue
+
+                content = decompress_text(stored)
+                new_value = content if decompress else compress_text(content)
+                if new_value == stored:
+                    continue
+
+                updates.append({'id': row_id, 'content': new_value, 'content_length': len(content)})
+                bytes_before += len(stored)
+                bytes_after += len(new_value)
+
+            if updates:
+                conn.execute(
+                    text("UPDATE documents SET content = :content, content_length = :content_length WHERE id = :id"),
+                    updates
+                )
+                rewritten += len(updates)
+
+        print(f"   ✓ Processed documents up to ID {last_id} ({rewritten} rewritten)")
+
+    return rewritten, bytes_before, bytes_after
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    database_url = os.getenv('DATABASE_URL', 'sqlite:///exam_simulator.db')
+
+    args = sys.argv[1:]
+    decompress = '--decompress' in args
+    args = [arg for arg in args if arg != '--decompress']
+    batch_size = int(args[0]) if args else DEFAULT_BATCH_SIZE
+
+    print("=" * 60)
+    print(f"{'DECOMPRESSING' if decompress else 'COMPRESSING'} DOCUMENT TEXT")
+    print("=" * 60)
+    print(f"Batch size: {batch_size}")
+
+    try:
+        engine = get_engine(database_url)
+        rewritten, bytes_before, bytes_after = migrate_documents(engine, batch_size, decompress)
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        sys.exit(1)
+
+    print("\n" + "=" * 60)
+    print("✅ MIGRATION COMPLETE")
+    print("=" * 60)
+    print(f"Documents rewritten: {rewritten}")
+    if rewritten:
+        print(f"Stored text: {bytes_before / 1024:.1f} KB -> {bytes_after / 1024:.1f} KB")
+    sys.exit(0)
@@ -8,7 +8,67 @@ Uses SQLAlchemy to automatically create/update tables.
 
 import os
 from dotenv import load_dotenv
-from models import Base, get_engine, create_all_tables
+from sqlalchemy import inspect, text
+from models import Base, get_engine, create_all_tables, COMPRESSION_MARKER, decompress_text
+from migrate_indexes import create_missing_indexes
+
+
+def add_missing_columns(engine):
+    """
+    Add columns defined in models.py that are missing from existing tables
+
+    create_all() only creates missing tables, so new nullable columns on
+    existing tables are added here with ALTER TABLE.
+
+    Returns:
+        List of added columns as 'table.column'
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added_columns = []
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                added_columns.append(f"{table.name}.{column.name}")
+
+    return added_columns
+
+
+def backfill_document_content_length(engine):
+    """
+    Fill documents.content_length for documents uploaded before it was tracked
+
+    Returns:
+        Number of documents updated
+    """
+    with engine.begin() as conn:
+        result = conn.execute(text(
+            "UPDATE documents SET content_length = LENGTH(content) "
+            "WHERE content_length IS NULL AND content NOT LIKE :marker"
+        ), {'marker': COMPRESSION_MARKER + '%'})
+        updated = result.rowcount
+
+        # Compressed text has to be decoded to be measured
+        compressed = conn.execute(text(
+            "SELECT id, content FROM documents WHERE content_length IS NULL"
+        )).fetchall()
+        for row_id, content in compressed:
+            conn.execute(text("UPDATE documents SET content_length = :length WHERE id = :id"),
+                         {'length': len(decompress_text(content) or ''), 'id': row_id})
+        updated += len(compressed)
+
+    return updated
+
 
 def migrate_database():
     """Run database migrations using SQLAlchemy"""
@@ -49,13 +109,25 @@ def migrate_database():
         print("\nUpdating database schema...")
         create_all_tables(engine)
 
+        added_columns = add_missing_columns(engine)
+        for column_name in added_columns:
+            print(f"✓ Added column {column_name}")
+
+        created_indexes = create_missing_indexes(engine)
+        for index_name in created_indexes:
+            print(f"✓ Created index {index_name}")
+
+        backfilled = backfill_document_content_length(engine)
+        if backfilled:
+            print(f"✓ Recorded content length for {backfilled} documents")
+
         print("✓ Database schema updated successfully!")
         print("\n" + "=" * 60)
         print("MIGRATION COMPLETE")
         print("=" * 60)
         print("\nNotes:")
         print("- This operation is safe and non-destructive")
-        print("- Only missing tables/columns are created")
+        print("- Only missing tables/columns/indexes are created")
         print("- Existing data is preserved")
         print("- For complex schema changes, consider using Alembic")
         print("")
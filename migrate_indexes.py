@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Index Migration Script
+Creates the indexes defined in models.py that are missing from an existing
+database. create_all() only adds indexes when it creates a table, so tables
+created before an index was added to the models need this script.
+Works with both SQLite (development) and MariaDB/MySQL (production).
+"""
+
+import os
+from dotenv import load_dotenv
+from sqlalchemy import inspect
+from models import Base, get_engine
+
+
+def create_missing_indexes(engine):
+    """
+    Create indexes defined in models.py that do not exist yet
+
+    Returns:
+        List of created indexes as 'table.index_name'
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created_indexes = []
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+
+            index.create(bind=engine)
+            created_indexes.append(f"{table.name}.{index.name}")
+
+    return created_indexes
+
+
+def migrate_indexes():
+    """Create missing indexes on the configured database"""
+    load_dotenv()
+    database_url = os.getenv('DATABASE_URL', 'sqlite:///exam_simulator.db')
+
+    print("=" * 60)
+    print("INDEX MIGRATION")
+    print("=" * 60)
+
+    try:
+        engine = get_engine(database_url)
+
+        # Large tables can take a while to index
+        print("\nCreating missing indexes...")
+        created_indexes = create_missing_indexes(engine)
+        for index_name in created_indexes:
+            print(f"✓ Created index {index_name}")
+
+        if not created_indexes:
+            print("✓ All indexes already exist")
+
+        print("\n" + "=" * 60)
+        print("MIGRATION COMPLETE")
+        print("=" * 60)
+        return True
+
+    except Exception as e:
+        print(f"\n✗ Migration failed: {e}")
+        return False
+
+
+if __name__ == '__main__':
+    import sys
+    success = migrate_indexes()
+    sys.exit(0 if success else 1)
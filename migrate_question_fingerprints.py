@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Migration Script: Fingerprint existing questions
+
+Computes questions.text_hash and the LSH band rows in question_signature_bands
+for questions created before fingerprints were stored, a batch at a time.
+New and edited questions are fingerprinted on flush (see models.py), and
+questions that already have a text_hash are skipped, so the script can be
+stopped and run again safely.
+
+Run migrate_db.py first so the text_hash column and the bands table exist.
+Pass --all to recompute the fingerprints of every question, which is needed
+after the LSH band configuration in dedupe.py changes.
+
+Usage:
+    python migrate_question_fingerprints.py [batch_size] [--all]
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+from sqlalchemy import text
+from models import get_engine
+from dedupe import question_fingerprint
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def migrate_questions(engine, batch_size=DEFAULT_BATCH_SIZE, refresh_all=False):
+    """
+    Fingerprint questions without a text_hash, committing after each batch
+
+    Args:
+        engine: Database engine
+        batch_size: Questions fingerprinted per transaction
+        refresh_all: Recompute the fingerprints of questions that already have one too
+
+    Returns:
+        Number of questions fingerprinted
+    """
+    last_id = 0
+    fingerprinted = 0
+    condition = "" if refresh_all else "text_hash IS NULL AND "
+
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text("SELECT id, question_text FROM questions "
+                     f"WHERE {condition}id > :last_id ORDER BY id LIMIT :limit"),
+                {'last_id': last_id, 'limit': batch_size}
+            ).fetchall()
+
+            if not rows:
+                break
+
+            hashes = []
+            bands = []
+            for question_id, question_text in rows:
+                last_id = question_id
+                text_hash, band_keys = question_fingerprint(question_text or '')
+                hashes.append({'id': question_id, 'text_hash': text_hash})
+                bands.extend({'question_id': question_id, 'band_key': key} for key in band_keys)
+
+            # Drop partial band rows so a rerun never duplicates them
+            conn.execute(
+                text("DELETE FROM question_signature_bands WHERE question_id = :id"),
+                [{'id': row['id']} for row in hashes]
+            )
+            conn.execute(
+                text("INSERT INTO question_signature_bands (question_id, band_key) VALUES (:question_id, :band_key)"),
+                bands
+            )
+            conn.execute(text("UPDATE questions SET text_hash = :text_hash WHERE id = :id"), hashes)
+            fingerprinted += len(hashes)
+
+        print(f"   ✓ Processed questions up to ID {last_id} ({fingerprinted} fingerprinted)")
+
+    return fingerprinted
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    database_url = os.getenv('DATABASE_URL', 'sqlite:///exam_simulator.db')
+
+    refresh_all = '--all' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--all']
+    batch_size = int(args[0]) if args else DEFAULT_BATCH_SIZE
+
+    print("=" * 60)
+    print("FINGERPRINTING QUESTIONS")
+    print("=" * 60)
+    print(f"Batch size: {batch_size}")
+    if refresh_all:
+        print("Recomputing fingerprints of all questions")
+
+    try:
+        engine = get_engine(database_url)
+        fingerprinted = migrate_questions(engine, batch_size, refresh_all)
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        sys.exit(1)
+
+    print("\n" + "=" * 60)
+    print("✅ MIGRATION COMPLETE")
+    print("=" * 60)
+    print(f"Questions fingerprinted: {fingerprinted}")
+    sys.exit(0)
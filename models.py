@@ -1,16 +1,82 @@
+import os
+import zlib
+import base64
+import binascii
 from datetime import datetime
 from flask_login import UserMixin
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Float, JSON, Boolean
+from sqlalchemy import create_engine, event, inspect, Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, Float, JSON, Boolean, UniqueConstraint, Index
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import Session, relationship, sessionmaker, deferred, validates
 from werkzeug.security import generate_password_hash, check_password_hash
+from dedupe import question_fingerprint
 
 Base = declarative_base()
 
+# Document text compression
+DOCUMENT_COMPRESSION = os.getenv('DOCUMENT_COMPRESSION', 'true').lower() == 'true'  # Compress newly written text
+COMPRESSION_MARKER = 'z1:'  # Format/version prefix: zlib-compressed UTF-8, base64 encoded
+COMPRESSION_LEVEL = 6
+
+
+def compress_text(text):
+    """
+    Compress text into the 'z1:' storage format
+
+    Text that does not get smaller is returned unchanged, unless it already
+    starts with the marker and must be encoded to be read back correctly.
+    """
+    if text is None:
+        return None
+
+    encoded = COMPRESSION_MARKER + base64.b64encode(
+        zlib.compress(text.encode('utf-8'), COMPRESSION_LEVEL)
+    ).decode('ascii')
+
+    if len(encoded) < len(text) or text.startswith(COMPRESSION_MARKER):
+        return encoded
+    return text
+
+
+def decompress_text(value):
+    """Decode text stored by compress_text; uncompressed text is returned as is"""
+    if value is None or not value.startswith(COMPRESSION_MARKER):
+        return value
+
+    try:
+        return zlib.decompress(base64.b64decode(value[len(COMPRESSION_MARKER):], validate=True)).decode('utf-8')
+    except (binascii.Error, zlib.error, UnicodeDecodeError):
+        # Stored before compression existed and merely starts with the marker
+        return value
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text column stored compressed when DOCUMENT_COMPRESSION is enabled
+
+    Reads decompress transparently, and rows written uncompressed (before
+    compression was enabled, or with it disabled) are read unchanged.
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if DOCUMENT_COMPRESSION or value.startswith(COMPRESSION_MARKER):
+            return compress_text(value)
+        return value
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
 
 class User(Base, UserMixin):
     """User model for authentication and user management"""
     __tablename__ = 'users'
+    __table_args__ = (
+        Index('ix_users_organization_role', 'organization', 'role'),  # Members and role counts per organization
+    )
 
     id = Column(Integer, primary_key=True)
     email = Column(String(255), unique=True, nullable=False, index=True)
@@ -29,6 +95,7 @@ class User(Base, UserMixin):
     # Relationships
     documents = relationship('Document', back_populates='uploader', cascade='all, delete-orphan')
     exams = relationship('Exam', back_populates='user', cascade='all, delete-orphan')
+    csv_imports = relationship('CsvImport', back_populates='user', cascade='all, delete-orphan')
 
     def set_password(self, password):
         """Hash and set the user's password"""
@@ -53,10 +120,15 @@ class User(Base, UserMixin):
 class Document(Base):
     """Document model for storing uploaded study materials"""
     __tablename__ = 'documents'
+    __table_args__ = (
+        Index('ix_documents_organization_created_at', 'organization', 'created_at'),  # Organization document lists, newest first
+        Index('ix_documents_uploaded_by_created_at', 'uploaded_by', 'created_at'),  # Own documents and per-user counts
+    )
 
     id = Column(Integer, primary_key=True)
     filename = Column(String(255), nullable=False)
-    content = Column(Text, nullable=False)  # Extracted text content
+    content = deferred(Column(CompressedText, nullable=False))  # Extracted text content, loaded on first access
+    content_length = Column(Integer, nullable=True)  # Characters in content, so list pages need not load it
     uploaded_by = Column(Integer, ForeignKey('users.id'), nullable=False)
     organization = Column(String(255), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -64,6 +136,13 @@ class Document(Base):
     # Relationships
     uploader = relationship('User', back_populates='documents')
     questions = relationship('Question', back_populates='document', cascade='all, delete-orphan')
+    generation_jobs = relationship('GenerationJob', back_populates='document', cascade='all, delete-orphan')
+
+    @validates('content')
+    def _track_content_length(self, key, content):
+        """Keep content_length in sync whenever content is set"""
+        self.content_length = len(content) if content is not None else None
+        return content
 
     def __repr__(self):
         return f'<Document {self.filename}>'
@@ -72,6 +151,10 @@ class Document(Base):
 class Question(Base):
     """Question model for storing generated exam questions"""
     __tablename__ = 'questions'
+    __table_args__ = (
+        Index('ix_questions_document_status_difficulty', 'document_id', 'status', 'difficulty'),  # Exam question selection
+        Index('ix_questions_type_status', 'question_type', 'status'),  # Question bank type counts
+    )
 
     id = Column(Integer, primary_key=True)
     question_text = Column(Text, nullable=False)
@@ -85,31 +168,72 @@ class Question(Base):
     difficulty = Column(String(20), default='medium')  # easy, medium, hard
     status = Column(String(20), default='pending')  # pending, approved, rejected
     created_by = Column(Integer, ForeignKey('users.id'), nullable=True)  # User who created/approved it
+    text_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the normalized text, set on flush
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
     document = relationship('Document', back_populates='questions')
     exam_questions = relationship('ExamQuestion', back_populates='question', cascade='all, delete-orphan')
     creator = relationship('User', foreign_keys=[created_by])
+    signature_bands = relationship('QuestionSignatureBand', back_populates='question', cascade='all, delete-orphan')
+
+    def update_fingerprint(self):
+        """Recompute text_hash and the LSH signature bands from question_text"""
+        self.text_hash, band_keys = question_fingerprint(self.question_text)
+        self.signature_bands = [QuestionSignatureBand(band_key=key) for key in band_keys]
 
     def __repr__(self):
         return f'<Question {self.id}: {self.question_text[:50]}...>'
 
 
+class QuestionSignatureBand(Base):
+    """LSH band of a question's MinHash signature, for near-duplicate candidate lookup"""
+    __tablename__ = 'question_signature_bands'
+    __table_args__ = (
+        Index('ix_question_signature_bands_band_key', 'band_key', 'question_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    question_id = Column(Integer, ForeignKey('questions.id', ondelete='CASCADE'), nullable=False, index=True)
+    band_key = Column(BigInteger, nullable=False)
+
+    # Relationships
+    question = relationship('Question', back_populates='signature_bands')
+
+    def __repr__(self):
+        return f'<QuestionSignatureBand {self.question_id}: {self.band_key}>'
+
+
+@event.listens_for(Session, 'before_flush')
+def _fingerprint_questions(session, flush_context, instances):
+    """Fingerprint new questions, and edited ones whose text changed, as they are flushed"""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Question) or obj.question_text is None:
+            continue
+        if obj in session.new or inspect(obj).attrs.question_text.history.has_changes():
+            obj.update_fingerprint()
+
+
 class Exam(Base):
     """Exam model for storing exam sessions and results"""
     __tablename__ = 'exams'
+    __table_args__ = (
+        Index('ix_exams_user_completed_at', 'user_id', 'completed_at'),  # A user's exam history and completed counts
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     score = Column(Float, nullable=True)  # Percentage score (0-100)
     total_questions = Column(Integer, nullable=False)
     completed_at = Column(DateTime, nullable=True)  # Null if exam is in progress
+    grading_status = Column(String(20), default='complete', nullable=True)  # complete, pending (short answers being graded)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
     user = relationship('User', back_populates='exams')
     exam_questions = relationship('ExamQuestion', back_populates='exam', cascade='all, delete-orphan')
+    attempt = relationship('ExamAttempt', back_populates='exam', uselist=False, cascade='all, delete-orphan')
+    attempt_answers = relationship('ExamAttemptAnswer', back_populates='exam', cascade='all, delete-orphan')
 
     def calculate_score(self):
         """Calculate the exam score based on correct answers"""
@@ -124,6 +248,10 @@ class Exam(Base):
         """Check if the exam is completed"""
         return self.completed_at is not None
 
+    def is_grading_pending(self):
+        """Check if short answers of a submitted exam are still being graded"""
+        return self.grading_status == 'pending'
+
     def __repr__(self):
         return f'<Exam {self.id} - User {self.user_id} - Score: {self.score}%>'
 
@@ -133,7 +261,7 @@ class ExamQuestion(Base):
     __tablename__ = 'exam_questions'
 
     id = Column(Integer, primary_key=True)
-    exam_id = Column(Integer, ForeignKey('exams.id'), nullable=False)
+    exam_id = Column(Integer, ForeignKey('exams.id'), nullable=False, index=True)
     question_id = Column(Integer, ForeignKey('questions.id'), nullable=False)
     user_answer = Column(Text, nullable=True)  # A, B, C, D for MCQ/T/F, or full text for short answer
     is_correct = Column(Boolean, nullable=True)  # True/False or null if not answered
@@ -156,6 +284,104 @@ class ExamQuestion(Base):
         return f'<ExamQuestion {self.id} - Exam {self.exam_id} - Question {self.question_id}>'
 
 
+class ExamAttempt(Base):
+    """ExamAttempt model for the server-side state of an exam in progress"""
+    __tablename__ = 'exam_attempts'
+
+    id = Column(Integer, primary_key=True)
+    exam_id = Column(Integer, ForeignKey('exams.id'), nullable=False, unique=True)
+    document_id = Column(Integer, nullable=True)  # Document the questions were drawn from
+    question_ids = Column(JSON, nullable=False)  # Ordered list of question IDs
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    duration = Column(Integer, nullable=False, default=30)  # Duration in minutes
+
+    # Relationships
+    exam = relationship('Exam', back_populates='attempt')
+
+    def __repr__(self):
+        return f'<ExamAttempt {self.id} - Exam {self.exam_id}>'
+
+
+class ExamAttemptAnswer(Base):
+    """ExamAttemptAnswer model for answers saved while an exam is in progress"""
+    __tablename__ = 'exam_attempt_answers'
+    __table_args__ = (UniqueConstraint('exam_id', 'question_id', name='uq_exam_attempt_answer'),)
+
+    id = Column(Integer, primary_key=True)
+    exam_id = Column(Integer, ForeignKey('exams.id'), nullable=False)
+    question_id = Column(Integer, nullable=False)
+    answer = Column(Text, nullable=True)
+    time_spent = Column(Integer, nullable=True)  # Time spent in seconds
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Relationships
+    exam = relationship('Exam', back_populates='attempt_answers')
+
+    def __repr__(self):
+        return f'<ExamAttemptAnswer Exam {self.exam_id} - Question {self.question_id}>'
+
+
+class GenerationJob(Base):
+    """GenerationJob model for tracking background AI question generation"""
+    __tablename__ = 'generation_jobs'
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    document_id = Column(Integer, ForeignKey('documents.id'), nullable=False)
+    status = Column(String(20), default='pending')  # pending, running, completed, failed
+    params_json = Column(JSON, nullable=True)  # Requested counts, provider and model
+    result_json = Column(JSON, nullable=True)  # Generated questions: {"mcq": [...], "true_false": [...], "short_answer": [...]}
+    errors_json = Column(JSON, nullable=True)  # List of error messages
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    user = relationship('User')
+    document = relationship('Document', back_populates='generation_jobs')
+
+    def is_finished(self):
+        """Check if the job has completed or failed"""
+        return self.status in ('completed', 'failed')
+
+    def total_generated(self):
+        """Count generated questions across all types"""
+        if not self.result_json:
+            return 0
+        return sum(len(self.result_json.get(key) or []) for key in ('mcq', 'true_false', 'short_answer'))
+
+    def __repr__(self):
+        return f'<GenerationJob {self.id} - Document {self.document_id} - {self.status}>'
+
+
+class CsvImport(Base):
+    """CsvImport model for tracking chunked CSV question imports, so a failed import can be resumed"""
+    __tablename__ = 'csv_imports'
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    filename = Column(String(255), nullable=False)
+    status = Column(String(20), default='running')  # running, completed, failed
+    rows_processed = Column(Integer, default=0, nullable=False)  # Data rows committed so far
+    rows_hash = Column(String(64), nullable=True)  # SHA-256 of the header and the rows committed so far
+    imported_count = Column(Integer, default=0, nullable=False)
+    error_count = Column(Integer, default=0, nullable=False)
+    errors_json = Column(JSON, nullable=True)  # List of {"row": row number, "error": message}
+    error_message = Column(Text, nullable=True)  # Why a failed import stopped
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    completed_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    user = relationship('User', back_populates='csv_imports')
+
+    def is_finished(self):
+        """Check if the import has completed or failed"""
+        return self.status in ('completed', 'failed')
+
+    def __repr__(self):
+        return f'<CsvImport {self.id} - {self.filename} - {self.status}>'
+
+
 class OrganizationSettings(Base):
     """Organization white-label settings for customization"""
     __tablename__ = 'organization_settings'
@@ -184,6 +410,7 @@ class OrganizationSettings(Base):
     enable_analytics = Column(Boolean, default=True)
     enable_csv_export = Column(Boolean, default=True)
     enable_pdf_export = Column(Boolean, default=True)
+    enable_ai_cache = Column(Boolean, default=True)  # Reuse cached AI responses for identical requests
 
     # Contact Info
     contact_email = Column(String(255), nullable=True)
@@ -230,6 +457,10 @@ class OrganizationSettings(Base):
             return f'/static/logos/{self.logo_filename}'
         return None
 
+    def get_theme_version(self):
+        """Version of the theme CSS, used to bust browser caches when settings change"""
+        return int(self.updated_at.timestamp()) if self.updated_at else 0
+
     def get_theme_css(self):
         """Generate CSS for the organization theme"""
         return f"""
@@ -273,13 +504,37 @@ class OrganizationSettings(Base):
 
 # Database initialization helper
 def get_engine(database_url='sqlite:///exam_simulator.db'):
-    """Create and return a database engine"""
-    return create_engine(database_url, echo=False)
+    """
+    Create and return a database engine
+
+    Connection pool settings come from the environment:
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (server databases only),
+    DB_POOL_RECYCLE and DB_POOL_PRE_PING
+    """
+    engine_options = {
+        'echo': False,
+        # Test connections on checkout so ones dropped by the server while idle are replaced
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        # Recycle before MariaDB/MySQL's wait_timeout closes idle connections
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    }
+
+    if not database_url.startswith('sqlite'):
+        engine_options['pool_size'] = int(os.getenv('DB_POOL_SIZE', '10'))
+        engine_options['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+        engine_options['pool_timeout'] = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+
+    return create_engine(database_url, **engine_options)
+
+
+_session_factories = {}
 
 
 def get_session(engine):
     """Create and return a database session"""
-    Session = sessionmaker(bind=engine)
+    Session = _session_factories.get(engine)
+    if Session is None:
+        Session = _session_factories.setdefault(engine, sessionmaker(bind=engine))
     return Session()
 
 
@@ -0,0 +1,93 @@
+"""
+Keyset Pagination Module
+Pages through long listings newest first using an opaque cursor on
+(created_at, id) instead of OFFSET, so each page costs the same to load
+no matter how deep into the listing it is.
+"""
+
+import os
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+# Pagination configuration
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', '50'))  # Rows per page on admin and member listings
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '200'))  # Upper bound for ?per_page=
+
+
+class Page(NamedTuple):
+    """One page of a keyset-paginated listing"""
+    items: List[Any]
+    next_cursor: Optional[str]  # None on the last page
+    per_page: int
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode the sort key of the last row on a page as a URL-safe cursor"""
+    raw = f"{created_at.isoformat()}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """
+    Decode a cursor made by encode_cursor
+
+    Returns:
+        Tuple of (created_at, id), or None if the cursor is missing or malformed
+    """
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeError, binascii.Error):
+        return None
+
+
+def get_page_size(value: Optional[int]) -> int:
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE, defaulting to PAGE_SIZE"""
+    if not value or value < 1:
+        return PAGE_SIZE
+    return min(value, MAX_PAGE_SIZE)
+
+
+def paginate_keyset(query, model, cursor: Optional[str] = None, per_page: Optional[int] = None) -> Page:
+    """
+    Fetch one page of a query, newest first
+
+    Args:
+        query: Query whose first entity is model (extra columns are allowed)
+        model: Mapped class with created_at and id columns
+        cursor: next_cursor of the previous page (None for the first page)
+        per_page: Rows per page (see get_page_size)
+
+    Returns:
+        Page of rows; an invalid cursor starts again from the first page
+    """
+    per_page = get_page_size(per_page)
+    position = decode_cursor(cursor)
+
+    if position:
+        created_at, row_id = position
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < row_id)
+        ))
+
+    # One extra row tells us whether there is a next page
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        if not isinstance(last, model):
+            last = last[0]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return Page(items=rows, next_cursor=next_cursor, per_page=per_page)
@@ -9,14 +9,12 @@ import json
 import re
 import time
 from typing import List, Dict, Optional, Tuple
-from datetime import datetime, timedelta
-from openai import OpenAI
-from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, wait
+from difflib import SequenceMatcher
 import google.generativeai as genai
-
-# Initialize clients
-openai_client = None
-gemini_configured = False
+import ai_clients
+from ai_cache import get_response_cache, make_cache_key
+from rate_limiter import get_rate_limiter, make_rate_limit_key, RATE_LIMIT_MAX_WAIT
 
 # AI Model configurations
 AI_MODELS = {
@@ -36,65 +34,27 @@ def get_openai_client(api_key: Optional[str] = None):
     if not api_key:
         raise ValueError("OpenAI API key is required. Please configure your organization's OpenAI API key in Organization Settings.")
 
-    return OpenAI(api_key=api_key)
+    return ai_clients.get_openai_client(api_key)
 
 
-def configure_gemini(api_key: Optional[str] = None):
-    """Configure Google Gemini API with required organization API key"""
+def get_gemini_model(api_key: Optional[str], model: str):
+    """Get a pooled Gemini model for the required organization API key"""
     if not api_key:
         raise ValueError("Gemini API key is required. Please configure your organization's Gemini API key in Organization Settings.")
 
-    genai.configure(api_key=api_key)
-
+    return ai_clients.get_gemini_model(api_key, model)
 
-# Rate limiting configuration
-RATE_LIMIT_REQUESTS = 10  # Max requests per minute
-RATE_LIMIT_WINDOW = 60  # Time window in seconds
-request_timestamps = []
 
+# Concurrent generation configuration
+# Keep the deadline below gunicorn's worker timeout so the request can still respond
+GENERATION_DEADLINE = float(os.getenv('AI_GENERATION_DEADLINE', '25'))  # Seconds
 
-# ============================================================================
-# RATE LIMITING DECORATOR
-# ============================================================================
-
-def rate_limit(max_calls: int = RATE_LIMIT_REQUESTS, time_window: int = RATE_LIMIT_WINDOW):
-    """
-    Decorator to enforce rate limiting on API calls
-
-    Args:
-        max_calls: Maximum number of calls allowed within time_window
-        time_window: Time window in seconds
-    """
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            global request_timestamps
-            now = datetime.now()
-
-            # Remove timestamps older than the time window
-            request_timestamps = [
-                ts for ts in request_timestamps
-                if now - ts < timedelta(seconds=time_window)
-            ]
-
-            # Check if we've exceeded the rate limit
-            if len(request_timestamps) >= max_calls:
-                oldest_request = min(request_timestamps)
-                sleep_time = (oldest_request + timedelta(seconds=time_window) - now).total_seconds()
-                if sleep_time > 0:
-                    print(f"Rate limit reached. Waiting {sleep_time:.2f} seconds...")
-                    time.sleep(sleep_time)
-                    # Clean up old timestamps again after sleeping
-                    request_timestamps = [
-                        ts for ts in request_timestamps
-                        if datetime.now() - ts < timedelta(seconds=time_window)
-                    ]
-
-            # Add current timestamp and make the call
-            request_timestamps.append(datetime.now())
-            return func(*args, **kwargs)
-        return wrapper
-    return decorator
+# Long document chunking configuration
+CHARS_PER_TOKEN = 4  # Rough average for English text
+CHUNK_MAX_TOKENS = 1000  # Matches the 4000 character prompt budget of the generators
+CHUNK_OVERLAP_TOKENS = 100
+QUESTIONS_PER_CHUNK = 5  # Target questions per sampled chunk
+MAX_CHUNK_WORKERS = 4  # Parallel AI calls per question type
 
 
 # ============================================================================
@@ -299,7 +259,9 @@ def validate_short_answer_question(question: Dict) -> Tuple[bool, str]:
 # ============================================================================
 
 def call_ai_api(prompt: str, provider: str = 'gemini', model: str = 'gemini-2.5-flash', temperature: float = 0.7,
-                openai_api_key: Optional[str] = None, gemini_api_key: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+                openai_api_key: Optional[str] = None, gemini_api_key: Optional[str] = None,
+                use_cache: bool = True, organization: Optional[str] = None,
+                wait_until: Optional[float] = None) -> Tuple[Optional[str], Optional[str]]:
     """
     Universal function to call either OpenAI or Gemini API
 
@@ -310,10 +272,41 @@ def call_ai_api(prompt: str, provider: str = 'gemini', model: str = 'gemini-2.5-
         temperature: Sampling temperature
         openai_api_key: Optional organization-specific OpenAI API key
         gemini_api_key: Optional organization-specific Gemini API key
+        use_cache: Serve identical requests from the response cache
+        organization: Organization the call is rate limited under
+        wait_until: time.monotonic() value up to which to wait for a rate limit token
+                    (None waits up to AI_RATE_LIMIT_MAX_WAIT, for calls made while a request waits)
 
     Returns:
         Tuple of (response_text, error_message)
     """
+    cache = get_response_cache() if use_cache else None
+    cache_key = make_cache_key(prompt, provider, model, temperature, organization) if cache else None
+
+    if cache:
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            print(f"[AI Cache] Hit for {provider}/{model}")
+            return cached_response, None
+
+    # Cache hits are free; only calls that reach the provider consume rate limit tokens
+    max_wait = max(0.0, wait_until - time.monotonic()) if wait_until is not None else RATE_LIMIT_MAX_WAIT
+    allowed, retry_after = get_rate_limiter().acquire(make_rate_limit_key(organization, provider), max_wait)
+    if not allowed:
+        return None, f"Rate limit reached for {provider}. Try again in {retry_after:.0f} seconds."
+
+    response_text, error = _call_provider(prompt, provider, model, temperature, openai_api_key, gemini_api_key)
+
+    # Only successful responses are cached
+    if cache and response_text and not error:
+        cache.set(cache_key, response_text)
+
+    return response_text, error
+
+
+def _call_provider(prompt: str, provider: str, model: str, temperature: float,
+                   openai_api_key: Optional[str], gemini_api_key: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Send a prompt to the provider without caching"""
     try:
         if provider == 'openai':
             client = get_openai_client(openai_api_key)
@@ -329,8 +322,7 @@ def call_ai_api(prompt: str, provider: str = 'gemini', model: str = 'gemini-2.5-
             return response.choices[0].message.content, None
 
         elif provider == 'gemini':
-            configure_gemini(gemini_api_key)
-            gemini_model = genai.GenerativeModel(model)
+            gemini_model = get_gemini_model(gemini_api_key, model)
             response = gemini_model.generate_content(
                 prompt,
                 generation_config=genai.types.GenerationConfig(
@@ -351,7 +343,6 @@ def call_ai_api(prompt: str, provider: str = 'gemini', model: str = 'gemini-2.5-
 # QUESTION GENERATION FUNCTIONS
 # ============================================================================
 
-@rate_limit(max_calls=RATE_LIMIT_REQUESTS, time_window=RATE_LIMIT_WINDOW)
 def generate_mcq_questions(
     text: str,
     num_questions: int = 5,
@@ -359,7 +350,10 @@ def generate_mcq_questions(
     temperature: float = 0.7,
     provider: str = 'gemini',
     openai_api_key: Optional[str] = None,
-    gemini_api_key: Optional[str] = None
+    gemini_api_key: Optional[str] = None,
+    use_cache: bool = True,
+    organization: Optional[str] = None,
+    wait_until: Optional[float] = None
 ) -> Tuple[Optional[List[Dict]], Optional[str]]:
     """
     Generate multiple choice questions from text using AI API
@@ -372,6 +366,10 @@ def generate_mcq_questions(
         provider: 'openai' or 'gemini'
         openai_api_key: Optional organization-specific OpenAI API key
         gemini_api_key: Optional organization-specific Gemini API key
+        use_cache: Serve identical requests from the response cache
+        organization: Organization the AI calls are rate limited under
+        wait_until: time.monotonic() value up to which to wait for rate limit tokens
+                    (None waits up to AI_RATE_LIMIT_MAX_WAIT)
 
     Returns:
         Tuple of (questions_list, error_message)
@@ -395,7 +393,8 @@ def generate_mcq_questions(
         print(f"[MCQ] Calling AI API...")
 
         # Call AI API (OpenAI or Gemini) with optional organization API keys
-        response_text, error = call_ai_api(prompt, provider, model, temperature, openai_api_key, gemini_api_key)
+        response_text, error = call_ai_api(prompt, provider, model, temperature, openai_api_key, gemini_api_key,
+                                           use_cache, organization, wait_until=wait_until)
 
         if error:
             print(f"[MCQ] API Error: {error}")
@@ -437,7 +436,6 @@ def generate_mcq_questions(
         return None, error_message
 
 
-@rate_limit(max_calls=RATE_LIMIT_REQUESTS, time_window=RATE_LIMIT_WINDOW)
 def generate_true_false_questions(
     text: str,
     num_questions: int = 5,
@@ -445,7 +443,10 @@ def generate_true_false_questions(
     temperature: float = 0.7,
     provider: str = 'gemini',
     openai_api_key: Optional[str] = None,
-    gemini_api_key: Optional[str] = None
+    gemini_api_key: Optional[str] = None,
+    use_cache: bool = True,
+    organization: Optional[str] = None,
+    wait_until: Optional[float] = None
 ) -> Tuple[Optional[List[Dict]], Optional[str]]:
     """
     Generate True/False questions from text using AI API
@@ -458,6 +459,10 @@ def generate_true_false_questions(
         provider: 'openai' or 'gemini'
         openai_api_key: Optional organization-specific OpenAI API key
         gemini_api_key: Optional organization-specific Gemini API key
+        use_cache: Serve identical requests from the response cache
+        organization: Organization the AI calls are rate limited under
+        wait_until: time.monotonic() value up to which to wait for rate limit tokens
+                    (None waits up to AI_RATE_LIMIT_MAX_WAIT)
 
     Returns:
         Tuple of (questions_list, error_message)
@@ -477,7 +482,8 @@ def generate_true_false_questions(
         )
 
         # Call AI API (OpenAI or Gemini) with optional organization API keys
-        response_text, error = call_ai_api(prompt, provider, model, temperature, openai_api_key, gemini_api_key)
+        response_text, error = call_ai_api(prompt, provider, model, temperature, openai_api_key, gemini_api_key,
+                                           use_cache, organization, wait_until=wait_until)
 
         if error:
             return None, error
@@ -508,7 +514,6 @@ def generate_true_false_questions(
         return None, error_message
 
 
-@rate_limit(max_calls=RATE_LIMIT_REQUESTS, time_window=RATE_LIMIT_WINDOW)
 def generate_short_answer_questions(
     text: str,
     num_questions: int = 5,
@@ -516,7 +521,10 @@ def generate_short_answer_questions(
     temperature: float = 0.7,
     provider: str = 'gemini',
     openai_api_key: Optional[str] = None,
-    gemini_api_key: Optional[str] = None
+    gemini_api_key: Optional[str] = None,
+    use_cache: bool = True,
+    organization: Optional[str] = None,
+    wait_until: Optional[float] = None
 ) -> Tuple[Optional[List[Dict]], Optional[str]]:
     """
     Generate Short Answer questions from text using AI API
@@ -529,6 +537,10 @@ def generate_short_answer_questions(
         provider: 'openai' or 'gemini'
         openai_api_key: Optional organization-specific OpenAI API key
         gemini_api_key: Optional organization-specific Gemini API key
+        use_cache: Serve identical requests from the response cache
+        organization: Organization the AI calls are rate limited under
+        wait_until: time.monotonic() value up to which to wait for rate limit tokens
+                    (None waits up to AI_RATE_LIMIT_MAX_WAIT)
 
     Returns:
         Tuple of (questions_list, error_message)
@@ -548,7 +560,8 @@ def generate_short_answer_questions(
         )
 
         # Call AI API (OpenAI or Gemini) with optional organization API keys
-        response_text, error = call_ai_api(prompt, provider, model, temperature, openai_api_key, gemini_api_key)
+        response_text, error = call_ai_api(prompt, provider, model, temperature, openai_api_key, gemini_api_key,
+                                           use_cache, organization, wait_until=wait_until)
 
         if error:
             return None, error
@@ -579,6 +592,234 @@ def generate_short_answer_questions(
         return None, error_message
 
 
+# ============================================================================
+# LONG DOCUMENT CHUNKING
+# ============================================================================
+
+QUESTION_GENERATORS = {
+    'mcq': generate_mcq_questions,
+    'true_false': generate_true_false_questions,
+    'short_answer': generate_short_answer_questions,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in text without a provider tokenizer"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_text_into_chunks(text: str, max_tokens: int = CHUNK_MAX_TOKENS,
+                           overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """
+    Split text into token-bounded, overlapping chunks
+
+    Chunks break on paragraph, sentence or word boundaries where possible,
+    and consecutive chunks share roughly overlap_tokens of context.
+
+    Args:
+        text: Source text to split
+        max_tokens: Maximum estimated tokens per chunk
+        overlap_tokens: Estimated tokens shared between consecutive chunks
+
+    Returns:
+        List of chunk strings in document order
+    """
+    text = text.strip() if text else ''
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = min(overlap_tokens * CHARS_PER_TOKEN, max_chars // 2)
+
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+
+        if end < len(text):
+            # Prefer a paragraph break, then a sentence, then a word boundary
+            window = text[start:end]
+            for separator in ('\n\n', '. ', '\n', ' '):
+                pos = window.rfind(separator, len(window) // 2)
+                if pos != -1:
+                    end = start + pos + len(separator)
+                    break
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        if end >= len(text):
+            break
+
+        # Step back for overlap, aligned to the next word boundary
+        next_start = end - overlap_chars
+        space = text.find(' ', next_start, end)
+        start = space + 1 if space != -1 else next_start
+
+    return chunks
+
+
+def distribute_questions(chunks: List[str], num_questions: int) -> List[Tuple[int, int]]:
+    """
+    Plan how many questions to generate from each chunk
+
+    Long documents are sampled with evenly spaced chunks (about
+    QUESTIONS_PER_CHUNK questions each) so cost stays bounded, and the
+    requested count is split across them in proportion to chunk length.
+
+    Args:
+        chunks: Chunks returned by split_text_into_chunks
+        num_questions: Total number of questions requested
+
+    Returns:
+        List of (chunk_index, question_count) pairs with count > 0
+    """
+    if not chunks or num_questions < 1:
+        return []
+
+    num_selected = min(len(chunks), max(1, -(-num_questions // QUESTIONS_PER_CHUNK)))
+    if num_selected == len(chunks):
+        selected = list(range(len(chunks)))
+    else:
+        selected = [int((i + 0.5) * len(chunks) / num_selected) for i in range(num_selected)]
+
+    # Largest remainder apportionment by chunk length
+    weights = [len(chunks[i]) for i in selected]
+    total_weight = sum(weights)
+    quotas = [num_questions * weight / total_weight for weight in weights]
+    counts = [int(quota) for quota in quotas]
+    remaining = num_questions - sum(counts)
+    by_remainder = sorted(range(len(selected)), key=lambda i: quotas[i] - counts[i], reverse=True)
+    for i in by_remainder[:remaining]:
+        counts[i] += 1
+
+    return [(selected[i], counts[i]) for i in range(len(selected)) if counts[i] > 0]
+
+
+def _normalize_question_text(text: str) -> str:
+    """Normalize question text for duplicate comparison"""
+    text = re.sub(r'\s+', ' ', str(text).lower())
+    return re.sub(r'[^a-z0-9 ]', '', text).strip()
+
+
+def merge_chunk_questions(question_lists: List[List[Dict]], limit: int,
+                          threshold: float = 0.85) -> List[Dict]:
+    """
+    Merge per-chunk questions in document order, dropping near-duplicates
+
+    Args:
+        question_lists: Questions generated for each chunk
+        limit: Maximum number of questions to return
+        threshold: Similarity ratio at which two questions count as duplicates
+
+    Returns:
+        Merged list of unique questions
+    """
+    merged = []
+    seen = []
+
+    for questions in question_lists:
+        for question in questions:
+            normalized = _normalize_question_text(question.get('question', ''))
+            if any(SequenceMatcher(None, normalized, other).ratio() >= threshold for other in seen):
+                continue
+            seen.append(normalized)
+            merged.append(question)
+
+    return merged[:limit]
+
+
+def generate_questions_chunked(
+    question_type: str,
+    text: str,
+    num_questions: int = 5,
+    model: str = "gemini-2.5-flash",
+    temperature: float = 0.7,
+    provider: str = 'gemini',
+    openai_api_key: Optional[str] = None,
+    gemini_api_key: Optional[str] = None,
+    use_cache: bool = True,
+    organization: Optional[str] = None,
+    deadline: Optional[float] = None,
+    wait_until: Optional[float] = None
+) -> Tuple[Optional[List[Dict]], Optional[str]]:
+    """
+    Generate questions of one type from text of any length
+
+    Text that fits in a single prompt is passed straight to the type's
+    generator. Longer text is split into chunks, questions are generated
+    per chunk in parallel, and the results are merged and deduplicated.
+
+    Args:
+        question_type: 'mcq', 'true_false' or 'short_answer'
+        text: Source text to generate questions from
+        num_questions: Number of questions to generate
+        model: AI model to use
+        temperature: Sampling temperature (0.0 to 1.0)
+        provider: 'openai' or 'gemini'
+        openai_api_key: Optional organization-specific OpenAI API key
+        gemini_api_key: Optional organization-specific Gemini API key
+        use_cache: Serve identical requests from the response cache
+        organization: Organization the AI calls are rate limited under
+        deadline: Seconds to wait for chunk generation (None waits indefinitely)
+        wait_until: time.monotonic() value up to which to wait for rate limit tokens
+                    (None waits up to AI_RATE_LIMIT_MAX_WAIT)
+
+    Returns:
+        Tuple of (questions_list, error_message)
+        error_message may be set alongside questions when some chunks failed
+    """
+    generator = QUESTION_GENERATORS.get(question_type)
+    if generator is None:
+        return None, f"Unknown question type: {question_type}"
+
+    chunks = split_text_into_chunks(text)
+    if len(chunks) <= 1:
+        return generator(text, num_questions, model, temperature=temperature, provider=provider,
+                         openai_api_key=openai_api_key, gemini_api_key=gemini_api_key, use_cache=use_cache,
+                         organization=organization, wait_until=wait_until)
+
+    plan = distribute_questions(chunks, num_questions)
+    print(f"[Chunked] {question_type}: {len(chunks)} chunks, generating from {len(plan)}")
+
+    executor = ThreadPoolExecutor(max_workers=min(MAX_CHUNK_WORKERS, len(plan)),
+                                  thread_name_prefix='question-chunk')
+    futures = [
+        executor.submit(generator, chunks[index], count, model, temperature=temperature, provider=provider,
+                        openai_api_key=openai_api_key, gemini_api_key=gemini_api_key, use_cache=use_cache,
+                        organization=organization, wait_until=wait_until)
+        for index, count in plan
+    ]
+    wait(futures, timeout=deadline)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    question_lists = []
+    errors = []
+    for future in futures:
+        if not future.done():
+            errors.append(f"Generation timed out after {deadline:.0f} seconds")
+            continue
+        try:
+            questions, error = future.result()
+        except Exception as e:
+            questions, error = None, str(e)
+        if questions:
+            question_lists.append(questions)
+        if error:
+            errors.append(error)
+
+    merged = merge_chunk_questions(question_lists, num_questions)
+
+    if not merged:
+        return None, errors[0] if errors else "No valid questions were generated"
+
+    if errors:
+        return merged, f"{len(errors)} of {len(plan)} document sections failed: {errors[0]}"
+
+    return merged, None
+
+
 # ============================================================================
 # BACKWARD COMPATIBILITY FUNCTIONS
 # ============================================================================
@@ -618,6 +859,27 @@ def generate_questions_from_content(content, num_questions=10, difficulty='mediu
 # UTILITY FUNCTIONS
 # ============================================================================
 
+def estimate_ai_calls(text: str, num_mcq: int = 0, num_true_false: int = 0, num_short_answer: int = 0) -> int:
+    """
+    Number of AI calls generate_questions_mixed() makes for a request
+
+    Args:
+        text: Source text to generate questions from
+        num_mcq: Number of MCQ questions
+        num_true_false: Number of True/False questions
+        num_short_answer: Number of Short Answer questions
+
+    Returns:
+        One call per question type for short text, one per planned chunk otherwise
+    """
+    chunks = split_text_into_chunks(text)
+    calls = 0
+    for count in (num_mcq, num_true_false, num_short_answer):
+        if count > 0:
+            calls += 1 if len(chunks) <= 1 else len(distribute_questions(chunks, count))
+    return calls
+
+
 def generate_questions_mixed(
     text: str,
     num_mcq: int = 3,
@@ -626,11 +888,19 @@ def generate_questions_mixed(
     model: str = "gemini-2.5-flash",
     provider: str = 'gemini',
     openai_api_key: Optional[str] = None,
-    gemini_api_key: Optional[str] = None
+    gemini_api_key: Optional[str] = None,
+    use_cache: bool = True,
+    organization: Optional[str] = None,
+    concurrent: bool = True,
+    deadline: Optional[float] = GENERATION_DEADLINE,
+    wait_for_rate_limit: bool = False
 ) -> Dict[str, any]:
     """
     Generate a mix of different question types from text
 
+    Text longer than one prompt is chunked per question type
+    (see generate_questions_chunked).
+
     Args:
         text: Source text to generate questions from
         num_mcq: Number of MCQ questions
@@ -640,6 +910,12 @@ def generate_questions_mixed(
         provider: 'openai' or 'gemini'
         openai_api_key: Optional organization-specific OpenAI API key
         gemini_api_key: Optional organization-specific Gemini API key
+        use_cache: Serve identical requests from the response cache
+        organization: Organization the AI calls are rate limited under
+        concurrent: Run the question types in parallel instead of one after another
+        deadline: Seconds to wait for concurrent generation (None waits indefinitely)
+        wait_for_rate_limit: Wait for rate limit tokens until the deadline instead of
+                             waiting at most AI_RATE_LIMIT_MAX_WAIT (for background jobs)
 
     Returns:
         Dictionary with questions and any errors
@@ -651,35 +927,56 @@ def generate_questions_mixed(
         'errors': []
     }
 
-    # Generate MCQs
+    # (question type, error label, number of questions)
+    tasks = []
     if num_mcq > 0:
-        mcq_questions, error = generate_mcq_questions(text, num_mcq, model, temperature=0.7, provider=provider,
-                                                       openai_api_key=openai_api_key, gemini_api_key=gemini_api_key)
-        if mcq_questions:
-            results['mcq'] = mcq_questions
-        if error:
-            results['errors'].append(f"MCQ: {error}")
-            print(f"MCQ Generation Error: {error}")  # Debug logging
-
-    # Generate True/False
+        tasks.append(('mcq', 'MCQ', num_mcq))
     if num_true_false > 0:
-        tf_questions, error = generate_true_false_questions(text, num_true_false, model, temperature=0.7, provider=provider,
-                                                             openai_api_key=openai_api_key, gemini_api_key=gemini_api_key)
-        if tf_questions:
-            results['true_false'] = tf_questions
-        if error:
-            results['errors'].append(f"True/False: {error}")
-            print(f"True/False Generation Error: {error}")  # Debug logging
-
-    # Generate Short Answer
+        tasks.append(('true_false', 'True/False', num_true_false))
     if num_short_answer > 0:
-        sa_questions, error = generate_short_answer_questions(text, num_short_answer, model, temperature=0.7, provider=provider,
-                                                               openai_api_key=openai_api_key, gemini_api_key=gemini_api_key)
-        if sa_questions:
-            results['short_answer'] = sa_questions
+        tasks.append(('short_answer', 'Short Answer', num_short_answer))
+
+    # Leave headroom so chunked generation can return partial results before our own deadline
+    chunk_deadline = deadline * 0.9 if concurrent and deadline else None
+
+    # Rate limited calls may wait for tokens as long as the chunks can still finish in time
+    wait_until = None
+    if wait_for_rate_limit and (chunk_deadline or deadline):
+        wait_until = time.monotonic() + (chunk_deadline or deadline)
+
+    def run_task(question_type, count):
+        return generate_questions_chunked(question_type, text, count, model, temperature=0.7, provider=provider,
+                                          openai_api_key=openai_api_key, gemini_api_key=gemini_api_key,
+                                          use_cache=use_cache, organization=organization, deadline=chunk_deadline,
+                                          wait_until=wait_until)
+
+    if concurrent and tasks:
+        # Issue the type-specific calls in parallel so a mixed request costs one round trip
+        executor = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix='question-gen')
+        futures = [executor.submit(run_task, question_type, count) for question_type, _, count in tasks]
+        wait(futures, timeout=deadline)
+        # Don't block on stragglers; their results are discarded once the deadline passes
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        outcomes = []
+        for future in futures:
+            if not future.done():
+                outcomes.append((None, f"Generation timed out after {deadline:.0f} seconds"))
+                continue
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                outcomes.append((None, str(e)))
+    else:
+        outcomes = [run_task(question_type, count) for question_type, _, count in tasks]
+
+    # Merge in a fixed order so errors read the same regardless of completion order
+    for (key, label, _), (questions, error) in zip(tasks, outcomes):
+        if questions:
+            results[key] = questions
         if error:
-            results['errors'].append(f"Short Answer: {error}")
-            print(f"Short Answer Generation Error: {error}")  # Debug logging
+            results['errors'].append(f"{label}: {error}")
+            print(f"{label} Generation Error: {error}")  # Debug logging
 
     return results
 
@@ -0,0 +1,140 @@
+"""
+Persisted Near-Duplicate Index
+Looks up duplicate questions through the text_hash and LSH signature bands
+stored with each question (see models.QuestionSignatureBand), so duplicate
+checks load only candidate questions instead of every question in the bank.
+"""
+
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, insert
+
+from models import Question, Document, QuestionSignatureBand
+from dedupe import NearDuplicateIndex, DEFAULT_THRESHOLD, normalize_text, question_fingerprint, is_similar
+
+
+class PersistedDuplicateIndex:
+    """
+    Duplicate checks against the stored questions of a document or organization
+
+    Questions accepted during the current request are tracked in memory with
+    add(), since they may not be flushed yet. find_duplicate() reports stored
+    questions before pending ones, as a scan in insertion order would.
+    """
+
+    def __init__(self, db_session, document_id: Optional[int] = None, organization: Optional[str] = None,
+                 threshold: float = DEFAULT_THRESHOLD):
+        """
+        Args:
+            db_session: Database session
+            document_id: Check against this document's questions
+            organization: Check against all questions of this organization's documents
+                          (used when document_id is not given)
+            threshold: SequenceMatcher ratio treated as a duplicate
+        """
+        if document_id is None and organization is None:
+            raise ValueError("PersistedDuplicateIndex needs a document_id or an organization")
+
+        self.db_session = db_session
+        self.document_id = document_id
+        self.organization = organization
+        self.threshold = threshold
+        self._pending = NearDuplicateIndex(threshold=threshold)
+
+    def _scoped(self, query):
+        """Limit a Question query to the index scope"""
+        if self.document_id is not None:
+            return query.filter(Question.document_id == self.document_id)
+        return query.join(Document, Question.document_id == Document.id)\
+            .filter(Document.organization == self.organization)
+
+    def add(self, text: str) -> None:
+        """Track a question accepted in this request"""
+        self._pending.add(text)
+
+    def clear_pending(self) -> None:
+        """Forget tracked questions once they are committed and can be found in the database"""
+        self._pending = NearDuplicateIndex(threshold=self.threshold)
+
+    def find_duplicate(self, text: str, threshold: Optional[float] = None) -> Optional[str]:
+        """
+        Find a stored or pending question similar to text
+
+        Args:
+            text: Question text to check
+            threshold: SequenceMatcher ratio treated as a duplicate (defaults to the index threshold)
+
+        Returns:
+            The similar question text, or None
+        """
+        threshold = self.threshold if threshold is None else threshold
+        normalized = normalize_text(text)
+        text_hash, band_keys = question_fingerprint(text)
+
+        # Pending questions are checked in memory; do not flush them just to query
+        with self.db_session.no_autoflush:
+            # Exact repeats (e.g. a CSV imported twice) need only the hash index
+            exact = self._scoped(
+                self.db_session.query(Question.question_text).filter(Question.text_hash == text_hash)
+            ).order_by(Question.id).first()
+            if exact:
+                return exact[0]
+
+            candidates = self._scoped(
+                self.db_session.query(Question.id, Question.question_text)
+                .join(QuestionSignatureBand, QuestionSignatureBand.question_id == Question.id)
+                .filter(QuestionSignatureBand.band_key.in_(band_keys))
+            ).distinct().order_by(Question.id).all()
+
+        for question_id, question_text in candidates:
+            if is_similar(normalized, normalize_text(question_text), threshold):
+                return question_text
+
+        return self._pending.find_duplicate(text, threshold=threshold)
+
+
+def bulk_insert_questions(db_session, mappings: List[Dict]) -> List[int]:
+    """
+    Insert questions with batched INSERTs, including their fingerprints
+
+    Bulk inserts skip the ORM flush events that fingerprint new questions,
+    so text_hash and the signature band rows are written here. Questions and
+    bands are each inserted with one executemany, and the new question ids are
+    read back with one query instead of one INSERT per question.
+
+    Args:
+        db_session: Database session
+        mappings: Question column values, one dict per question
+
+    Returns:
+        IDs of the inserted questions, in order
+    """
+    if not mappings:
+        return []
+
+    rows = []
+    band_keys = []
+    for mapping in mappings:
+        text_hash, keys = question_fingerprint(mapping['question_text'])
+        rows.append(dict(mapping, text_hash=text_hash))
+        band_keys.append(keys)
+
+    last_id = db_session.query(func.max(Question.id)).scalar() or 0
+    db_session.execute(insert(Question), rows)
+
+    # The new rows are the ones after last_id with these hashes, in insertion order
+    new_ids: Dict[tuple, List[int]] = {}
+    inserted = db_session.query(Question.id, Question.document_id, Question.text_hash)\
+        .filter(Question.id > last_id, Question.text_hash.in_({row['text_hash'] for row in rows}))\
+        .order_by(Question.id)
+    for question_id, document_id, text_hash in inserted:
+        new_ids.setdefault((document_id, text_hash), []).append(question_id)
+    question_ids = [new_ids[(row['document_id'], row['text_hash'])].pop(0) for row in rows]
+
+    db_session.execute(insert(QuestionSignatureBand), [
+        {'question_id': question_id, 'band_key': key}
+        for question_id, keys in zip(question_ids, band_keys)
+        for key in keys
+    ])
+
+    return question_ids
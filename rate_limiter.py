@@ -0,0 +1,238 @@
+"""
+Rate Limiter Module
+Token-bucket rate limiting for AI provider calls, keyed by organization and provider
+Backends: SQLite (default, shared by all worker processes on a host) or in-process memory
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+# Rate limiting configuration
+RATE_LIMIT_REQUESTS = int(os.getenv('AI_RATE_LIMIT_REQUESTS', '10'))  # Bucket capacity (burst size)
+RATE_LIMIT_WINDOW = int(os.getenv('AI_RATE_LIMIT_WINDOW', '60'))  # Seconds to refill a full bucket
+GRADING_RATE_LIMIT_REQUESTS = int(os.getenv('AI_GRADING_RATE_LIMIT_REQUESTS', '120'))  # Grading bucket capacity per window
+RATE_LIMIT_MAX_WAIT = float(os.getenv('AI_RATE_LIMIT_MAX_WAIT', '0'))  # Seconds a call outside a background job waits for a token (0 = fail fast)
+RATE_LIMIT_BACKEND = os.getenv('AI_RATE_LIMIT_BACKEND', 'sqlite')  # 'sqlite' or 'memory'
+RATE_LIMIT_PATH = os.getenv('AI_RATE_LIMIT_PATH', 'rate_limits.db')
+
+
+def make_rate_limit_key(organization: Optional[str], provider: str, purpose: Optional[str] = None) -> str:
+    """Build the bucket key for an organization's calls to a provider (optionally for one purpose, e.g. 'grading')"""
+    key = f"{organization or '_default'}:{provider}"
+    return f"{key}:{purpose}" if purpose else key
+
+
+def _refill(tokens: float, updated_at: float, capacity: int, refill_rate: float, now: float) -> float:
+    """Add the tokens earned since updated_at, capped at capacity"""
+    return min(float(capacity), tokens + max(0.0, now - updated_at) * refill_rate)
+
+
+class BucketStore(ABC):
+    """Storage interface for token buckets"""
+
+    @abstractmethod
+    def take(self, key: str, capacity: int, refill_rate: float, consume: bool = True, count: int = 1) -> float:
+        """
+        Take count tokens from the bucket for key
+
+        Args:
+            key: Bucket key
+            capacity: Maximum tokens in the bucket
+            refill_rate: Tokens added per second
+            consume: False to only check availability
+            count: Tokens needed (at most capacity)
+
+        Returns:
+            0.0 if the tokens were available, otherwise seconds until they will be
+        """
+
+
+class MemoryBucketStore(BucketStore):
+    """Thread-safe buckets held in this process only"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, refill_rate: float, consume: bool = True, count: int = 1) -> float:
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (float(capacity), now))
+            tokens = _refill(tokens, updated_at, capacity, refill_rate, now)
+
+            if tokens >= count:
+                if consume:
+                    tokens -= count
+                retry_after = 0.0
+            else:
+                retry_after = (count - tokens) / refill_rate
+
+            self._buckets[key] = (tokens, now)
+            return retry_after
+
+
+class SQLiteBucketStore(BucketStore):
+    """Buckets in a SQLite file so every worker process on the host shares the same limits"""
+
+    def __init__(self, path: str = RATE_LIMIT_PATH):
+        self.path = path
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    bucket_key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # Autocommit mode so the read-modify-write below can hold an explicit write lock
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def take(self, key: str, capacity: int, refill_rate: float, consume: bool = True, count: int = 1) -> float:
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE takes the database write lock, serializing updates across processes
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket_key = ?", (key,)
+            ).fetchone()
+
+            tokens = float(capacity) if row is None else _refill(row[0], row[1], capacity, refill_rate, now)
+
+            if tokens >= count:
+                if consume:
+                    tokens -= count
+                retry_after = 0.0
+            else:
+                retry_after = (count - tokens) / refill_rate
+
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (bucket_key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            conn.execute("COMMIT")
+            return retry_after
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+class TokenBucketLimiter:
+    """
+    Token-bucket limiter allowing `capacity` calls per `window` seconds per key
+
+    Buckets refill continuously, so short bursts up to capacity are allowed
+    while the sustained rate stays at capacity / window.
+    """
+
+    def __init__(self, store: BucketStore, capacity: int = RATE_LIMIT_REQUESTS, window: int = RATE_LIMIT_WINDOW):
+        self.store = store
+        self.capacity = capacity
+        self.refill_rate = capacity / float(window)
+
+    def _take(self, key: str, consume: bool, count: int = 1) -> float:
+        try:
+            return self.store.take(key, self.capacity, self.refill_rate, consume, min(count, self.capacity))
+        except Exception as e:
+            # Fail open: a broken limiter store must not block AI generation
+            print(f"[Rate Limit] Store error, allowing call: {e}")
+            return 0.0
+
+    def try_acquire(self, key: str) -> Tuple[bool, float]:
+        """
+        Take a token without waiting
+
+        Returns:
+            Tuple of (allowed, retry_after_seconds)
+        """
+        retry_after = self._take(key, consume=True)
+        return retry_after == 0.0, retry_after
+
+    def acquire(self, key: str, max_wait: float = RATE_LIMIT_MAX_WAIT) -> Tuple[bool, float]:
+        """
+        Take a token, waiting up to max_wait seconds for one to become available
+
+        Returns:
+            Tuple of (allowed, retry_after_seconds)
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            allowed, retry_after = self.try_acquire(key)
+            if allowed:
+                return True, 0.0
+
+            remaining = deadline - time.monotonic()
+            if retry_after > remaining:
+                return False, retry_after
+
+            time.sleep(retry_after)
+
+    def retry_after(self, key: str, calls: int = 1) -> float:
+        """
+        Seconds until the bucket for key holds tokens for the given number of calls
+        (0.0 if it does now), without taking them
+
+        More calls than the bucket holds are reported as allowed once the bucket is full.
+        """
+        return self._take(key, consume=False, count=max(1, calls))
+
+
+_rate_limiter = None
+_grading_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TokenBucketLimiter:
+    """Get the process-wide rate limiter, creating the configured backend on first use"""
+    global _rate_limiter
+
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                store = None
+                if RATE_LIMIT_BACKEND == 'sqlite':
+                    try:
+                        store = SQLiteBucketStore()
+                    except sqlite3.Error as e:
+                        print(f"[Rate Limit] Falling back to per-process limits, could not open {RATE_LIMIT_PATH}: {e}")
+
+                _rate_limiter = TokenBucketLimiter(store or MemoryBucketStore())
+
+    return _rate_limiter
+
+
+def get_grading_rate_limiter() -> TokenBucketLimiter:
+    """
+    Get the limiter for short answer grading calls
+
+    Grading has its own, larger buckets in the same store, so exam submissions
+    neither wait for nor use up the tokens of question generation.
+    """
+    global _grading_rate_limiter
+
+    store = get_rate_limiter().store
+    if _grading_rate_limiter is None or _grading_rate_limiter.store is not store:
+        with _rate_limiter_lock:
+            if _grading_rate_limiter is None or _grading_rate_limiter.store is not store:
+                _grading_rate_limiter = TokenBucketLimiter(store, capacity=GRADING_RATE_LIMIT_REQUESTS)
+
+    return _grading_rate_limiter
+
+
+def set_rate_limiter(limiter: TokenBucketLimiter) -> None:
+    """Replace the process-wide rate limiter (e.g. with a shared-store backend)"""
+    global _rate_limiter
+    _rate_limiter = limiter
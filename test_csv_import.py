@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Chunked CSV import checks
+Imports a generated CSV file into an in-memory SQLite database in several
+chunks, lets the import fail partway, and checks that resuming it finishes
+the import without duplicating questions or row errors, and that a different
+file is refused.
+"""
+
+import io
+import csv
+import random
+
+from models import User, Document, Question, CsvImport, get_engine, get_session, create_all_tables
+from csv_import import open_csv_reader, import_questions
+
+CHUNK_SIZE = 20
+NUM_ROWS = 120
+INVALID_ROWS = {15, 47, 90}  # Data rows with an unknown question type
+REPEATED_ROWS = {60: 5, 100: 30}  # Data rows repeating an earlier row's question
+WORDS = ('photosynthesis erosion inflation gravity mitosis democracy friction osmosis tariffs volcanoes '
+         'enzymes magnetism monsoons feudalism isotopes glaciers bacteria satellites vaccines alloys '
+         'pollination recession orbits tsunamis proteins empires circuits deserts neurons acids').split()
+
+
+def question_text(index):
+    """Question text for a data row, far from the duplicate threshold of every other row"""
+    words = random.Random(index).sample(WORDS, 6)
+    return f"How does {words[0]} relate to {words[1]}, {words[2]} and {words[3]} in {words[4]} {words[5]}?"
+
+
+def make_csv(num_rows=NUM_ROWS, first_question=0):
+    """CSV bytes with NUM_ROWS data rows; explanations make the file span several read buffers"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['question_type', 'question', 'option_a', 'option_b', 'option_c', 'option_d',
+                     'correct_answer', 'explanation', 'difficulty'])
+    for row in range(1, num_rows + 1):
+        index = REPEATED_ROWS.get(row, row) + first_question
+        question_type = 'essay' if row in INVALID_ROWS else 'mcq'
+        writer.writerow([question_type, question_text(index), 'First option', 'Second option', 'Third option',
+                         'Fourth option', 'A', 'Explanation ' + 'x' * 200, 'medium'])
+    return buffer.getvalue().encode('utf-8')
+
+
+def make_session():
+    """Create a session on a fresh in-memory database with a user and a document"""
+    engine = get_engine('sqlite://')
+    create_all_tables(engine)
+    db_session = get_session(engine)
+
+    user = User(email='teacher@example.com', name='Teacher', role='teacher')
+    user.set_password('password')
+    db_session.add(user)
+    db_session.flush()
+    document = Document(filename='CSV Import', content='', uploaded_by=user.id)
+    db_session.add(document)
+    db_session.commit()
+    return db_session, user, document
+
+
+def run_import(db_session, data, csv_import, document, user):
+    """Import CSV bytes the way the upload route does"""
+    return import_questions(db_session, open_csv_reader(io.BytesIO(data)), csv_import, document.id, user.id,
+                            chunk_size=CHUNK_SIZE)
+
+
+def test_resume_after_failure():
+    """A failed import resumes after its last committed chunk without duplicates"""
+    db_session, user, document = make_session()
+    data = make_csv()
+
+    # Invalid UTF-8 after the first read buffer fails the import partway through
+    cut = data.index(b'\n', 9000) + 1
+    broken = data[:cut] + b'\xff\xfe' + data[cut:]
+
+    csv_import = CsvImport(user_id=user.id, filename='questions.csv')
+    db_session.add(csv_import)
+    db_session.commit()
+
+    run_import(db_session, broken, csv_import, document, user)
+    assert csv_import.status == 'failed', csv_import.status
+    assert 0 < csv_import.rows_processed < NUM_ROWS, csv_import.rows_processed
+    assert csv_import.rows_processed % CHUNK_SIZE == 0, csv_import.rows_processed
+    assert db_session.query(Question).count() == csv_import.imported_count
+    committed_errors = list(csv_import.errors_json or [])
+
+    run_import(db_session, data, csv_import, document, user)
+    assert csv_import.status == 'completed', csv_import.error_message
+    assert csv_import.rows_processed == NUM_ROWS, csv_import.rows_processed
+
+    # Invalid and repeated rows are skipped once each
+    expected_errors = sorted(INVALID_ROWS | set(REPEATED_ROWS))
+    assert csv_import.error_count == len(expected_errors), csv_import.errors_json
+    assert sorted(error['row'] - 1 for error in csv_import.errors_json) == expected_errors
+    assert csv_import.errors_json[:len(committed_errors)] == committed_errors
+
+    texts = [text for text, in db_session.query(Question.question_text).all()]
+    assert len(texts) == len(set(texts)), "questions were imported twice"
+    assert len(texts) == csv_import.imported_count == NUM_ROWS - len(expected_errors)
+
+
+def test_resume_refuses_other_file():
+    """Resuming with a file whose first rows differ is refused without importing anything"""
+    db_session, user, document = make_session()
+    data = make_csv()
+    cut = data.index(b'\n', 9000) + 1
+
+    csv_import = CsvImport(user_id=user.id, filename='questions.csv')
+    db_session.add(csv_import)
+    db_session.commit()
+
+    run_import(db_session, data[:cut] + b'\xff' + data[cut:], csv_import, document, user)
+    rows_processed, imported_count = csv_import.rows_processed, csv_import.imported_count
+
+    for other in (make_csv(first_question=1000), make_csv(num_rows=rows_processed // 2)):
+        run_import(db_session, other, csv_import, document, user)
+        assert csv_import.status == 'failed', csv_import.status
+        assert 'Upload the same file to resume' in csv_import.error_message, csv_import.error_message
+        assert csv_import.rows_processed == rows_processed
+        assert csv_import.imported_count == imported_count
+        assert db_session.query(Question).count() == imported_count
+
+
+def run_checks():
+    """Run all checks and print a summary"""
+    print("\n" + "=" * 70)
+    print(" CSV IMPORT CHECKS")
+    print("=" * 70 + "\n")
+
+    checks = [
+        test_resume_after_failure,
+        test_resume_refuses_other_file,
+    ]
+
+    failed = 0
+    for check in checks:
+        try:
+            check()
+            print(f"✓ {check.__doc__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {check.__doc__}\n{e}\n")
+
+    print("\n" + "=" * 70)
+    print(f" {len(checks) - failed}/{len(checks)} CHECKS PASSED")
+    print("=" * 70 + "\n")
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(0 if run_checks() else 1)
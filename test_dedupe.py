@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection checks
+Compares dedupe.NearDuplicateIndex and question_index.PersistedDuplicateIndex
+with the full SequenceMatcher scan of utils.check_duplicate_question on a
+generated question bank that includes near duplicates right at the threshold.
+"""
+
+import random
+from difflib import SequenceMatcher
+
+from models import Document, Question, QuestionSignatureBand, User, get_engine, get_session, create_all_tables
+from utils import check_duplicate_question
+from dedupe import NearDuplicateIndex, DEFAULT_THRESHOLD, normalize_text
+from question_index import PersistedDuplicateIndex, bulk_insert_questions
+
+WORDS = ('cell energy photosynthesis mitochondria process plant light water carbon oxygen enzyme protein '
+         'membrane nucleus division transfer glucose temperature pressure volume force mass acceleration '
+         'velocity electron proton atom molecule bond reaction catalyst equilibrium acid solution treaty '
+         'empire revolution economy market supply demand price inflation government parliament').split()
+STARTS = ['What is the role of ', 'Explain how ', 'Which of the following describes ', 'Why does ']
+
+
+def make_question(rng):
+    """A random question from a small vocabulary, so unrelated questions still share many shingles"""
+    return rng.choice(STARTS) + ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 14))) + '?'
+
+
+def make_near_duplicate(rng, text):
+    """
+    Replace, insert or delete a few words of text, keeping the SequenceMatcher
+    ratio at or just above the duplicate threshold
+    """
+    for _ in range(200):
+        words = text.split(' ')
+        for _ in range(rng.randint(1, 3)):
+            position, edit = rng.randrange(len(words)), rng.random()
+            if edit < 0.5:
+                words[position] = rng.choice(WORDS)
+            elif edit < 0.75:
+                words.insert(position, rng.choice(WORDS))
+            elif len(words) > 3:
+                del words[position]
+        candidate = ' '.join(words)
+        ratio = SequenceMatcher(None, normalize_text(candidate), normalize_text(text)).ratio()
+        if DEFAULT_THRESHOLD <= ratio < DEFAULT_THRESHOLD + 0.05:
+            return candidate
+    return text
+
+
+def make_bank(seed=21, size=150, checks=150):
+    """Existing questions and the questions to check against them (about half near duplicates)"""
+    rng = random.Random(seed)
+    bank = [make_question(rng) for _ in range(size)]
+    new = [make_near_duplicate(rng, rng.choice(bank)) if rng.random() < 0.5 else make_question(rng)
+           for _ in range(checks)]
+    return bank, new
+
+
+def make_session():
+    """Create a session on a fresh in-memory database"""
+    engine = get_engine('sqlite://')
+    create_all_tables(engine)
+    return get_session(engine)
+
+
+def test_index_matches_full_scan():
+    """NearDuplicateIndex finds the same duplicates as a full scan"""
+    bank, new = make_bank()
+    index = NearDuplicateIndex(bank)
+    duplicates = 0
+
+    for text in new:
+        _, expected = check_duplicate_question(text, bank)
+        assert index.find_duplicate(text) == expected, f"index and full scan disagree on {text!r}"
+        duplicates += expected is not None
+
+    assert duplicates > len(new) // 3, f"expected the generated bank to hold near duplicates, got {duplicates}"
+
+
+def test_index_tracks_added_questions():
+    """Questions added to the index are found like questions in the bank"""
+    bank, new = make_bank(seed=5, size=60, checks=60)
+    index = NearDuplicateIndex()
+    seen = []
+
+    for text in bank + new:
+        _, expected = check_duplicate_question(text, seen)
+        assert index.find_duplicate(text) == expected, f"index and full scan disagree on {text!r}"
+        index.add(text)
+        seen.append(text)
+
+    assert len(index) == len(seen)
+
+
+def test_persisted_index_matches_full_scan():
+    """PersistedDuplicateIndex finds the same duplicates as a full scan of the document"""
+    bank, new = make_bank(seed=8, size=100, checks=100)
+    db_session = make_session()
+    user = User(email='teacher@example.com', name='Teacher', role='teacher')
+    user.set_password('password')
+    db_session.add(user)
+    db_session.flush()
+    document = Document(filename='bank.txt', content='', uploaded_by=user.id, organization='Org1')
+    db_session.add(document)
+    db_session.flush()
+
+    # Half through the ORM flush event, half through bulk inserts
+    half = len(bank) // 2
+    db_session.add_all(Question(document_id=document.id, question_text=text, question_type='true_false')
+                       for text in bank[:half])
+    db_session.flush()
+    bulk_insert_questions(db_session, [
+        {'document_id': document.id, 'question_text': text, 'question_type': 'true_false'} for text in bank[half:]
+    ])
+    db_session.commit()
+    assert db_session.query(QuestionSignatureBand).count() > 0
+
+    index = PersistedDuplicateIndex(db_session, document_id=document.id)
+    for text in new:
+        _, expected = check_duplicate_question(text, bank)
+        assert index.find_duplicate(text) == expected, f"persisted index and full scan disagree on {text!r}"
+
+    # Pending questions are found before they are committed
+    pending = make_question(random.Random(99))
+    index.add(pending)
+    assert index.find_duplicate(pending) == pending
+
+
+def run_checks():
+    """Run all checks and print a summary"""
+    print("\n" + "=" * 70)
+    print(" NEAR-DUPLICATE DETECTION CHECKS")
+    print("=" * 70 + "\n")
+
+    checks = [
+        test_index_matches_full_scan,
+        test_index_tracks_added_questions,
+        test_persisted_index_matches_full_scan,
+    ]
+
+    failed = 0
+    for check in checks:
+        try:
+            check()
+            print(f"✓ {check.__doc__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {check.__doc__}\n{e}\n")
+
+    print("\n" + "=" * 70)
+    print(f" {len(checks) - failed}/{len(checks)} CHECKS PASSED")
+    print("=" * 70 + "\n")
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(0 if run_checks() else 1)
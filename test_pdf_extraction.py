@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+PDF text extraction checks
+Builds a multi-page PDF with reportlab and checks that extracting it with the
+process pool gives exactly the text of extracting it page by page in this process.
+"""
+
+import os
+import re
+import tempfile
+import time
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+import utils
+from utils import extract_text_from_pdf, PDF_PARALLEL_MIN_PAGES
+
+NUM_PAGES = PDF_PARALLEL_MIN_PAGES + 13  # Large enough for the pool, uneven across page ranges
+
+
+def build_pdf(path, num_pages=NUM_PAGES):
+    """Write a PDF whose pages each carry distinct text (every seventh page is left blank)"""
+    pdf = canvas.Canvas(path, pagesize=letter)
+    for page in range(1, num_pages + 1):
+        if page % 7:
+            pdf.drawString(72, 720, f"Chapter {page // 10 + 1}, page {page}")
+            pdf.drawString(72, 700, f"Photosynthesis fact number {page * 3} about chlorophyll and light.")
+        pdf.showPage()
+    pdf.save()
+
+
+def test_parallel_matches_sequential():
+    """Parallel extraction of a large PDF matches sequential extraction"""
+    handle, path = tempfile.mkstemp(suffix='.pdf')
+    os.close(handle)
+    try:
+        build_pdf(path)
+        sequential = extract_text_from_pdf(path, workers=1)
+        parallel = extract_text_from_pdf(path, workers=2)
+        assert utils._pdf_pool is not None, "expected the large PDF to be extracted by the process pool"
+
+        assert parallel == sequential, "parallel and sequential extraction differ"
+        pages = [int(number) for number in re.findall(r'page (\d+)', parallel)]
+        assert pages == [page for page in range(1, NUM_PAGES + 1) if page % 7], pages
+
+        # Fewer pages than the page count and the reused pool give the same prefix
+        limited = extract_text_from_pdf(path, max_pages=PDF_PARALLEL_MIN_PAGES, workers=2)
+        assert limited == extract_text_from_pdf(path, max_pages=PDF_PARALLEL_MIN_PAGES, workers=1)
+        assert sequential.startswith(limited)
+    finally:
+        os.remove(path)
+
+
+def test_idle_pool_is_closed():
+    """The process pool is closed once no PDF has used it for PDF_POOL_IDLE_TIMEOUT"""
+    handle, path = tempfile.mkstemp(suffix='.pdf')
+    os.close(handle)
+    idle_timeout = utils.PDF_POOL_IDLE_TIMEOUT
+    utils.PDF_POOL_IDLE_TIMEOUT = 0.5
+    try:
+        build_pdf(path, num_pages=PDF_PARALLEL_MIN_PAGES)
+        extract_text_from_pdf(path, workers=2)
+        assert utils._pdf_pool is not None, "expected the pool to be kept between PDFs"
+        time.sleep(2)
+        assert utils._pdf_pool is None, "expected the idle pool to be closed"
+        assert not utils._pdf_pool_users, utils._pdf_pool_users
+
+        # The next large PDF starts a new pool
+        assert extract_text_from_pdf(path, workers=2) == extract_text_from_pdf(path, workers=1)
+    finally:
+        utils.PDF_POOL_IDLE_TIMEOUT = idle_timeout
+        os.remove(path)
+
+
+def run_checks():
+    """Run all checks and print a summary"""
+    print("\n" + "=" * 70)
+    print(" PDF EXTRACTION CHECKS")
+    print("=" * 70 + "\n")
+
+    checks = [
+        test_parallel_matches_sequential,
+        test_idle_pool_is_closed,
+    ]
+
+    failed = 0
+    for check in checks:
+        try:
+            check()
+            print(f"✓ {check.__doc__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {check.__doc__}\n{e}\n")
+
+    print("\n" + "=" * 70)
+    print(f" {len(checks) - failed}/{len(checks)} CHECKS PASSED")
+    print("=" * 70 + "\n")
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(0 if run_checks() else 1)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Query plan checks for the hot query shapes
+Runs EXPLAIN QUERY PLAN on an in-memory SQLite database built from models.py
+and asserts that the main routes' queries use the composite indexes.
+"""
+
+from sqlalchemy import func
+
+from models import User, Document, Question, QuestionSignatureBand, Exam, ExamQuestion, get_engine, get_session, create_all_tables
+
+
+def make_session():
+    """Create a session on a fresh in-memory database"""
+    engine = get_engine('sqlite://')
+    create_all_tables(engine)
+    return get_session(engine)
+
+
+def explain(db_session, query):
+    """Return the EXPLAIN QUERY PLAN details of an ORM query as one string"""
+    engine = db_session.get_bind()
+    sql = str(query.statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql).fetchall()
+    return '\n'.join(row[-1] for row in rows)
+
+
+def assert_uses_index(plan, index_name):
+    assert index_name in plan, f"expected {index_name} in plan:\n{plan}"
+
+
+def test_exam_question_selection():
+    """exam(): approved questions of a document, optionally by difficulty"""
+    db_session = make_session()
+    query = db_session.query(Question)\
+        .filter_by(document_id=1, status='approved')\
+        .filter_by(difficulty='easy')
+    assert_uses_index(explain(db_session, query), 'ix_questions_document_status_difficulty')
+
+
+def test_question_type_counts():
+    """Question counts by type for one status"""
+    db_session = make_session()
+    query = db_session.query(Question.question_type, func.count(Question.id))\
+        .filter(Question.question_type == 'mcq', Question.status == 'approved')\
+        .group_by(Question.question_type)
+    assert_uses_index(explain(db_session, query), 'ix_questions_type_status')
+
+
+def test_organization_documents_newest_first():
+    """documents() and admin_documents(): an organization's documents, newest first"""
+    db_session = make_session()
+    query = db_session.query(Document)\
+        .filter_by(organization='Org1')\
+        .order_by(Document.created_at.desc(), Document.id.desc())
+    plan = explain(db_session, query)
+    assert_uses_index(plan, 'ix_documents_organization_created_at')
+    assert 'TEMP B-TREE' not in plan, f"expected no sort step in plan:\n{plan}"
+
+
+def test_completed_exams_of_user():
+    """results() and analytics(): a user's completed exams, most recent first"""
+    db_session = make_session()
+    query = db_session.query(Exam)\
+        .filter_by(user_id=1)\
+        .filter(Exam.completed_at.isnot(None))\
+        .order_by(Exam.completed_at.desc())
+    assert_uses_index(explain(db_session, query), 'ix_exams_user_completed_at')
+
+
+def test_exam_questions_of_exam():
+    """exam_results(): the questions of one exam"""
+    db_session = make_session()
+    query = db_session.query(ExamQuestion).filter_by(exam_id=1)
+    assert_uses_index(explain(db_session, query), 'ix_exam_questions_exam_id')
+
+
+def test_users_by_organization_and_role():
+    """Role counts and member lists within an organization"""
+    db_session = make_session()
+    query = db_session.query(User.role, func.count(User.id))\
+        .filter(User.organization == 'Org1')\
+        .group_by(User.role)
+    assert_uses_index(explain(db_session, query), 'ix_users_organization_role')
+
+
+def test_signature_band_lookup():
+    """Duplicate checks: a document's questions sharing a signature band"""
+    db_session = make_session()
+    query = db_session.query(Question.id, Question.question_text)\
+        .join(QuestionSignatureBand, QuestionSignatureBand.question_id == Question.id)\
+        .filter(QuestionSignatureBand.band_key.in_([1, 2, 3]))\
+        .filter(Question.document_id == 1)
+    assert_uses_index(explain(db_session, query), 'ix_question_signature_bands_band_key')
+
+
+def run_checks():
+    """Run all query plan checks"""
+    print("\n" + "=" * 70)
+    print(" QUERY PLAN CHECKS")
+    print("=" * 70 + "\n")
+
+    checks = [
+        test_exam_question_selection,
+        test_question_type_counts,
+        test_organization_documents_newest_first,
+        test_completed_exams_of_user,
+        test_exam_questions_of_exam,
+        test_users_by_organization_and_role,
+        test_signature_band_lookup,
+    ]
+
+    failed = 0
+    for check in checks:
+        try:
+            check()
+            print(f"✓ {check.__doc__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {check.__doc__}\n{e}\n")
+
+    print("\n" + "=" * 70)
+    print(f" {len(checks) - failed}/{len(checks)} CHECKS PASSED")
+    print("=" * 70 + "\n")
+    return failed == 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(0 if run_checks() else 1)
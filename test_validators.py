@@ -12,8 +12,10 @@ from utils import (
     calculate_difficulty_score,
     auto_fix_question_formatting,
     auto_fix_option_formatting,
-    validate_question_complete
+    validate_question_complete,
+    validate_questions_batch
 )
+from dedupe import NearDuplicateIndex
 
 
 def print_section(title):
@@ -264,6 +266,50 @@ def test_complete_validation():
             print(f"      - {error}")
 
 
+def test_batch_validation():
+    """Test batch validation against the single-question path"""
+    print_section("TEST 8: Batch Validation")
+
+    existing_questions = ["What is photosynthesis?", "How do plants produce energy?"]
+    questions = [
+        {'question_text': "what  is  the  primary  product  of  photosynthesis", 'question_type': 'mcq',
+         'correct_answer': 'A', 'options': {'A': 'glucose  and  oxygen.', 'B': 'carbon dioxide', 'C': 'WATER', 'D': 'nitrogen'}},
+        {'question_text': "What is the primary product of photosynthesis?", 'question_type': 'mcq',
+         'correct_answer': 'B', 'options': {'A': 'Oxygen', 'B': 'Glucose', 'C': 'Water', 'D': 'Nitrogen'}},
+        {'question_text': "What is photosynthesis?", 'question_type': 'short_answer'},
+        {'question_text': "plants  convert  sunlight  into  chemical  energy", 'question_type': 'true_false',
+         'correct_answer': 'true'},
+        {'question_text': "Mitochondria are found in plant cells", 'question_type': 'true_false',
+         'correct_answer': 'maybe'},
+    ]
+
+    results = validate_questions_batch(questions, existing_questions=existing_questions)
+
+    # Same results as validating one at a time and indexing each valid question
+    duplicate_index = NearDuplicateIndex(existing_questions)
+    expected = []
+    for question in questions:
+        result = validate_question_complete(
+            question_text=question['question_text'],
+            question_type=question['question_type'],
+            correct_answer=question.get('correct_answer'),
+            options=question.get('options'),
+            duplicate_index=duplicate_index
+        )
+        if result[0]:
+            duplicate_index.add(result[2]['question_text'])
+        expected.append(result)
+
+    assert results == expected
+    assert [is_valid for is_valid, _, _ in results] == [True, False, False, True, False]
+
+    for question, (is_valid, errors, fixed_data) in zip(questions, results):
+        status = "✓ PASSED" if is_valid else "✗ FAILED"
+        print(f"{status}: {fixed_data['question_text']}")
+        for error in errors:
+            print(f"      - {error}")
+
+
 def main():
     """Run all tests"""
     print("\n" + "=" * 70)
@@ -278,6 +324,7 @@ def main():
         test_difficulty_scoring()
         test_auto_fix_formatting()
         test_complete_validation()
+        test_batch_validation()
 
         print("\n" + "=" * 70)
         print(" ALL TESTS COMPLETED")
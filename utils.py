@@ -2,10 +2,33 @@
 Utility functions for file processing and text extraction
 """
 import os
+import math
+import atexit
+import time
+import signal
+import threading
+import multiprocessing
 import PyPDF2
 import docx
 from datetime import datetime
 
+# PDF extraction configuration
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', str(min(4, os.cpu_count() or 1))))  # Processes for large PDFs (1 disables the pool)
+PDF_PAGE_TIMEOUT = float(os.getenv('PDF_PAGE_TIMEOUT', '10'))  # Seconds before a page is skipped (0 disables)
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '50'))  # Smaller PDFs are not worth a pool
+# Keep the extraction deadline below gunicorn's worker timeout so the upload can still respond
+PDF_EXTRACT_TIMEOUT = float(os.getenv('PDF_EXTRACT_TIMEOUT', '25'))  # Seconds for a whole extraction (0 disables)
+PDF_OPEN_TIMEOUT = 60  # Seconds allowed on top of the page timeouts for workers to start and parse the PDF
+PDF_POOL_IDLE_TIMEOUT = float(os.getenv('PDF_POOL_IDLE_TIMEOUT', '60'))  # Seconds before an unused pool is closed
+
+# Worker processes are spawned rather than forked: forking a threaded web
+# worker can copy locks held by other threads into the child
+_pdf_pool = None
+_pdf_pool_size = 0
+_pdf_pool_users = {}  # Pool -> number of extractions using it, including retired pools
+_pdf_pool_idle_timer = None
+_pdf_pool_lock = threading.Lock()
+
 
 def generate_unique_filename(original_filename):
     """
@@ -19,17 +42,221 @@ def generate_unique_filename(original_filename):
     return f"{timestamp}_{name}{ext}"
 
 
-def extract_text_from_pdf(file_path, max_pages=None):
+class PageTimeoutError(Exception):
+    """Raised when extracting one PDF page takes longer than the page timeout"""
+
+
+def _raise_page_timeout(signum, frame):
+    """SIGALRM handler that interrupts a page taking longer than PDF_PAGE_TIMEOUT"""
+    raise PageTimeoutError()
+
+
+def _extract_pages(pdf_reader, page_numbers, page_timeout, deadline=None):
+    """
+    Extract the text of the given pages, skipping pages that fail or time out
+
+    The timeout uses SIGALRM, so it applies in pool worker processes and
+    other main threads, but not in request threads of a threaded server.
+
+    Args:
+        deadline: time.monotonic() value after which extraction fails (None for no limit)
+
+    Returns:
+        List of page texts in page order ('' for skipped pages)
+    """
+    use_alarm = (hasattr(signal, 'SIGALRM') and (page_timeout > 0 or deadline is not None)
+                 and threading.current_thread() is threading.main_thread())
+    previous_handler = signal.signal(signal.SIGALRM, _raise_page_timeout) if use_alarm else None
+    texts = []
+
+    try:
+        for page_num in page_numbers:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise Exception("PDF text extraction timed out")
+            try:
+                if use_alarm:
+                    # The alarm also stops a slow page at the overall deadline
+                    timeouts = [page_timeout] if page_timeout > 0 else []
+                    if deadline is not None:
+                        timeouts.append(max(0.001, deadline - time.monotonic()))
+                    signal.setitimer(signal.ITIMER_REAL, min(timeouts))
+                texts.append(pdf_reader.pages[page_num].extract_text() or '')
+            except PageTimeoutError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise Exception("PDF text extraction timed out")
+                print(f"Warning: Skipped page {page_num + 1}: extraction took longer than {page_timeout}s")
+                texts.append('')
+            except Exception as page_error:
+                # Skip problematic pages but continue
+                print(f"Warning: Could not extract page {page_num + 1}: {page_error}")
+                texts.append('')
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+    finally:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, previous_handler)
+
+    return texts
+
+
+def _extract_page_range(file_path, start, stop, page_timeout):
+    """Extract pages [start, stop) in a pool worker, which opens the PDF on its own"""
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return _extract_pages(pdf_reader, range(start, stop), page_timeout)
+
+
+def _acquire_pdf_pool(processes):
+    """
+    Get the shared process pool for PDF extraction, created on first use
+
+    Every call must be paired with _release_pdf_pool once the caller has
+    collected its results.
+    """
+    global _pdf_pool, _pdf_pool_size, _pdf_pool_idle_timer
+
+    with _pdf_pool_lock:
+        if _pdf_pool_idle_timer is not None:
+            _pdf_pool_idle_timer.cancel()
+            _pdf_pool_idle_timer = None
+        if _pdf_pool is None or _pdf_pool_size < processes:
+            if _pdf_pool is not None:
+                _retire_pdf_pool()
+            _pdf_pool = multiprocessing.get_context('spawn').Pool(processes=processes)
+            _pdf_pool_size = processes
+        _pdf_pool_users[_pdf_pool] = _pdf_pool_users.get(_pdf_pool, 0) + 1
+        return _pdf_pool
+
+
+def _release_pdf_pool(pool, stuck=False):
+    """
+    Stop using a pool acquired with _acquire_pdf_pool
+
+    Args:
+        pool: The pool returned by _acquire_pdf_pool
+        stuck: True if the caller gave up on a task, so the pool takes no new
+            PDFs and its workers are stopped once the other extractions finish
+    """
+    global _pdf_pool, _pdf_pool_idle_timer
+
+    with _pdf_pool_lock:
+        _pdf_pool_users[pool] -= 1
+        if stuck and pool is _pdf_pool:
+            _pdf_pool = None
+            pool.close()
+        if _pdf_pool_users[pool] > 0:
+            return
+        if pool is _pdf_pool:
+            if PDF_POOL_IDLE_TIMEOUT > 0:
+                _pdf_pool_idle_timer = threading.Timer(PDF_POOL_IDLE_TIMEOUT, _close_idle_pdf_pool, (pool,))
+                _pdf_pool_idle_timer.daemon = True
+                _pdf_pool_idle_timer.start()
+            return
+        del _pdf_pool_users[pool]
+    # Last user of a retired pool: stop its workers, including stuck ones
+    pool.terminate()
+
+
+def _retire_pdf_pool():
+    """Take the shared pool out of use; extractions still running on it finish first (lock held)"""
+    global _pdf_pool
+
+    pool, _pdf_pool = _pdf_pool, None
+    pool.close()
+    if not _pdf_pool_users.get(pool):
+        _pdf_pool_users.pop(pool, None)
+        pool.terminate()
+
+
+def _close_idle_pdf_pool(pool):
+    """Close the shared pool if no PDF has used it since the idle timer started"""
+    global _pdf_pool, _pdf_pool_idle_timer
+
+    with _pdf_pool_lock:
+        if pool is not _pdf_pool or _pdf_pool_users.get(pool):
+            return
+        _pdf_pool, _pdf_pool_idle_timer = None, None
+        _pdf_pool_users.pop(pool, None)
+    pool.terminate()
+
+
+@atexit.register
+def _shutdown_pdf_pool():
+    """Stop the extraction workers before the interpreter tears down the modules the pool needs"""
+    global _pdf_pool
+
+    with _pdf_pool_lock:
+        if _pdf_pool_idle_timer is not None:
+            _pdf_pool_idle_timer.cancel()
+        pools = list(_pdf_pool_users) + ([_pdf_pool] if _pdf_pool is not None else [])
+        _pdf_pool = None
+        _pdf_pool_users.clear()
+    for pool in pools:
+        pool.terminate()
+
+
+def _extract_pages_parallel(file_path, num_pages, workers, page_timeout, deadline):
+    """
+    Extract the first num_pages pages with a process pool, one page range per task
+
+    Args:
+        deadline: time.monotonic() value after which extraction fails (None for no limit)
+
+    Returns:
+        List of page texts in page order ('' for skipped pages)
+    """
+    # Two ranges per worker evens out ranges with slow pages, while each task
+    # still parses the PDF structure only once
+    range_size = math.ceil(num_pages / (workers * 2))
+    ranges = [(start, min(start + range_size, num_pages)) for start in range(0, num_pages, range_size)]
+    processes = min(workers, len(ranges))
+
+    # Backstop for pages the alarm cannot interrupt when there is no overall deadline
+    if page_timeout > 0:
+        rounds = math.ceil(len(ranges) / processes)
+        page_deadline = time.monotonic() + rounds * range_size * page_timeout + PDF_OPEN_TIMEOUT
+        deadline = min(deadline, page_deadline) if deadline is not None else page_deadline
+
+    texts = []
+    pool = _acquire_pdf_pool(processes)
+    stuck = False
+    try:
+        results = [pool.apply_async(_extract_page_range, (file_path, start, stop, page_timeout))
+                   for start, stop in ranges]
+        for result in results:
+            timeout = max(0, deadline - time.monotonic()) if deadline is not None else None
+            try:
+                texts.extend(result.get(timeout=timeout))
+            except multiprocessing.TimeoutError:
+                stuck = True
+                raise Exception("PDF text extraction timed out")
+    finally:
+        _release_pdf_pool(pool, stuck=stuck)
+
+    return texts
+
+
+def extract_text_from_pdf(file_path, max_pages=None, workers=None, page_timeout=None):
     """
     Extract text content from a PDF file (optimized for large files)
 
+    PDFs with at least PDF_PARALLEL_MIN_PAGES pages are split into page
+    ranges that a process pool extracts in parallel.
+
     Args:
         file_path: Path to the PDF file
         max_pages: Maximum number of pages to extract (None for all)
+        workers: Worker processes for large PDFs (defaults to PDF_EXTRACT_WORKERS; 1 extracts in this process)
+        page_timeout: Seconds before a page is skipped (defaults to PDF_PAGE_TIMEOUT; 0 for no limit)
 
     Returns:
         Extracted text as string
     """
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    page_timeout = PDF_PAGE_TIMEOUT if page_timeout is None else page_timeout
+    deadline = time.monotonic() + PDF_EXTRACT_TIMEOUT if PDF_EXTRACT_TIMEOUT > 0 else None
+
     try:
         with open(file_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
@@ -41,19 +268,14 @@ def extract_text_from_pdf(file_path, max_pages=None):
             else:
                 pages_to_extract = min(num_pages, max_pages)
 
-            text_content = []
-
             # Extract text from pages
-            for page_num in range(pages_to_extract):
-                try:
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    if page_text.strip():  # Only add non-empty pages
-                        text_content.append(page_text)
-                except Exception as page_error:
-                    # Skip problematic pages but continue
-                    print(f"Warning: Could not extract page {page_num + 1}: {page_error}")
-                    continue
+            if workers > 1 and pages_to_extract >= PDF_PARALLEL_MIN_PAGES:
+                page_texts = _extract_pages_parallel(file_path, pages_to_extract, workers, page_timeout, deadline)
+            else:
+                page_texts = _extract_pages(pdf_reader, range(pages_to_extract), page_timeout, deadline)
+
+            # Only add non-empty pages
+            text_content = [page_text for page_text in page_texts if page_text.strip()]
 
             if not text_content:
                 raise Exception("No text could be extracted from PDF")
@@ -173,6 +395,26 @@ def validate_file_content(text_content, min_length=10):
 import re
 from difflib import SequenceMatcher
 from typing import Dict, List, Tuple, Optional
+from dedupe import NearDuplicateIndex
+
+# Formatting patterns, compiled once for all questions and options
+_WHITESPACE_RE = re.compile(r'\s+')
+_SPACE_BEFORE_PUNCTUATION_RE = re.compile(r'\s+([?.!,;:])')
+_MISSING_SPACE_AFTER_PUNCTUATION_RE = re.compile(r'([?.!,;:])([^\s])')
+_REPEATED_PERIODS_RE = re.compile(r'\.{2,}')
+_REPEATED_QUESTION_MARKS_RE = re.compile(r'\?{2,}')
+_OPTION_SPACE_BEFORE_PUNCTUATION_RE = re.compile(r'\s+([,;:])')
+_OPTION_MISSING_SPACE_AFTER_PUNCTUATION_RE = re.compile(r'([,;:])([^\s])')
+
+QUESTION_STARTERS = frozenset([
+    'what', 'when', 'where', 'who', 'why', 'how', 'which', 'is', 'are', 'do', 'does', 'can', 'could', 'would', 'should'
+])
+COMPLEXITY_KEYWORDS = (
+    'analyze', 'evaluate', 'compare', 'contrast', 'explain why',
+    'justify', 'critique', 'synthesize', 'infer', 'predict',
+    'how would', 'what if', 'why do you think'
+)
+SIMPLE_KEYWORDS = ('what is', 'who is', 'when did', 'where is', 'define', 'list')
 
 
 def validate_question_length(question_text: str, min_length: int = 20, max_length: int = 500) -> Tuple[bool, str]:
@@ -272,7 +514,8 @@ def validate_correct_answer(correct_answer: str, question_type: str, options: Op
     return True, ""
 
 
-def check_duplicate_question(question_text: str, existing_questions: List[str], threshold: float = 0.85) -> Tuple[bool, Optional[str]]:
+def check_duplicate_question(question_text: str, existing_questions: List[str], threshold: float = 0.85,
+                             duplicate_index=None) -> Tuple[bool, Optional[str]]:
     """
     Check if a question is too similar to existing questions
 
@@ -280,10 +523,16 @@ def check_duplicate_question(question_text: str, existing_questions: List[str],
         question_text: The question to check
         existing_questions: List of existing question texts
         threshold: Similarity threshold (0.0 to 1.0)
+        duplicate_index: dedupe.NearDuplicateIndex of existing questions; when given,
+                         only its LSH candidates are compared and existing_questions is ignored
 
     Returns:
         Tuple of (is_duplicate, similar_question)
     """
+    if duplicate_index is not None:
+        similar = duplicate_index.find_duplicate(question_text, threshold=threshold)
+        return similar is not None, similar
+
     if not existing_questions:
         return False, None
 
@@ -301,13 +550,15 @@ def check_duplicate_question(question_text: str, existing_questions: List[str],
     return False, None
 
 
-def calculate_difficulty_score(question_text: str, options: Optional[Dict] = None) -> str:
+def calculate_difficulty_score(question_text: str, options: Optional[Dict] = None,
+                               ratio_cache: Optional[Dict] = None) -> str:
     """
     Auto-calculate difficulty level based on question characteristics
 
     Args:
         question_text: The question text
         options: Dictionary of options (for MCQ)
+        ratio_cache: Dictionary reused across calls to remember option pair similarities
 
     Returns:
         Difficulty level: 'easy', 'medium', or 'hard'
@@ -322,21 +573,14 @@ def calculate_difficulty_score(question_text: str, options: Optional[Dict] = Non
         score += 1
 
     # Factor 2: Complexity indicators in question
-    complexity_keywords = [
-        'analyze', 'evaluate', 'compare', 'contrast', 'explain why',
-        'justify', 'critique', 'synthesize', 'infer', 'predict',
-        'how would', 'what if', 'why do you think'
-    ]
-
     question_lower = question_text.lower()
-    for keyword in complexity_keywords:
+    for keyword in COMPLEXITY_KEYWORDS:
         if keyword in question_lower:
             score += 1
             break
 
     # Factor 3: Simple recall keywords (reduce score)
-    simple_keywords = ['what is', 'who is', 'when did', 'where is', 'define', 'list']
-    for keyword in simple_keywords:
+    for keyword in SIMPLE_KEYWORDS:
         if keyword in question_lower:
             score -= 1
             break
@@ -351,13 +595,13 @@ def calculate_difficulty_score(question_text: str, options: Optional[Dict] = Non
 
         # Check if options are very similar (harder question)
         option_values = [str(v).lower() for v in options.values()]
+        ratios = _option_pair_ratios(option_values, ratio_cache)
         total_similarity = 0
         comparisons = 0
 
         for i in range(len(option_values)):
             for j in range(i + 1, len(option_values)):
-                similarity = SequenceMatcher(None, option_values[i], option_values[j]).ratio()
-                total_similarity += similarity
+                total_similarity += ratios[i, j]
                 comparisons += 1
 
         if comparisons > 0:
@@ -374,6 +618,32 @@ def calculate_difficulty_score(question_text: str, options: Optional[Dict] = Non
         return 'hard'
 
 
+def _option_pair_ratios(option_values: List[str], ratio_cache: Optional[Dict] = None) -> Dict[Tuple[int, int], float]:
+    """
+    SequenceMatcher ratio of each option pair (i, j) with i < j
+
+    Each option is set as the second sequence once and compared with all
+    options before it, so its match index is built once instead of per pair.
+    """
+    ratios = {}
+    matcher = SequenceMatcher()
+
+    for j in range(1, len(option_values)):
+        matcher.set_seq2(option_values[j])
+        for i in range(j):
+            key = (option_values[i], option_values[j])
+            if ratio_cache is not None and key in ratio_cache:
+                ratios[i, j] = ratio_cache[key]
+                continue
+
+            matcher.set_seq1(option_values[i])
+            ratios[i, j] = matcher.ratio()
+            if ratio_cache is not None:
+                ratio_cache[key] = ratios[i, j]
+
+    return ratios
+
+
 def auto_fix_question_formatting(question_text: str) -> str:
     """
     Automatically fix common formatting issues in question text
@@ -388,15 +658,14 @@ def auto_fix_question_formatting(question_text: str) -> str:
         return question_text
 
     # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', question_text.strip())
+    text = _WHITESPACE_RE.sub(' ', question_text.strip())
 
     # Ensure question ends with proper punctuation
     if text and text[-1] not in '.?!':
         # Add question mark if it looks like a question
-        question_starters = ['what', 'when', 'where', 'who', 'why', 'how', 'which', 'is', 'are', 'do', 'does', 'can', 'could', 'would', 'should']
         first_word = text.split()[0].lower() if text.split() else ''
 
-        if first_word in question_starters:
+        if first_word in QUESTION_STARTERS:
             text += '?'
         else:
             text += '.'
@@ -406,12 +675,12 @@ def auto_fix_question_formatting(question_text: str) -> str:
         text = text[0].upper() + text[1:]
 
     # Fix common spacing issues
-    text = re.sub(r'\s+([?.!,;:])', r'\1', text)  # Remove space before punctuation
-    text = re.sub(r'([?.!,;:])([^\s])', r'\1 \2', text)  # Add space after punctuation
+    text = _SPACE_BEFORE_PUNCTUATION_RE.sub(r'\1', text)  # Remove space before punctuation
+    text = _MISSING_SPACE_AFTER_PUNCTUATION_RE.sub(r'\1 \2', text)  # Add space after punctuation
 
     # Fix multiple punctuation
-    text = re.sub(r'\.{2,}', '.', text)
-    text = re.sub(r'\?{2,}', '?', text)
+    text = _REPEATED_PERIODS_RE.sub('.', text)
+    text = _REPEATED_QUESTION_MARKS_RE.sub('?', text)
 
     return text
 
@@ -430,7 +699,7 @@ def auto_fix_option_formatting(option_text: str) -> str:
         return option_text
 
     # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', option_text.strip())
+    text = _WHITESPACE_RE.sub(' ', option_text.strip())
 
     # Capitalize first letter
     if text:
@@ -441,8 +710,8 @@ def auto_fix_option_formatting(option_text: str) -> str:
         text = text[:-1].strip()
 
     # Fix spacing issues
-    text = re.sub(r'\s+([,;:])', r'\1', text)
-    text = re.sub(r'([,;:])([^\s])', r'\1 \2', text)
+    text = _OPTION_SPACE_BEFORE_PUNCTUATION_RE.sub(r'\1', text)
+    text = _OPTION_MISSING_SPACE_AFTER_PUNCTUATION_RE.sub(r'\1 \2', text)
 
     return text
 
@@ -453,7 +722,9 @@ def validate_question_complete(
     correct_answer: Optional[str] = None,
     options: Optional[Dict] = None,
     existing_questions: Optional[List[str]] = None,
-    auto_fix: bool = True
+    auto_fix: bool = True,
+    duplicate_index=None,
+    ratio_cache: Optional[Dict] = None
 ) -> Tuple[bool, List[str], Dict[str, any]]:
     """
     Comprehensive question validation with optional auto-fixing
@@ -465,6 +736,8 @@ def validate_question_complete(
         options: Dictionary of options (for MCQ)
         existing_questions: List of existing questions to check for duplicates
         auto_fix: Whether to auto-fix formatting issues
+        duplicate_index: dedupe.NearDuplicateIndex to check for duplicates instead of existing_questions
+        ratio_cache: Option similarity memo passed to calculate_difficulty_score
 
     Returns:
         Tuple of (is_valid, errors_list, fixed_data)
@@ -513,10 +786,11 @@ def validate_question_complete(
                 errors.append(error)
 
     # Check for duplicates
-    if existing_questions:
+    if existing_questions or duplicate_index is not None:
         is_duplicate, similar = check_duplicate_question(
             fixed_data['question_text'],
-            existing_questions
+            existing_questions,
+            duplicate_index=duplicate_index
         )
         if is_duplicate:
             errors.append(f"Question is too similar to existing question: '{similar[:100]}...'")
@@ -525,9 +799,61 @@ def validate_question_complete(
     if question_type == 'mcq' and fixed_data['options']:
         fixed_data['difficulty'] = calculate_difficulty_score(
             fixed_data['question_text'],
-            fixed_data['options']
+            fixed_data['options'],
+            ratio_cache=ratio_cache
         )
     else:
         fixed_data['difficulty'] = calculate_difficulty_score(fixed_data['question_text'])
 
     return len(errors) == 0, errors, fixed_data
+
+
+def validate_questions_batch(
+    questions: List[Dict],
+    existing_questions: Optional[List[str]] = None,
+    auto_fix: bool = True,
+    duplicate_index=None
+) -> List[Tuple[bool, List[str], Dict[str, any]]]:
+    """
+    Validate a batch of questions for bulk ingestion
+
+    Each question is checked against the existing questions and against the
+    valid questions before it in the batch. The duplicate index is built once
+    and option similarities are shared across the batch, so results are the
+    same as calling validate_question_complete() on each question in order and
+    adding each valid question to the index.
+
+    Args:
+        questions: List of dicts with question_text, question_type and, as needed,
+                   correct_answer and options
+        existing_questions: List of existing questions to check for duplicates
+        auto_fix: Whether to auto-fix formatting issues
+        duplicate_index: Index of existing questions to use instead of existing_questions
+                         (dedupe.NearDuplicateIndex or question_index.PersistedDuplicateIndex);
+                         valid questions of the batch are added to it
+
+    Returns:
+        List of (is_valid, errors_list, fixed_data) tuples, one per question
+    """
+    if duplicate_index is None:
+        duplicate_index = NearDuplicateIndex(existing_questions or ())
+
+    ratio_cache = {}
+    results = []
+
+    for question in questions:
+        is_valid, errors, fixed_data = validate_question_complete(
+            question_text=question.get('question_text', ''),
+            question_type=question['question_type'],
+            correct_answer=question.get('correct_answer'),
+            options=question.get('options'),
+            auto_fix=auto_fix,
+            duplicate_index=duplicate_index,
+            ratio_cache=ratio_cache
+        )
+
+        if is_valid:
+            duplicate_index.add(fixed_data['question_text'])
+        results.append((is_valid, errors, fixed_data))
+
+    return results